@@ -1,21 +1,24 @@
 #!/usr/bin/python3
 
-from order_management import (
-    UserManagement,
-    Stock,
-    Cart,
-    Wrapper,
-    Menu,
-    BookRecords,
-    Wishlist,
-)
+import os
+
+# only what the log in and the main menu need, the menu imports the rest when first used
+from order_management.user_management import UserManagement
+from order_management.menu import Menu
+from order_management.config import dataPaths
 
 if __name__ == "__main__":
-    # files path declaration
-    credentials_file = "data/credentials.txt"
-    stock_file = "data/products.json"
-    sales_file = "data/sales.json"
-    prescription_file = "data/prescriptions.json"
+    # the profiler starts once the instrumentation is imported (see order_management/metrics.py)
+    if os.environ.get("ORDER_MANAGEMENT_PROFILE"):
+        import order_management.metrics
+
+    # files path declaration (see order_management/config.py)
+    paths = dataPaths()
+    credentials_file = paths["credentials"]
+    stock_file = paths["stock"]
+    sales_file = paths["sales"]
+    prescription_file = paths["prescriptions"]
+    wishlist_file = paths["wishlist"]
 
     # load the user management file
     profiles = UserManagement.load(credentials_file)
@@ -28,12 +31,35 @@ if __name__ == "__main__":
         pharmacist.role == "salesperson"
     ), "You are not allowed to access this feature."
 
-    # load the resources that we need
-    stock = Stock.load(stock_file)
-    cart = Cart(stock=stock)
+    # load the resources that we need, or use those of a running service (see order_management/service.py)
+    service = os.environ.get("ORDER_MANAGEMENT_SERVICE")
+    if service:
+        from order_management.client import (
+            ServiceClient,
+            RemoteStock,
+            RemoteCart,
+            RemoteWrapper,
+            RemoteRecords,
+        )
+
+        client = ServiceClient(service)
+        client.call("login", agent=pharmacist.username)
+        stock = RemoteStock(client)
+        cart = RemoteCart(client)
+        wrap = RemoteWrapper(client)
+        books = RemoteRecords(client)
+    else:
+        # the menu loads the stock when the order management is first opened,
+        # and the sales when the analytics are
+        stock = cart = wrap = books = None
+        # the reports can be split over several processes for long histories (see order_management/parallel.py)
+        workers = os.environ.get("ORDER_MANAGEMENT_WORKERS")
+        if workers:
+            from order_management.books import BookRecords
 
-    wrap = Wrapper(stock, pharmacist.username)
-    wishlist = Wishlist(profiles.get_logged_in_user().username)
+            books = BookRecords.load(sales_file, workers=int(workers))
+    # the wishlist is created, then read, when first shown or changed
+    wishlist = None
 
     # create an instance of the menu
     menu = Menu(
@@ -45,6 +71,9 @@ if __name__ == "__main__":
         sales_file,
         prescription_file,
         stock_file,
+        books=books,
+        cart=cart,
+        wishlist_file=wishlist_file,
     )
 
     # Calling Menu method
@@ -0,0 +1,102 @@
+"""Bulk import of orders, one checkout at a time against by batches.
+
+Generates a data set (see `benchmarks.generate`) and a file of orders,
+then checks the orders out through `Wrapper.checkout`, one cart at a time
+as before, and through `bulk.importOrders`. Checks that the stock and the
+sales saved by the batches match the orders that went through.
+
+Run from the root of the repository:
+
+    python -m benchmarks.bulk_import [--orders 20000]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from benchmarks.generate import generate
+from order_management import Cart, Stock, Wrapper
+from order_management.bulk import importOrders, readOrders
+from order_management.journal import SalesJournal
+
+# number of orders checked out one at a time, the rate is extrapolated
+SINGLE_ORDERS = 200
+
+
+def write_orders(path: str, stock: Stock, count: int, seed: int = 0):
+    """Writes orders of 1 to 3 products without prescription, one out of 50 asking for too much"""
+    rng = random.Random(seed)
+    codes = [product.code for product in stock.products if not product.requires_prescription]
+    with open(path, "w") as f:
+        for i in range(count):
+            lines = {code: rng.randint(1, 3) for code in rng.sample(codes, rng.randint(1, 3))}
+            if i % 50 == 0:
+                lines[codes[0]] = 10 ** 6
+            f.write(json.dumps({"customerID": f"customer{i % 1000}", "lines": lines}) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", type=int, default=20_000)
+    parser.add_argument("--products", type=int, default=2_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base = os.path.join(tmp, "base")
+        with contextlib.redirect_stdout(io.StringIO()):
+            sizes = generate(base, products=args.products, sales=1_000, prescriptions=100, users=1_000)
+        orders_file = os.path.join(tmp, "orders.jsonl")
+        write_orders(orders_file, Stock.load(os.path.join(base, "products.json")), args.orders)
+
+        # one checkout at a time, as the menu does
+        single = os.path.join(tmp, "single")
+        shutil.copytree(base, single)
+        stock = Stock.load(os.path.join(single, "products.json"))
+        wrap = Wrapper(stock, sizes["agent"], sales_file=os.path.join(single, "sales.json"))
+        cart = Cart(stock)
+        orders = [order for _, order, _ in readOrders(orders_file)][:SINGLE_ORDERS]
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for products, customerID, _ in orders:
+                cart.products = dict(products)
+                wrap.checkout(cart, customerID)
+        single_rate = len(orders) / (time.perf_counter() - start) * 60
+
+        # by batches
+        batched = os.path.join(tmp, "batched")
+        shutil.copytree(base, batched)
+        stock = Stock.load(os.path.join(batched, "products.json"))
+        before = {product.code: product.quantity for product in stock.products}
+        wrap = Wrapper(stock, sizes["agent"], sales_file=os.path.join(batched, "sales.json"))
+        start = time.perf_counter()
+        results = list(
+            importOrders(
+                readOrders(orders_file), wrap, os.path.join(batched, "prescriptions.json")
+            )
+        )
+        elapsed = time.perf_counter() - start
+        failed = sum(error is not None for _, error in results)
+
+        # the stock saved went down by what the sales saved sold
+        after = {product.code: product.quantity for product in Stock.load(stock.filename).products}
+        sales = list(SalesJournal(os.path.join(batched, "sales.json")).read())[1_000:]
+        by_name = {product.name: product.code for product in stock.products}
+        sold = {}
+        for sale in sales:
+            code = by_name[sale["name"]]
+            sold[code] = sold.get(code, 0) + sale["quantity"]
+        assert all(before[code] - after[code] == sold.get(code, 0) for code in before), "stock and sales differ"
+
+        print(f"{len(results)} orders, {failed} refused")
+        print(f"one at a time: {single_rate:>10.0f} orders/min")
+        print(f"by batches:    {len(results) / elapsed * 60:>10.0f} orders/min ({elapsed:.1f} s)")
+
+
+if __name__ == "__main__":
+    main()
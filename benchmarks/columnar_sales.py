@@ -0,0 +1,69 @@
+"""Benchmark of the BookRecords reports with the object and columnar stores.
+
+Run from the root of the repository:
+
+    python -m benchmarks.columnar_sales [rows]
+"""
+
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+from benchmarks.sales_journal import make_sale
+from order_management import BookRecords, Sale
+from order_management.columnar import ColumnarSales
+
+
+def build(records, columnar: bool):
+    """Builds the records and returns them with the memory they take"""
+    tracemalloc.start()
+    if columnar:
+        transactions = ColumnarSales()
+        for record in records:
+            transactions.appendRecord(record)
+    else:
+        transactions = [Sale(**record) for record in records]
+    books = BookRecords(transactions)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return books, size
+
+
+def reports(books: BookRecords):
+    """Runs every report, returns the outputs and the time each took"""
+    start, end = datetime(2023, 7, 22), datetime(2023, 7, 23)
+    calls = {
+        "totalTransactions": lambda: f"{books.totalTransactions():.2f}",
+        "reportOnPrescriptions": books.reportOnPrescriptions,
+        "purchasesByUser": lambda: books.purchasesByUser("CST42"),
+        "salesByAgent": lambda: books.salesByAgent("AGT3"),
+        "topNSales": lambda: books.topNSales(start=start, end=end),
+    }
+    results = {}
+    for name, call in calls.items():
+        began = time.perf_counter()
+        output = call()
+        results[name] = (output, time.perf_counter() - began)
+    return results
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    records = [make_sale(i) for i in range(rows)]
+
+    objects, objects_size = build(records, columnar=False)
+    columns, columns_size = build(records, columnar=True)
+    del records
+
+    print(f"{rows} sales")
+    print(f"{'memory (MB)':>22} | {objects_size / 1e6:9.1f} | {columns_size / 1e6:9.1f}")
+    print(f"{'report (ms)':>22} | {'objects':>9} | {'columnar':>9}")
+    expected = reports(objects)
+    for name, (output, elapsed) in reports(columns).items():
+        assert output == expected[name][0], f"{name} differs between the stores"
+        print(f"{name:>22} | {expected[name][1] * 1e3:9.1f} | {elapsed * 1e3:9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""Deterministic synthetic data for the benchmarks.
+
+Writes a data directory in the formats of `data/` (products, sales,
+prescriptions, wishlists, credentials and the logged in pharmacist) with
+the sizes asked for. The same seed and sizes always give the same files.
+
+Run from the root of the repository:
+
+    python -m benchmarks.generate --out /tmp/data [--products 2000] [--sales 200000] [--sqlite]
+
+then start the application on it from a copy of `__main__.py` or point the
+benchmarks at it.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+from datetime import datetime
+from typing import Dict, List
+
+from order_management import Product, Stock
+from order_management.journal import SalesJournal
+from order_management.migrate import migrate
+from order_management.storage import JSONWishlist
+
+# the sales are spread from that date, one every SALE_INTERVAL seconds on average
+START = datetime(2023, 1, 2).timestamp()
+SALE_INTERVAL = 60
+# number of sales appended to the journal at once
+BATCH_SIZE = 10_000
+
+
+def make_products(count: int, seed: int = 0) -> List[Product]:
+    """Builds a catalog, every 7th product requires a prescription"""
+    rng = random.Random(seed)
+    return [
+        Product(
+            code=f"P{i:06d}",
+            name=f"Medicine {i}",
+            brand=f"Brand {i % 50}",
+            description=f"Description of medicine {i}",
+            quantity=rng.randint(1_000, 5_000),
+            price=round(rng.uniform(0.5, 200), 2),
+            dosage_instruction=f"{1 + i % 3} times a day",
+            requires_prescription=i % 7 == 0,
+            category=f"Category {i % 20}",
+        )
+        for i in range(count)
+    ]
+
+
+def make_users(count: int) -> Dict[str, List[str]]:
+    """Returns the usernames by role, one pharmacist (salesperson) out of 100 accounts"""
+    agents = [f"agent{i}" for i in range(max(1, count // 100))]
+    customers = [f"customer{i}" for i in range(max(1, count - len(agents) - 1))]
+    return {"admin": ["admin"], "salesperson": agents, "normal": customers}
+
+
+def credentials_lines(users: Dict[str, List[str]], seed: int = 0) -> List[str]:
+    """Returns the lines of the credentials file, in the format of data/credentials.txt"""
+    rng = random.Random(seed)
+    lines = []
+    for role, usernames in users.items():
+        for username in usernames:
+            lines.append(
+                f"{username}:{rng.getrandbits(256):064x}:{rng.getrandbits(64):016x}"
+                f":{username.capitalize()}:{role}:0\n"
+            )
+    # the roles are mixed in the file, as accounts are created
+    rng.shuffle(lines)
+    return lines
+
+
+def make_prescriptions(
+    count: int, products: List[Product], customers: List[str], seed: int = 0
+) -> List[dict]:
+    """Builds prescriptions of 1 to 3 medications, in the format of data/prescriptions.json"""
+    rng = random.Random(seed)
+    prescribed = [product for product in products if product.requires_prescription] or products
+    prescriptions = []
+    for i in range(count):
+        medications = [
+            {
+                "quantity": rng.randint(1, 10),
+                "name": product.name,
+                "id": product.code,
+                "ProcessedStatus": False,
+            }
+            for product in rng.sample(prescribed, min(len(prescribed), rng.randint(1, 3)))
+        ]
+        prescriptions.append(
+            {
+                "DoctorName": f"Doctor {rng.randrange(300)}",
+                "PrescriptionID": f"PHA{i}",
+                "Medications": medications,
+                "CustomerID": rng.choice(customers),
+                "Date": datetime.fromtimestamp(START + i * 600).strftime("%Y-%m-%d"),
+            }
+        )
+    return prescriptions
+
+
+def make_sales(
+    count: int,
+    products: List[Product],
+    users: Dict[str, List[str]],
+    prescriptions: List[dict],
+    seed: int = 0,
+):
+    """Yields sales in the order they were made, a third of them with a prescription"""
+    rng = random.Random(seed)
+    timestamp = START
+    for i in range(count):
+        product = rng.choice(products)
+        quantity = rng.randint(1, 5)
+        timestamp += rng.uniform(0, 2 * SALE_INTERVAL)
+        prescription = rng.choice(prescriptions) if prescriptions and i % 3 == 0 else None
+        yield {
+            "id": f"S{i:x}",
+            "name": product.name,
+            "quantity": quantity,
+            "price": product.price,
+            "purchase_price": product.price * quantity,
+            "timestamp": timestamp,
+            "customerID": prescription["CustomerID"] if prescription else rng.choice(users["normal"]),
+            "salesperson": rng.choice(users["salesperson"]),
+            "prescriptionID": prescription["PrescriptionID"] if prescription else None,
+        }
+
+
+def generate(
+    out: str,
+    products: int = 2_000,
+    sales: int = 200_000,
+    prescriptions: int = 20_000,
+    users: int = 10_000,
+    wishlist_items: int = 5,
+    seed: int = 0,
+    sqlite: bool = False,
+) -> dict:
+    """Writes a data directory
+
+    Args:
+        out: the directory to write, created if needed
+        products: number of products of the catalog
+        sales: number of sales of the history
+        prescriptions: number of prescriptions
+        users: number of accounts, one pharmacist out of 100
+        wishlist_items: number of products on the wishlist of each customer with one (one out of 10)
+        seed: seed of the random generators
+        sqlite: whether to also copy the data to a SQLite database, pharmacy.db
+
+    Returns: The sizes and the paths of the files, to be recorded with the results
+    """
+    os.makedirs(out, exist_ok=True)
+    catalog = make_products(products, seed)
+    Stock(catalog).dump(os.path.join(out, "products.json"))
+
+    accounts = make_users(users)
+    with open(os.path.join(out, "credentials.txt"), "w") as f:
+        f.writelines(credentials_lines(accounts, seed))
+    with open(os.path.join(out, ".logged_in"), "w") as f:
+        f.write(accounts["salesperson"][0] + "\n")
+
+    prescription_list = make_prescriptions(prescriptions, catalog, accounts["normal"], seed)
+    with open(os.path.join(out, "prescriptions.json"), "w") as f:
+        json.dump(prescription_list, f, indent=4)
+
+    journal = SalesJournal(os.path.join(out, "sales.json"))
+    open(journal.path, "w").close()
+    batch = []
+    for sale in make_sales(sales, catalog, accounts, prescription_list, seed):
+        batch.append(sale)
+        if len(batch) == BATCH_SIZE:
+            journal.append(batch)
+            batch = []
+    journal.append(batch)
+
+    rng = random.Random(seed)
+    wishlists = JSONWishlist(os.path.join(out, "wishlist.json"))
+    for username in accounts["normal"][::10]:
+        items = [
+            dict(product.to_dict(), user=username)
+            for product in rng.sample(catalog, min(len(catalog), wishlist_items))
+        ]
+        wishlists.save(username, items)
+
+    if sqlite:
+        migrate(out, os.path.join(out, "pharmacy.db"))
+
+    return {
+        "products": products,
+        "sales": sales,
+        "prescriptions": prescriptions,
+        "users": users,
+        "wishlist_items": wishlist_items,
+        "seed": seed,
+        "agent": accounts["salesperson"][0],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--out", required=True, help="directory to write")
+    parser.add_argument("--products", type=int, default=2_000)
+    parser.add_argument("--sales", type=int, default=200_000)
+    parser.add_argument("--prescriptions", type=int, default=20_000)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--wishlist-items", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--sqlite", action="store_true", help="also write pharmacy.db")
+    args = parser.parse_args()
+    if os.path.exists(os.path.join(args.out, "products.json")):
+        sys.exit(f"{args.out} already holds data")
+    sizes = generate(
+        args.out,
+        args.products,
+        args.sales,
+        args.prescriptions,
+        args.users,
+        args.wishlist_items,
+        args.seed,
+        args.sqlite,
+    )
+    print(json.dumps(sizes))
+
+
+if __name__ == "__main__":
+    main()
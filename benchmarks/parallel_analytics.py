@@ -0,0 +1,71 @@
+"""Reports over a long sales history, in a single process and split over several.
+
+Generates a sales history (see `benchmarks.generate`), then runs the
+reports of the analytics menu on the streamed journal (`SaleStream`) and
+with `ParallelSaleStream` for several numbers of processes. Checks that
+the reports are the same, the totals to the last bit.
+
+Run from the root of the repository:
+
+    python -m benchmarks.parallel_analytics [--sales 10000000] [--workers 1 2 4 8]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks.generate import generate
+from order_management import BookRecords
+
+
+def reports(books: BookRecords, agent: str) -> list:
+    """Runs the reports of the analytics menu, returns what they print and the totals"""
+    return [
+        books.totalTransactions(),
+        books.reportOnPrescriptions(),
+        books.purchasesByUser("customer1"),
+        books.salesByAgent(agent),
+        books.topNSales(start=datetime(2023, 1, 2), end=datetime(2030, 1, 1)),
+        books.totalByCustomer("customer1"),
+        books.transactions.prescriptionTotals(),
+    ]
+
+
+def run(path: str, agent: str, workers: int = None):
+    """Returns the reports and the time they took"""
+    if workers is None:
+        books = BookRecords.load(path, streaming=True)
+    else:
+        books = BookRecords.load(path, workers=workers)
+    start = time.perf_counter()
+    outputs = reports(books, agent)
+    return outputs, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sales", type=int, default=1_000_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count()])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with contextlib.redirect_stdout(io.StringIO()):
+            sizes = generate(tmp, products=2_000, sales=args.sales, prescriptions=50_000, users=10_000)
+        path = os.path.join(tmp, "sales.json")
+        size = os.path.getsize(os.path.join(tmp, "sales.jsonl"))
+        print(f"{args.sales} sales, {size / 1e6:.0f} MB journal, {os.cpu_count()} CPUs")
+
+        serial, serial_time = run(path, sizes["agent"])
+        print(f"{'streamed':>12} | {serial_time:8.2f} s |")
+        for workers in sorted(set(args.workers)):
+            outputs, elapsed = run(path, sizes["agent"], workers)
+            assert outputs == serial, f"the reports differ with {workers} processes"
+            print(f"{workers:>2} processes | {elapsed:8.2f} s | {serial_time / elapsed:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Queries over a recent period, with the single sales journal and with partitions by month.
+
+Generates a sales history (see `benchmarks.generate`), splits it into
+partitions (see `SalesPartitions`) and compares the two for the top sales
+of the last 7 days on the streamed journal, and for loading the sales of
+the last 30 days. Checks that the reports are the same.
+
+Run from the root of the repository:
+
+    python -m benchmarks.partitioned_sales [--sales 1000000]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.generate import SALE_INTERVAL, START, generate
+from order_management import BookRecords
+from order_management.journal import SalesPartitions
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sales", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate(tmp, products=2_000, sales=args.sales, prescriptions=20_000, users=10_000)
+        single = os.path.join(tmp, "single.jsonl")
+        shutil.copy(os.path.join(tmp, "sales.jsonl"), single)
+        partitioned = os.path.join(tmp, "sales")
+        _, split_time = timed(SalesPartitions(partitioned).migrate)
+        partitions = len(SalesPartitions(partitioned).segments())
+        print(f"{args.sales} sales, {partitions} partitions (split in {split_time:.1f} s)")
+
+        # the generated sales end around there
+        end = datetime.fromtimestamp(START + args.sales * SALE_INTERVAL)
+        week = end - timedelta(days=7)
+        month = end - timedelta(days=30)
+
+        results = {}
+        for name, path in (("single", single), ("partitioned", partitioned)):
+            books = BookRecords.load(path, streaming=True)
+            top, top_time = timed(lambda: books.topNSales(start=week, end=end))
+            recent, load_time = timed(lambda: BookRecords.load(path, since=month))
+            results[name] = ((top, str(recent)), top_time, load_time)
+        assert results["single"][0] == results["partitioned"][0], "the reports differ"
+
+        print(f"{'':>28} | {'single (s)':>10} | {'partitioned (s)':>15}")
+        for label, index in (("top 10 of the last 7 days", 1), ("load the last 30 days", 2)):
+            print(f"{label:>28} | {results['single'][index]:>10.3f} | {results['partitioned'][index]:>15.3f}")
+
+        journal = SalesPartitions(partitioned)
+        merged, compact_time = timed(lambda: journal.compact((end - timedelta(days=90)).timestamp()))
+        print(f"{merged} partitions older than 90 days merged in {compact_time:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
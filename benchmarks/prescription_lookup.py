@@ -0,0 +1,92 @@
+"""Prescription lookups and saves with a large prescriptions file.
+
+Compares reading the whole file on each lookup and rewriting it on each
+save, as `Prescription.get` and `Prescription.dump` used to, with the
+`PrescriptionStore`, which keeps the prescriptions in memory and appends
+the saves to a journal.
+
+Run from the root of the repository:
+
+    python -m benchmarks.prescription_lookup
+"""
+
+import json
+import os
+import random
+import tempfile
+import time
+
+from order_management import Prescription, PrescriptionStore
+from order_management.atomic import atomic_write
+
+PRESCRIPTIONS = 200_000
+LOOKUPS = 20
+
+
+def make_prescription(i: int) -> dict:
+    return {
+        "DoctorName": f"Doctor {i % 300}",
+        "PrescriptionID": f"PHA{i}",
+        "Medications": [
+            {"quantity": 1 + i % 5, "name": f"Name {i % 97}", "id": f"P{i % 97}", "ProcessedStatus": False},
+            {"quantity": 2, "name": f"Name {i % 89}", "id": f"P{i % 89}", "ProcessedStatus": False},
+        ],
+        "CustomerID": f"CST{i % 50_000}",
+        "Date": "2023-07-28",
+    }
+
+
+def scan(path: str, id: str) -> dict:
+    with open(path, "r") as f:
+        for prescription in json.load(f):
+            if prescription["PrescriptionID"] == id:
+                return prescription
+
+
+def rewrite(path: str, prescription: dict):
+    with open(path, "r") as f:
+        data = json.load(f)
+    for idx, existing in enumerate(data):
+        if existing["PrescriptionID"] == prescription["PrescriptionID"]:
+            data[idx] = prescription
+    atomic_write(path, json.dumps(data, indent=4))
+
+
+def timed(function, *args) -> float:
+    start = time.perf_counter()
+    function(*args)
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    rng = random.Random(0)
+    ids = [f"PHA{rng.randrange(PRESCRIPTIONS)}" for _ in range(LOOKUPS)]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "prescriptions.json")
+        with open(path, "w") as f:
+            json.dump([make_prescription(i) for i in range(PRESCRIPTIONS)], f, indent=4)
+        print(f"{PRESCRIPTIONS} prescriptions, {os.path.getsize(path) / 1e6:.0f} MB")
+
+        full_get = sum(timed(scan, path, id) for id in ids) / LOOKUPS
+        full_dump = timed(rewrite, path, scan(path, ids[0]))
+
+        store = PrescriptionStore(path)
+        first_get = timed(store.getPrescriptionByID, ids[0])
+        store_get = sum(timed(store.getPrescriptionByID, id) for id in ids) / LOOKUPS
+        customer_get = sum(
+            timed(store.getPrescriptionsByCustomer, f"CST{i}") for i in range(LOOKUPS)
+        ) / LOOKUPS
+        prescription = store.getPrescriptionByID(ids[0])
+        prescription.Medications[0]["ProcessedStatus"] = True
+        store_dump = sum(timed(store.save, prescription) for _ in range(LOOKUPS)) / LOOKUPS
+        assert Prescription.get(path, ids[0]).Medications[0]["ProcessedStatus"]
+
+        print(f"{'':>26} | {'whole file (ms)':>15} | {'store (ms)':>10}")
+        print(f"{'first lookup':>26} | {full_get:>15.1f} | {first_get:>10.1f}")
+        print(f"{'next lookups':>26} | {full_get:>15.1f} | {store_get:>10.3f}")
+        print(f"{'lookup by customer':>26} | {'':>15} | {customer_get:>10.3f}")
+        print(f"{'save':>26} | {full_dump:>15.1f} | {store_dump:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
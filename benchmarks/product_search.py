@@ -0,0 +1,77 @@
+"""Search of the product catalog, through the index of `Stock.search` and by scanning every product.
+
+Builds synthetic catalogs (see `benchmarks.generate`), then times queries
+of a few kinds through the index kept by `Stock` and through a scan of all
+the products matching each word as a prefix, as listing the catalog would
+cost. Checks that both find the same products, and that the index follows
+the products added and removed.
+
+Run from the root of the repository:
+
+    python -m benchmarks.product_search [--products 1000 10000 100000]
+"""
+
+import argparse
+import time
+
+from benchmarks.generate import make_products
+from order_management import Product, Stock
+from order_management.search import FIELD_WEIGHTS, tokenize
+
+QUERIES = [
+    "medicine 4242",
+    "med 42",
+    "brand 7",
+    "category 3 medicine 1",
+    "description of medicine 99",
+    "zzz",
+]
+
+
+def scan(stock: Stock, query: str) -> set:
+    """Returns the codes of the products matching every word of a query as a prefix, by scanning them all"""
+    terms = tokenize(query)
+    found = set()
+    for product in stock.products:
+        words = [word for field, _ in FIELD_WEIGHTS for word in tokenize(getattr(product, field))]
+        if all(any(word.startswith(term) for word in words) for term in terms):
+            found.add(product.code)
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    args = parser.parse_args()
+
+    for size in args.products:
+        stock = Stock(make_products(size), filename="")
+        start = time.perf_counter()
+        stock.search("")
+        print(f"\n{size} products, index built in {time.perf_counter() - start:.2f} s")
+        print(f"{'query':>30} | {'found':>6} | {'index (ms)':>10} | {'first 10 (ms)':>13} | {'scan (ms)':>9}")
+        for query in QUERIES:
+            start = time.perf_counter()
+            found = stock.search(query)
+            indexed = time.perf_counter() - start
+            start = time.perf_counter()
+            stock.search(query, limit=10)
+            first = time.perf_counter() - start
+            start = time.perf_counter()
+            scanned = scan(stock, query)
+            scan_time = time.perf_counter() - start
+            assert {product.code for product in found} == scanned, f"the results of {query!r} differ"
+            print(
+                f"{query:>30} | {len(found):>6} | {indexed * 1000:>10.2f} | "
+                f"{first * 1000:>13.2f} | {scan_time * 1000:>9.1f}"
+            )
+
+        # the index follows the catalog
+        stock.add(Product("NEW1", "Zzzquil", "Vicks", "Sleep aid", 10, 5.0, "", False, "Sleep"))
+        assert [product.code for product in stock.search("zzz")] == ["NEW1"]
+        stock.remove("NEW1")
+        assert stock.search("zzz") == []
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Memory taken by the Sale, Product and Wish records.
+
+Compares the slotted classes with the same classes keeping their
+attributes in a per-instance dictionary, as they did before.
+
+Run from the root of the repository:
+
+    python -m benchmarks.record_memory [max rows]
+"""
+
+import sys
+import tracemalloc
+
+from benchmarks.sales_journal import make_sale
+from order_management import Product, Sale
+from order_management.wish import Wish
+
+SIZES = [10_000, 100_000, 1_000_000]
+
+
+def make_product(i: int) -> dict:
+    """Builds the fields of a synthetic product"""
+    return {
+        "code": f"P{i:08d}",
+        "name": f"Name {i}",
+        "brand": f"Brand {i % 100}",
+        "description": f"Description {i % 1000}",
+        "quantity": 100,
+        "price": float(i % 1000),
+        "dosage_instruction": "",
+        "requires_prescription": i % 7 == 0,
+        "category": f"Category {i % 20}",
+    }
+
+
+def make_wish(i: int) -> dict:
+    """Builds the fields of a synthetic wishlist item"""
+    return dict(make_product(i), user=f"CST{i % 1000}")
+
+
+def unslotted(cls) -> type:
+    """Returns a copy of a record class without __slots__"""
+    return type(cls.__name__, (), {"__init__": cls.__init__})
+
+
+def bytes_per_record(cls, fields: list) -> float:
+    """Measures the memory taken by the records built from the fields, per record"""
+    tracemalloc.start()
+    records = [cls(**f) for f in fields]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del records
+    return size / len(fields)
+
+
+def main():
+    max_rows = int(sys.argv[1]) if len(sys.argv) > 1 else SIZES[-1]
+    print(f"{'record':>8} | {'rows':>9} | {'dict (B)':>8} | {'slots (B)':>9}")
+    for cls, make in ((Sale, make_sale), (Product, make_product), (Wish, make_wish)):
+        for size in SIZES:
+            if size > max_rows:
+                break
+            fields = [make(i) for i in range(size)]
+            before = bytes_per_record(unslotted(cls), fields)
+            after = bytes_per_record(cls, fields)
+            print(f"{cls.__name__:>8} | {size:>9} | {before:8.0f} | {after:9.0f}")
+
+
+if __name__ == "__main__":
+    main()
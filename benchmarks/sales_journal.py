@@ -0,0 +1,77 @@
+"""Benchmark of the checkout sales write as the sales history grows.
+
+Compares appending to the sales journal with the previous approach of
+reading and rewriting the whole JSON array on every checkout.
+
+Run from the root of the repository:
+
+    python -m benchmarks.sales_journal [max history size]
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+
+from order_management.journal import SalesJournal
+
+CHECKOUTS = 20
+
+
+def make_sale(i: int) -> dict:
+    """Builds a synthetic sale record"""
+    return {
+        "id": f"S{i:x}",
+        "name": f"Name {i % 500}",
+        "quantity": 1 + i % 5,
+        "price": 10.0,
+        "purchase_price": 10.0 * (1 + i % 5),
+        "timestamp": 1690000000.0 + i,
+        "customerID": f"CST{i % 1000}",
+        "salesperson": f"AGT{i % 10}",
+        "prescriptionID": f"PHA{i % 5000}" if i % 3 == 0 else None,
+    }
+
+
+def rewrite_dump(outfile: str, sales: list):
+    """The previous read-modify-write of `Wrapper.dump`, for comparison"""
+    with open(outfile, "r") as f:
+        existing_sales = json.load(f)
+    with open(outfile, "w") as f:
+        json.dump(existing_sales + sales, f, indent=4)
+
+
+def main():
+    max_size = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    sizes = [size for size in (100, 10_000, 100_000, 1_000_000, 10_000_000) if size <= max_size]
+    checkout = [make_sale(i) for i in range(3)]
+
+    print(f"{'history':>10} | {'journal (ms)':>12} | {'rewrite (ms)':>12}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            journal = SalesJournal(os.path.join(tmp, "sales.jsonl"))
+            with open(journal.path, "w") as f:
+                for i in range(size):
+                    f.write(json.dumps(make_sale(i)) + "\n")
+
+            start = time.perf_counter()
+            for _ in range(CHECKOUTS):
+                journal.append(checkout)
+            appended = (time.perf_counter() - start) / CHECKOUTS
+
+            # rewriting is too slow to measure on very large histories
+            rewrite = float("nan")
+            if size <= 100_000:
+                legacy = os.path.join(tmp, "legacy.json")
+                with open(legacy, "w") as f:
+                    json.dump([make_sale(i) for i in range(size)], f, indent=4)
+                start = time.perf_counter()
+                rewrite_dump(legacy, checkout)
+                rewrite = time.perf_counter() - start
+
+        print(f"{size:>10} | {appended * 1e3:12.3f} | {rewrite * 1e3:12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Load test of the order service
+
+Starts the service on a copy of a synthetic stock, then several client
+processes each add random products to their cart and check out, as
+terminals would. Reports the checkouts per second, their latency and the
+number of batches the service saved them in, and checks that the stock
+taken matches the sales recorded.
+
+Run from the root of the repository:
+
+    python -m benchmarks.service_load [clients] [checkouts per client]
+"""
+
+import asyncio
+import contextlib
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+
+from order_management import BookRecords, Product, Stock
+from order_management.client import ServiceClient
+from order_management.service import OrderService
+
+PRODUCTS = 200
+QUANTITY = 1000
+
+
+def serve(data: str, address: str):
+    service = OrderService.load(
+        os.path.join(data, "products.json"),
+        os.path.join(data, "sales.json"),
+        os.path.join(data, "prescriptions.json"),
+    )
+    asyncio.run(service.run(address))
+
+
+def client(address: str, seed: int, checkouts: int) -> list:
+    """Checks out random carts, returns the latency of each checkout in seconds"""
+    rng = random.Random(seed)
+    latencies = []
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        service = ServiceClient(address)
+        service.call("login", agent=f"AGT{seed}")
+        codes = [product["code"] for product in service.call("products")]
+        for _ in range(checkouts):
+            for code in rng.sample(codes, rng.randint(1, 3)):
+                service.call("cart.add", productCode=code, quantity=rng.randint(1, 3))
+            start = time.perf_counter()
+            service.call("checkout", customerID=f"CST{seed}")
+            latencies.append(time.perf_counter() - start)
+            service.call("cart.clear")
+        service.close()
+    return latencies
+
+
+def main():
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    checkouts = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    with tempfile.TemporaryDirectory() as data:
+        stock_file = os.path.join(data, "products.json")
+        Stock(
+            [
+                Product(f"P{i}", f"Name {i}", "", "", QUANTITY, 1.0, "", False, "")
+                for i in range(PRODUCTS)
+            ]
+        ).dump(stock_file)
+        with open(os.path.join(data, "prescriptions.json"), "w") as f:
+            json.dump([], f)
+        open(os.path.join(data, "sales.jsonl"), "w").close()
+        address = os.path.join(data, "service.sock")
+
+        server = multiprocessing.Process(target=serve, args=(data, address))
+        server.start()
+        while not os.path.exists(address):
+            if not server.is_alive():
+                sys.exit("The service did not start")
+            time.sleep(0.01)
+
+        start = time.perf_counter()
+        with multiprocessing.Pool(clients) as pool:
+            results = pool.starmap(
+                client, [(address, seed, checkouts) for seed in range(clients)]
+            )
+        elapsed = time.perf_counter() - start
+        with contextlib.redirect_stdout(open(os.devnull, "w")):
+            stats = ServiceClient(address).call("stats")
+        server.terminate()
+        server.join()
+
+        latencies = sorted(latency for result in results for latency in result)
+        total = len(latencies)
+        print(f"{clients} clients, {total} checkouts in {elapsed:.2f} s ({total / elapsed:.0f}/s)")
+        print(
+            f"checkout latency: median {statistics.median(latencies) * 1000:.1f} ms,"
+            f" p99 {latencies[int(total * 0.99)] * 1000:.1f} ms"
+        )
+        print(
+            f"{stats['batches']} batches saved,"
+            f" {stats['checkouts'] / stats['batches']:.1f} checkouts per batch"
+        )
+
+        # the stock taken must match the sales recorded
+        sold = Counter()
+        for sale in BookRecords.load(os.path.join(data, "sales.json")).transactions:
+            sold[sale.name] += sale.quantity
+        for product in Stock.load(stock_file).products:
+            assert QUANTITY - product.quantity == sold[product.name], product.name
+
+
+if __name__ == "__main__":
+    main()
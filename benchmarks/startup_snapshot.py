@@ -0,0 +1,63 @@
+"""Startup of the stock and the sales records, from the JSON files and from their binary snapshots.
+
+Generates sales histories of growing lengths (see `benchmarks.generate`)
+and times `Stock.load` and `BookRecords.load` reading the JSON files, then
+reading the snapshots taken on a first load (see `order_management.snapshot`).
+Checks that the reports are the same.
+
+Run from the root of the repository:
+
+    python -m benchmarks.startup_snapshot [--sales 100000 1000000]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from benchmarks.generate import generate
+from benchmarks.parallel_analytics import reports
+from order_management import BookRecords, Stock
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sales", type=int, nargs="+", default=[100_000, 300_000, 1_000_000])
+    parser.add_argument("--products", type=int, default=20_000)
+    args = parser.parse_args()
+
+    print(f"{'sales':>10} | {'records JSON (s)':>16} | {'snapshot (s)':>12} | {'stock JSON (s)':>14} | {'snapshot (s)':>12}")
+    for sales in args.sales:
+        with tempfile.TemporaryDirectory() as tmp:
+            with contextlib.redirect_stdout(io.StringIO()):
+                sizes = generate(tmp, products=args.products, sales=sales, prescriptions=20_000, users=10_000)
+            path = os.path.join(tmp, "sales.json")
+            stock_file = os.path.join(tmp, "products.json")
+
+            books, books_time = timed(lambda: BookRecords.load(path, columnar=True))
+            # the first load takes the snapshots
+            BookRecords.load(path, snapshot=True)
+            Stock.load(stock_file, snapshot=True)
+            snapshot, snapshot_time = timed(lambda: BookRecords.load(path, snapshot=True))
+            assert reports(snapshot, sizes["agent"]) == reports(books, sizes["agent"]), "the reports differ"
+
+            stock, stock_time = timed(lambda: Stock.load(stock_file))
+            stock_snapshot, stock_snapshot_time = timed(lambda: Stock.load(stock_file, snapshot=True))
+            assert str(stock_snapshot) == str(stock), "the stocks differ"
+
+            print(
+                f"{sales:>10} | {books_time:>16.3f} | {snapshot_time:>12.3f} | "
+                f"{stock_time:>14.3f} | {stock_snapshot_time:>12.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
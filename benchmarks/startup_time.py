@@ -0,0 +1,133 @@
+"""Time to the first prompt of the application, with a short and a long sales history.
+
+Generates a data set for each length of history (see `benchmarks.generate`),
+starts `__main__.py` on it as a terminal would and measures the time until
+the main menu asks for a choice, then until the analytics menu does, the
+sales being loaded on the way there. Each start is repeated and the median
+is reported.
+
+It also starts the application once with `python -X importtime` and
+reports the modules imported before the main menu shows up, with the time
+spent importing them.
+
+Run from the root of the repository:
+
+    python -m benchmarks.startup_time [--sales 1000 1000000] [--repeat 5]
+"""
+
+import argparse
+import atexit
+import contextlib
+import io
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.generate import generate
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROMPT = b"Choose an option: "
+
+
+def wait_for(process: subprocess.Popen, marker: bytes, output: bytearray) -> float:
+    """Reads the output of the application until a marker appears, returns when it did"""
+    while marker not in output:
+        chunk = os.read(process.stdout.fileno(), 1 << 16)
+        if not chunk:
+            raise RuntimeError(f"the application exited: {output.decode()[-500:]}")
+        output.extend(chunk)
+    del output[: output.index(marker) + len(marker)]
+    return time.perf_counter()
+
+
+def imports(app: str) -> tuple:
+    """Starts the application up to the main menu with -X importtime
+
+    Returns: The modules imported, and the time spent importing them in ms
+    """
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    process = subprocess.Popen(
+        [sys.executable, "-X", "importtime", "__main__.py"],
+        cwd=app,
+        env=env,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    wait_for(process, PROMPT, bytearray())
+    # exits from the main menu, nothing is imported on the way out
+    _, stderr = process.communicate(b"3\n")
+    modules, total = [], 0
+    for line in stderr.decode().splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:") :].split("|")
+        modules.append(name.strip())
+        total += int(self_us)
+    return modules, total / 1000
+
+
+def start(app: str) -> tuple:
+    """Starts the application, returns the time to the main menu and to the analytics menu in ms"""
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    begin = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "__main__.py"],
+        cwd=app,
+        env=env,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+    )
+    output = bytearray()
+    main_menu = wait_for(process, PROMPT, output)
+    process.stdin.write(b"2\n")
+    process.stdin.flush()
+    analytics = wait_for(process, b"Analytics Menu:", output)
+    wait_for(process, PROMPT, output)
+    process.communicate(b"6\n3\n")
+    return (main_menu - begin) * 1000, (analytics - begin) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sales", type=int, nargs="+", default=[1_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'sales':>10} | {'main menu (ms)':>14} | {'analytics menu (ms)':>19}")
+    for sales in args.sales:
+        with tempfile.TemporaryDirectory() as tmp:
+            data = os.path.join(tmp, "data")
+            with contextlib.redirect_stdout(io.StringIO()):
+                generate(data, products=2_000, sales=sales, prescriptions=20_000, users=10_000)
+            shutil.copy(os.path.join(ROOT, "__main__.py"), tmp)
+
+            # the first start also takes the snapshots (see order_management/snapshot.py)
+            start(tmp)
+            times = [start(tmp) for _ in range(args.repeat)]
+            main_menu = statistics.median(main_menu for main_menu, _ in times)
+            analytics = statistics.median(analytics for _, analytics in times)
+            print(f"{sales:>10} | {main_menu:>14.0f} | {analytics:>19.0f}")
+
+    modules, total = imports(tmp_app())
+    own = [name for name in modules if name.startswith("order_management")]
+    print(f"\nbefore the main menu: {len(modules)} modules imported in {total:.0f} ms")
+    print(f"of the package: {', '.join(own)}")
+
+
+def tmp_app() -> str:
+    """Returns a directory with the application and a small data set, removed at exit"""
+    tmp = tempfile.mkdtemp()
+    atexit.register(shutil.rmtree, tmp, True)
+    with contextlib.redirect_stdout(io.StringIO()):
+        generate(os.path.join(tmp, "data"), products=2_000, sales=1_000, prescriptions=1_000, users=1_000)
+    shutil.copy(os.path.join(ROOT, "__main__.py"), tmp)
+    return tmp
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Benchmark of `Stock.getProductByID` as the catalog grows.
+
+Run from the root of the repository:
+
+    python -m benchmarks.stock_lookup
+"""
+
+import random
+import timeit
+
+from order_management import Stock, Product
+
+SIZES = [1_000, 10_000, 50_000, 100_000]
+LOOKUPS = 10_000
+
+
+def make_catalog(size: int) -> Stock:
+    """Builds a synthetic catalog of `size` products"""
+    products = [
+        Product(
+            code=f"P{i:08d}",
+            name=f"Name {i}",
+            brand=f"Brand {i % 100}",
+            description=f"Description {i}",
+            quantity=100,
+            price=float(i % 1000),
+            dosage_instruction="",
+            requires_prescription=i % 7 == 0,
+            category=f"Category {i % 20}",
+        )
+        for i in range(size)
+    ]
+    return Stock(products)
+
+
+def linear_lookup(stock: Stock, id: str) -> Product:
+    """The lookup as it was done before the index, for comparison"""
+    for product in stock.products:
+        if product.code == id:
+            return product
+    raise Exception("Product not found")
+
+
+def main():
+    rng = random.Random(0)
+    print(f"{'products':>10} | {'indexed (us)':>12} | {'linear (us)':>11}")
+    for size in SIZES:
+        stock = make_catalog(size)
+        codes = [rng.choice(stock.products).code for _ in range(LOOKUPS)]
+
+        indexed = timeit.timeit(
+            lambda: [stock.getProductByID(code) for code in codes], number=1
+        )
+        # the linear scan is too slow to run every lookup on big catalogs
+        sample = codes[:100]
+        linear = timeit.timeit(
+            lambda: [linear_lookup(stock, code) for code in sample], number=1
+        )
+        print(
+            f"{size:>10} | {indexed / LOOKUPS * 1e6:12.3f} | {linear / len(sample) * 1e6:11.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Write amplification of the stock update on checkout.
+
+Compares one `Stock.update` per cart line (each rewriting the whole
+catalog) with a single `Stock.updateMany` per checkout.
+
+Run from the root of the repository:
+
+    python -m benchmarks.stock_writes
+"""
+
+import os
+import tempfile
+import time
+
+from benchmarks.stock_lookup import make_catalog
+
+CATALOG_SIZE = 10_000
+CART_SIZES = [1, 5, 20, 50]
+
+
+def main():
+    print(f"catalog of {CATALOG_SIZE} products")
+    print(
+        f"{'cart lines':>10} | {'per line (MB)':>13} | {'batched (MB)':>12}"
+        f" | {'per line (ms)':>13} | {'batched (ms)':>12}"
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        stock = make_catalog(CATALOG_SIZE)
+        stock.filename = os.path.join(tmp, "products.json")
+        stock.dump(stock.filename)
+        file_size = os.path.getsize(stock.filename)
+
+        for lines in CART_SIZES:
+            codes = [product.code for product in stock.products[:lines]]
+
+            start = time.perf_counter()
+            for code in codes:
+                stock.update(code, -1)
+            per_line = time.perf_counter() - start
+
+            start = time.perf_counter()
+            stock.updateMany({code: -1 for code in codes})
+            batched = time.perf_counter() - start
+
+            print(
+                f"{lines:>10} | {lines * file_size / 1e6:13.2f} | {file_size / 1e6:12.2f}"
+                f" | {per_line * 1e3:13.1f} | {batched * 1e3:12.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Checkout and report latency with the JSON files and with a SQLite database.
+
+Run from the root of the repository:
+
+    python -m benchmarks.storage_backends [sales]
+"""
+
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks.sales_journal import make_sale
+from benchmarks.stock_lookup import make_catalog
+from order_management import BookRecords, Cart, Stock, Wrapper
+from order_management.migrate import migrate
+
+CATALOG_SIZE = 10_000
+CHECKOUTS = 20
+CART_LINES = 5
+
+
+def timed(call) -> float:
+    """Returns the time a call takes, in milliseconds"""
+    start = time.perf_counter()
+    call()
+    return (time.perf_counter() - start) * 1e3
+
+
+def checkout_latency(stock_file: str, sales_file: str) -> float:
+    """Average latency of a checkout with the given stock and sales files"""
+    stock = Stock.load(stock_file)
+    wrap = Wrapper(stock, "AGT1", sales_file=sales_file)
+    cart = Cart(stock)
+    products = [p for p in stock.products if not p.requires_prescription]
+    elapsed = 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(CHECKOUTS):
+            for product in products[i * CART_LINES : (i + 1) * CART_LINES]:
+                cart.add(product.code, 1)
+            elapsed += timed(lambda: wrap.checkout(cart, "CST1"))
+    assert len(wrap.sales) == CHECKOUTS * CART_LINES, "a checkout failed"
+    return elapsed / CHECKOUTS
+
+
+def report_latencies(books: BookRecords) -> dict:
+    """Latency of each report, in milliseconds"""
+    return {
+        "totalTransactions": timed(books.totalTransactions),
+        "reportOnPrescriptions": timed(books.reportOnPrescriptions),
+        "purchasesByUser": timed(lambda: books.purchasesByUser("CST42")),
+        "salesByAgent": timed(lambda: books.salesByAgent("AGT3")),
+        "topNSales": timed(
+            lambda: books.topNSales(datetime(2023, 7, 22), datetime(2023, 7, 23))
+        ),
+    }
+
+
+def main():
+    sales = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    with tempfile.TemporaryDirectory() as data:
+        make_catalog(CATALOG_SIZE).dump(os.path.join(data, "products.json"))
+        with open(os.path.join(data, "sales.jsonl"), "w") as f:
+            for i in range(sales):
+                f.write(json.dumps(make_sale(i)) + "\n")
+        with open(os.path.join(data, "prescriptions.json"), "w") as f:
+            json.dump([], f)
+        db = os.path.join(data, "pharmacy.db")
+        with contextlib.redirect_stdout(io.StringIO()):
+            migrate(data, db)
+        json_sales = os.path.join(data, "sales.json")
+
+        print(f"{CATALOG_SIZE} products, {sales} sales")
+        print(f"{'(ms)':>22} | {'json':>9} | {'sqlite':>9}")
+        print(
+            f"{'checkout':>22} | {checkout_latency(os.path.join(data, 'products.json'), json_sales):9.2f}"
+            f" | {checkout_latency(db, db):9.2f}"
+        )
+
+        loaded = []
+        load = timed(lambda: loaded.append(BookRecords.load(json_sales)))
+        print(f"{'load sales':>22} | {load:9.1f} | {0:9.1f}")
+        json_reports = report_latencies(loaded[0])
+        sqlite_reports = report_latencies(BookRecords.load(db, streaming=True))
+        for name, latency in json_reports.items():
+            print(f"{name:>22} | {latency:9.2f} | {sqlite_reports[name]:9.2f}")
+
+
+if __name__ == "__main__":
+    main()
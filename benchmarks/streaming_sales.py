@@ -0,0 +1,56 @@
+"""Peak memory and time of the reports with loaded and streamed sales.
+
+Run from the root of the repository:
+
+    python -m benchmarks.streaming_sales [rows]
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from benchmarks.sales_journal import make_sale
+from order_management import BookRecords
+
+
+def run(path: str, streaming: bool):
+    """Loads the records and runs the reports, returns the outputs, time and peak memory"""
+    tracemalloc.start()
+    began = time.perf_counter()
+    books = BookRecords.load(path, streaming=streaming)
+    outputs = [
+        f"{books.totalTransactions():.2f}",
+        books.reportOnPrescriptions(),
+        books.purchasesByUser("CST42"),
+        books.topNSales(start=datetime(2023, 7, 22), end=datetime(2023, 7, 23)),
+    ]
+    elapsed = time.perf_counter() - began
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return outputs, elapsed, peak
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "sales.jsonl")
+        with open(path, "w") as f:
+            for i in range(rows):
+                f.write(json.dumps(make_sale(i)) + "\n")
+        print(f"{rows} sales, {os.path.getsize(path) / 1e6:.1f} MB journal")
+
+        loaded, loaded_time, loaded_peak = run(path, streaming=False)
+        streamed, streamed_time, streamed_peak = run(path, streaming=True)
+        assert loaded == streamed, "the reports differ between the modes"
+
+    print(f"{'':>10} | {'peak (MB)':>9} | {'time (s)':>8}")
+    print(f"{'loaded':>10} | {loaded_peak / 1e6:9.1f} | {loaded_time:8.2f}")
+    print(f"{'streamed':>10} | {streamed_peak / 1e6:9.1f} | {streamed_time:8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Stress test of concurrent checkouts from several processes.
+
+Every process loads its own stock, as a terminal does, then checks out
+random carts against the shared files. The demand is larger than the
+stock. At the end the quantities taken from the stock must match the
+sales recorded, and no quantity may be negative.
+
+Run from the root of the repository:
+
+    python -m benchmarks.stress_checkout [processes] [checkouts per process]
+"""
+
+import contextlib
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+
+from order_management import BookRecords, Cart, Product, Stock, Wrapper
+from order_management.migrate import migrate
+
+PRODUCTS = 10
+QUANTITY = 500
+
+
+def worker(stock_file: str, sales_file: str, seed: int, checkouts: int) -> Counter:
+    """Runs checkouts in a process, returns the quantities it sold by product name"""
+    rng = random.Random(seed)
+    stock = Stock.load(stock_file)
+    wrap = Wrapper(stock, f"AGT{seed}", sales_file=sales_file)
+    cart = Cart(stock)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(checkouts):
+            # filled directly, the quantities known by this process are stale on purpose
+            cart.products = {
+                product.code: rng.randint(1, 5)
+                for product in rng.sample(stock.products, rng.randint(1, 3))
+            }
+            wrap.checkout(cart, f"CST{seed}")
+            cart.clear()
+    sold = Counter()
+    for sale in wrap.sales:
+        sold[sale["name"]] += sale["quantity"]
+    return sold
+
+
+def run(stock_file: str, sales_file: str, processes: int, checkouts: int):
+    """Runs the workers against a backend and checks the result"""
+    initial = {p.name: p.quantity for p in Stock.load(stock_file).products}
+
+    start = time.perf_counter()
+    with multiprocessing.Pool(processes) as pool:
+        results = pool.starmap(
+            worker,
+            [(stock_file, sales_file, seed, checkouts) for seed in range(processes)],
+        )
+    elapsed = time.perf_counter() - start
+
+    reported = sum(results, Counter())
+    recorded = Counter()
+    for sale in BookRecords.load(sales_file).transactions:
+        recorded[sale.name] += sale.quantity
+    final = {p.name: p.quantity for p in Stock.load(stock_file).products}
+
+    for name, quantity in initial.items():
+        taken = quantity - final[name]
+        assert final[name] >= 0, f"{name} oversold: {final[name]}"
+        assert taken == recorded[name] == reported[name], (
+            f"{name}: {taken} taken from the stock, {recorded[name]} recorded,"
+            f" {reported[name]} sold"
+        )
+    total = processes * checkouts
+    print(
+        f"{total} checkouts in {elapsed:.1f} s ({total / elapsed:.0f}/s),"
+        f" {sum(recorded.values())} units sold of {sum(initial.values())}: no lost update"
+    )
+
+
+def main():
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    checkouts = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    with tempfile.TemporaryDirectory() as data:
+        products = [
+            Product(f"P{i}", f"Name {i}", "", "", QUANTITY, 1.0, "", False, "")
+            for i in range(PRODUCTS)
+        ]
+        stock_file = os.path.join(data, "products.json")
+        Stock(products).dump(stock_file)
+        with open(os.path.join(data, "prescriptions.json"), "w") as f:
+            json.dump([], f)
+        open(os.path.join(data, "sales.jsonl"), "w").close()
+        db = os.path.join(data, "pharmacy.db")
+        with contextlib.redirect_stdout(open(os.devnull, "w")):
+            migrate(data, db)
+
+        print(f"json, {processes} processes:", end=" ", flush=True)
+        run(stock_file, os.path.join(data, "sales.json"), processes, checkouts)
+        print(f"sqlite, {processes} processes:", end=" ", flush=True)
+        run(db, db, processes, checkouts)
+
+
+if __name__ == "__main__":
+    main()
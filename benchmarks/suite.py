@@ -0,0 +1,305 @@
+"""Benchmark suite of the order and analytics paths.
+
+Generates a data set (see `benchmarks.generate`), then measures through
+the public classes, without the menu:
+
+- load: the accounts and the logged in user, the stock (also from its
+  snapshot), the records in each storage mode, a wishlist and the first prescription lookup
+- cart: adding, showing, its cost, removing and clearing
+- checkout: latency of `Wrapper.checkout` on the JSON files (and SQLite)
+- analytics: every report of `BookRecords`, in each storage mode
+- memory: peak allocations of loading the stock and the records
+
+The results are written as JSON, to compare commits. Run from the root
+of the repository:
+
+    python -m benchmarks.suite --output before.json
+    python -m benchmarks.suite --output after.json
+    python -m benchmarks.suite --compare before.json after.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List
+
+from benchmarks.generate import generate
+from order_management import (
+    BookRecords,
+    Cart,
+    PrescriptionStore,
+    Stock,
+    UserManagement,
+    Wishlist,
+    Wrapper,
+)
+
+MODES = {
+    "list": {},
+    "columnar": {"columnar": True},
+    "streaming": {"streaming": True},
+    # columnar, from the binary snapshot taken on the first load
+    "snapshot": {"snapshot": True},
+}
+
+
+def timed(function: Callable, repeat: int = 3) -> Dict[str, float]:
+    """Returns the median and the best time of a function, in ms"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append((time.perf_counter() - start) * 1000)
+    return {"ms": statistics.median(times), "min_ms": min(times)}
+
+
+def latencies(times: List[float]) -> Dict[str, float]:
+    """Summarizes a list of latencies, in ms"""
+    times = sorted(times)
+    return {
+        "count": len(times),
+        "p50_ms": times[len(times) // 2],
+        "p95_ms": times[int(len(times) * 0.95)],
+        "max_ms": times[-1],
+    }
+
+
+def peak(function: Callable) -> Dict[str, int]:
+    """Returns the peak of the memory allocated by a function, in bytes"""
+    tracemalloc.start()
+    try:
+        result = function()
+        _, peak_bytes = tracemalloc.get_traced_memory()
+        del result
+    finally:
+        tracemalloc.stop()
+    return {"peak_bytes": peak_bytes}
+
+
+def bench_load(data: str, sizes: dict, results: dict):
+    def users():
+        profiles = UserManagement.load(os.path.join(data, "credentials.txt"))
+        profiles.status_file = os.path.join(data, ".logged_in")
+        return profiles.get_logged_in_user()
+
+    results["load.users"] = timed(users)
+    results["load.stock"] = timed(lambda: Stock.load(os.path.join(data, "products.json")))
+    results["load.stock.snapshot"] = timed(
+        lambda: Stock.load(os.path.join(data, "products.json"), snapshot=True)
+    )
+    for mode, options in MODES.items():
+        results[f"load.records.{mode}"] = timed(
+            lambda: BookRecords.load(os.path.join(data, "sales.json"), **options)
+        )
+    results["load.wishlist"] = timed(
+        lambda: Wishlist("customer0", os.path.join(data, "wishlist.json"))
+    )
+    results["load.prescription"] = timed(
+        lambda: PrescriptionStore(os.path.join(data, "prescriptions.json")).getPrescriptionByID("PHA0")
+    )
+
+
+def sellable(stock: Stock) -> List[str]:
+    """Returns the codes of the products that can be sold without a prescription"""
+    return [product.code for product in stock.products if not product.requires_prescription]
+
+
+def bench_cart(data: str, sizes: dict, results: dict, operations: int = 1000):
+    stock = Stock.load(os.path.join(data, "products.json"))
+    codes = sellable(stock)
+    rng = random.Random(0)
+    cart = Cart(stock)
+    picked = [rng.choice(codes) for _ in range(operations)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        add = timed(lambda: [cart.add(code, 1) for code in picked], repeat=1)
+        show = timed(lambda: str(cart), repeat=5)
+        cost = timed(lambda: cart.cost, repeat=5)
+        remove = timed(lambda: [cart.remove(code) for code in picked], repeat=1)
+        for code in picked[:10]:
+            cart.add(code, 1)
+        clear = timed(cart.clear, repeat=1)
+    results["cart.add"] = {"us": add["ms"] * 1000 / operations}
+    results["cart.show"] = dict(show, lines=len(set(picked)))
+    results["cart.cost"] = dict(cost, lines=len(set(picked)))
+    results["cart.remove"] = {"us": remove["ms"] * 1000 / operations}
+    results["cart.clear"] = {"us": clear["ms"] * 1000}
+
+
+def bench_checkout(
+    data: str, sizes: dict, results: dict, name: str, checkouts: int = 100, lines: int = 3
+):
+    stock_file = sales_file = os.path.join(data, "pharmacy.db")
+    if name == "json":
+        stock_file = os.path.join(data, "products.json")
+        sales_file = os.path.join(data, "sales.json")
+    stock = Stock.load(stock_file)
+    codes = sellable(stock)
+    rng = random.Random(0)
+    wrap = Wrapper(stock, sizes["agent"], sales_file=sales_file)
+    cart = Cart(stock)
+    times = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(checkouts):
+            for code in rng.sample(codes, lines):
+                cart.add(code, 1)
+            start = time.perf_counter()
+            wrap.checkout(cart, f"customer{i}")
+            times.append((time.perf_counter() - start) * 1000)
+    assert len(wrap.sales) == checkouts * lines, "some checkouts failed"
+    results[f"checkout.{name}"] = dict(latencies(times), lines=lines)
+
+
+def bench_analytics(data: str, sizes: dict, results: dict, modes: Dict[str, tuple]):
+    # the first month of the generated sales
+    start = datetime(2023, 1, 2)
+    for mode, (path, options) in modes.items():
+        books = BookRecords.load(path, **options)
+        # the reports are rendered to a buffer thrown away
+        null = io.StringIO
+
+        results[f"analytics.{mode}.total"] = timed(books.totalTransactions)
+        results[f"analytics.{mode}.prescriptions"] = timed(
+            lambda: books.renderPrescriptions(null())
+        )
+        results[f"analytics.{mode}.user"] = timed(
+            lambda: books.userRecords(customerID="customer1").render(null())
+        )
+        results[f"analytics.{mode}.agent"] = timed(
+            lambda: books.agentRecords(salesperson=sizes["agent"]).render(null())
+        )
+        results[f"analytics.{mode}.top"] = timed(lambda: books.topNRecords().render(null()))
+        results[f"analytics.{mode}.first_page"] = timed(
+            lambda: books.render(null(), page_size=50)
+        )
+        results[f"analytics.{mode}.month"] = timed(
+            lambda: books.salesBetween(start, start + timedelta(days=30)).totalTransactions()
+        )
+
+
+def bench_memory(data: str, sizes: dict, results: dict):
+    results["memory.stock"] = peak(lambda: Stock.load(os.path.join(data, "products.json")))
+    for mode, options in MODES.items():
+        results[f"memory.records.{mode}"] = peak(
+            lambda: BookRecords.load(os.path.join(data, "sales.json"), **options)
+        )
+
+
+def commit() -> str:
+    """Returns the commit of the working tree, if any"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args) -> dict:
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        base = os.path.join(tmp, "base")
+        print("generating the data...", file=sys.stderr)
+        with contextlib.redirect_stdout(io.StringIO()):
+            sizes = generate(
+                base,
+                products=args.products,
+                sales=args.sales,
+                prescriptions=args.prescriptions,
+                users=args.users,
+                seed=args.seed,
+                sqlite=args.sqlite,
+            )
+
+        print("load, cart...", file=sys.stderr)
+        bench_load(base, sizes, results)
+        bench_cart(base, sizes, results)
+
+        print("checkout...", file=sys.stderr)
+        # the checkouts modify the data, they run on copies
+        backends = ["json", "sqlite"] if args.sqlite else ["json"]
+        for backend in backends:
+            copy = os.path.join(tmp, backend)
+            shutil.copytree(base, copy)
+            bench_checkout(copy, sizes, results, backend, checkouts=args.checkouts)
+
+        print("analytics...", file=sys.stderr)
+        sales = os.path.join(base, "sales.json")
+        modes = {mode: (sales, options) for mode, options in MODES.items()}
+        if args.sqlite:
+            modes["sqlite"] = (os.path.join(base, "pharmacy.db"), {"streaming": True})
+        bench_analytics(base, sizes, results, modes)
+
+        print("memory...", file=sys.stderr)
+        bench_memory(base, sizes, results)
+
+    return {
+        "commit": commit(),
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "sizes": sizes,
+        "results": results,
+    }
+
+
+def compare(before_file: str, after_file: str):
+    """Prints the ratio of each result of a run to the same result of another run"""
+    with open(before_file, "r") as f:
+        before = json.load(f)
+    with open(after_file, "r") as f:
+        after = json.load(f)
+    if before["sizes"] != after["sizes"]:
+        print("warning: the runs used different data sizes")
+    print(f"{before['commit']} -> {after['commit']}")
+    for name, result in after["results"].items():
+        previous = before["results"].get(name)
+        if previous is None:
+            continue
+        # the first measure of a result is the one compared, such as ms or p50_ms
+        key = next(key for key, value in result.items() if key != "count" and key in previous)
+        ratio = result[key] / previous[key] if previous[key] else float("inf")
+        print(f"{name:>32} {key:>10} {previous[key]:>14.3f} {result[key]:>14.3f} {ratio:>7.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=2_000)
+    parser.add_argument("--sales", type=int, default=200_000)
+    parser.add_argument("--prescriptions", type=int, default=20_000)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--checkouts", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--sqlite", action="store_true", help="also measure the SQLite backend")
+    parser.add_argument("--output", help="file to write the results to (default: stdout)")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="compare two results files")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    report = json.dumps(run(args), indent=4)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Startup and identity lookups with many accounts.
+
+Compares reading all the credentials at startup and scanning them on
+each lookup, with the `UserManagement` index, which reads the file only
+up to the accounts looked up and caches the logged in user.
+
+Run from the root of the repository:
+
+    python -m benchmarks.user_lookup
+"""
+
+import os
+import tempfile
+import time
+
+from order_management import User, UserManagement
+
+ACCOUNTS = 100_000
+LOOKUPS = 1000
+
+
+def timed(function, *args) -> float:
+    start = time.perf_counter()
+    function(*args)
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        credentials = os.path.join(tmp, "credentials.txt")
+        status = os.path.join(tmp, ".logged_in")
+        with open(credentials, "w") as f:
+            for i in range(ACCOUNTS):
+                role = "salesperson" if i % 100 == 0 else "normal"
+                f.write(f"user{i}:{'0' * 64}:{'1' * 16}:User {i}:{role}:0\n")
+        # a pharmacist in the middle of the file
+        with open(status, "w") as f:
+            f.write(f"user{ACCOUNTS // 2}\n")
+
+        def load_all():
+            with open(credentials, "r") as f:
+                users = [
+                    User(elements[0], elements[3], elements[4], bool(elements[5]))
+                    for line in f.readlines()
+                    if (elements := line.strip().split(":"))
+                ]
+            return users
+
+        def scan(users):
+            with open(status, "r") as f:
+                username = f.readline().strip()
+            for user in users:
+                if user.username == username:
+                    return user
+
+        users = load_all()
+        full_startup = timed(lambda: scan(load_all()))
+        full_lookup = timed(lambda: [scan(users) for _ in range(LOOKUPS)]) / LOOKUPS
+
+        profiles = None
+
+        def startup():
+            nonlocal profiles
+            profiles = UserManagement.load(credentials)
+            profiles.status_file = status
+            profiles.get_logged_in_user()
+
+        indexed_startup = timed(startup)
+        indexed_lookup = (
+            timed(lambda: [profiles.get_logged_in_user() for _ in range(LOOKUPS)])
+            / LOOKUPS
+        )
+        details = timed(profiles.get_user_details, f"user{ACCOUNTS - 1}")
+
+        print(f"{ACCOUNTS} accounts, the logged in one in the middle of the file")
+        print(f"{'':>28} | {'scan (ms)':>10} | {'index (ms)':>10}")
+        print(f"{'startup and log in':>28} | {full_startup:>10.1f} | {indexed_startup:>10.1f}")
+        print(f"{'logged in user (checkout)':>28} | {full_lookup:>10.3f} | {indexed_lookup:>10.4f}")
+        print(f"{'first lookup of the last one':>28} | {'':>10} | {details:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Wishlist load and update with many users.
+
+Compares the single file of all the wishlists, read entirely to load one
+user's and rewritten on each change, with the files per user of
+`JSONWishlist`.
+
+Run from the root of the repository:
+
+    python -m benchmarks.wishlist_users
+"""
+
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.stock_lookup import make_catalog
+from order_management import Wishlist
+from order_management.atomic import atomic_write
+
+USERS = 20_000
+ITEMS_PER_USER = 10
+
+
+def timed(function, *args) -> float:
+    start = time.perf_counter()
+    function(*args)
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    products = make_catalog(1000).products
+    records = [
+        dict(products[(u * 7 + i) % len(products)].to_dict(), user=f"user{u}")
+        for u in range(USERS)
+        for i in range(ITEMS_PER_USER)
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "wishlist.json")
+        with open(path, "w") as f:
+            json.dump(records, f, indent=4)
+        print(f"{USERS} users, {len(records)} items, {os.path.getsize(path) / 1e6:.0f} MB")
+
+        def load_all(user):
+            with open(path, "r") as f:
+                return [record for record in json.load(f) if record["user"] == user]
+
+        def save_all(user, items):
+            with open(path, "r") as f:
+                data = [record for record in json.load(f) if record["user"] != user]
+            atomic_write(path, json.dumps(data + items, indent=4))
+
+        single_load = timed(load_all, "user42")
+        single_save = timed(save_all, "user42", load_all("user42"))
+
+        split = timed(Wishlist, "user0", path)
+        wishlist = Wishlist("user42", path)
+        sharded_load = timed(Wishlist, "user42", path)
+        product = products[-1]
+        with contextlib.redirect_stdout(io.StringIO()):
+            sharded_add = timed(wishlist.add_to_wishlist, product)
+            sharded_remove = timed(wishlist.remove_from_wishlist, product)
+        sharded_contains = timed(wishlist.__contains__, product)
+
+        print(f"{'':>22} | {'single file (ms)':>16} | {'per user (ms)':>13}")
+        print(f"{'load a wishlist':>22} | {single_load:>16.1f} | {sharded_load:>13.2f}")
+        print(f"{'add / remove':>22} | {single_save:>16.1f} | {max(sharded_add, sharded_remove):>13.2f}")
+        print(f"{'contains':>22} | {'':>16} | {sharded_contains:>13.4f}")
+        print(f"splitting the single file once: {split:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,35 @@
-from .stock import Stock, Product
-from .cart import Cart
-from .wrapper import Wrapper
-from .wishlist import Wishlist
-from .prescription import Prescription
-from .books import BookRecords, Sale
-from .user_management import UserManagement, User
-from .menu import Menu
+import importlib
+
+# the module defining each name of the package, imported on first use so that
+# a terminal only imports what it needs before showing its first prompt
+_EXPORTS = {
+    "Stock": ".stock",
+    "Product": ".product",
+    "Cart": ".cart",
+    "CartLine": ".cart",
+    "Wrapper": ".wrapper",
+    "Wishlist": ".wishlist",
+    "Prescription": ".prescription",
+    "PrescriptionStore": ".prescription",
+    "BookRecords": ".books",
+    "Sale": ".sale",
+    "UserManagement": ".user_management",
+    "User": ".user",
+    "Menu": ".menu",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    # later lookups find it directly
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
@@ -0,0 +1,49 @@
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import IO, Iterator
+
+
+@contextmanager
+def atomic_open(path: str, mode: str = "w") -> Iterator[IO]:
+    """Opens a file to replace so that it is never seen partially written
+
+    The content is written to a temporary file in the same directory,
+    which is synced to disk and renamed over the target when the block
+    exits. If the block raises, the target is left untouched.
+
+    Args:
+        path: path to the file to replace
+        mode: "w" for text or "wb" for binary content
+    """
+
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(
+        dir=directory, prefix="." + os.path.basename(path) + "-", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, mode) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates the file readable by the owner only
+        try:
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o777)
+        except FileNotFoundError:
+            os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except:
+        os.remove(tmp_path)
+        raise
+
+
+def atomic_write(path: str, data: str):
+    """Replaces the content of a file so that it is never seen partially written
+
+    Args:
+        path: path to the file to replace
+        data: the new content of the file
+    """
+
+    with atomic_open(path) as f:
+        f.write(data)
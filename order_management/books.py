@@ -1,21 +1,375 @@
 from __future__ import annotations
 
-import json
+import bisect
+import heapq
+import io
 from datetime import datetime
+from array import array
+from itertools import islice
 
-from typing import List
+from typing import Dict, Iterable, Iterator, List, TextIO, Tuple
+from .columnar import ColumnarSales
+from .metrics import instrumented
+from .report import renderPrescriptions, renderRecords
 from .sale import Sale
+from .snapshot import packArray, readSnapshot, snapshotPath, unpackArray, writeSnapshot
+from .storage import isDatabase, salesJournal, salesScan
+from .stream import SaleScan
+
+# the snapshot of the records is taken again once that much of the journal was read past it
+SNAPSHOT_MIN_BYTES = 1 << 20
+
+
+def _packIndex(index: Dict[str, List[int]]) -> Tuple:
+    """Returns posting lists as saved in a snapshot: their keys, and their rows one after the other"""
+    offsets = array("q", [0])
+    rows = array("q")
+    for key_rows in index.values():
+        rows.extend(key_rows)
+        offsets.append(len(rows))
+    return list(index), packArray(offsets), packArray(rows)
+
+
+def _unpackIndex(packed: Tuple) -> Dict[str, array]:
+    """Returns posting lists saved in a snapshot by `_packIndex`, as arrays of rows"""
+    keys, offsets, rows = packed
+    offsets, rows = unpackArray(offsets), unpackArray(rows)
+    return {key: rows[offsets[i] : offsets[i + 1]] for i, key in enumerate(keys)}
 
 
 class BookRecords:
     """A record of all the sales made through the application.
 
+    The transactions are normally held in memory and indexed. They can also
+    be given as a `SaleScan` (any other iterable than a list is wrapped in
+    one), in which case every report queries them again, in constant memory
+    apart from its result.
+
     Attributes:
-        transactions: a list of the transactions
+        transactions: a list of the transactions, a `ColumnarSales` store or a `SaleScan`
     """
 
-    def __init__(self, transactions: List[Sale]) -> None:
+    def __init__(self, transactions: List[Sale], columnar: bool = False) -> None:
+        # the journal the records were loaded from, to follow the sales recorded by other processes
+        self._journal = None
+        self._journal_id = None
+        # the timestamp of the first sales followed in the journal, if not all of them
+        self._since = None
+        self._build(transactions, columnar)
+
+    def _build(self, transactions: List[Sale], columnar: bool):
+        """Sets the transactions and builds the indexes and totals over them"""
+        if columnar and not isinstance(transactions, ColumnarSales):
+            transactions = ColumnarSales(transactions)
+        elif not isinstance(transactions, (list, ColumnarSales, SaleScan)):
+            transactions = SaleScan(transactions)
         self.transactions = transactions
+        if self.streaming:
+            return
+
+        # Posting lists: the rows of the transactions for each customer, agent and prescription
+        self._by_customer: Dict[str, List[int]] = {}
+        self._by_agent: Dict[str, List[int]] = {}
+        self._by_prescription: Dict[str, List[int]] = {}
+
+        # Running totals of the purchase prices, overall and for each customer, agent and prescription
+        self._total = 0
+        self._customer_totals: Dict[str, float] = {}
+        self._agent_totals: Dict[str, float] = {}
+        self._prescription_totals: Dict[str, float] = {}
+
+        if self.columnar:
+            keys = zip(
+                transactions.customerID.decoded(),
+                transactions.salesperson.decoded(),
+                transactions.prescriptionID.decoded(),
+                transactions.purchase_price,
+            )
+        else:
+            keys = (
+                (t.customerID, t.salesperson, t.prescriptionID, t.purchase_price)
+                for t in transactions
+            )
+        for idx, (customerID, salesperson, prescriptionID, purchase_price) in enumerate(
+            keys
+        ):
+            self._index(idx, customerID, salesperson, prescriptionID, purchase_price)
+
+        # The rows sorted by timestamp, next to their sorted timestamps for binary searches
+        if self.columnar:
+            timestamps = transactions.timestamp
+        else:
+            timestamps = [transaction.timestamp for transaction in transactions]
+        self._rows_by_time: List[int] = sorted(
+            range(len(timestamps)), key=timestamps.__getitem__
+        )
+        self._times: List[float] = [timestamps[idx] for idx in self._rows_by_time]
+
+    def _index(
+        self,
+        idx: int,
+        customerID: str,
+        salesperson: str,
+        prescriptionID: str,
+        purchase_price: float,
+    ):
+        """Adds a row of the transactions to the posting lists and the totals"""
+        self._by_customer.setdefault(customerID, []).append(idx)
+        self._by_agent.setdefault(salesperson, []).append(idx)
+        self._total += purchase_price
+        self._customer_totals[customerID] = (
+            self._customer_totals.get(customerID, 0) + purchase_price
+        )
+        self._agent_totals[salesperson] = (
+            self._agent_totals.get(salesperson, 0) + purchase_price
+        )
+        if prescriptionID is not None:
+            self._by_prescription.setdefault(prescriptionID, []).append(idx)
+            self._prescription_totals[prescriptionID] = (
+                self._prescription_totals.get(prescriptionID, 0) + purchase_price
+            )
+
+    def _pack(self) -> Dict:
+        """Returns the columnar transactions with their indexes and totals, as saved in a snapshot"""
+        return {
+            "transactions": self.transactions.pack(),
+            "by_customer": _packIndex(self._by_customer),
+            "by_agent": _packIndex(self._by_agent),
+            "by_prescription": _packIndex(self._by_prescription),
+            "totals": (
+                self._total,
+                self._customer_totals,
+                self._agent_totals,
+                self._prescription_totals,
+            ),
+            "rows_by_time": packArray(array("q", self._rows_by_time)),
+            "times": packArray(array("d", self._times)),
+        }
+
+    def _unpack(self, state: Dict):
+        """Sets the transactions, indexes and totals saved in a snapshot by `_pack`
+
+        The posting lists and the rows sorted by time come back as arrays,
+        which are searched and appended to like the lists they replace.
+        """
+        self.transactions = ColumnarSales.unpack(state["transactions"])
+        self._by_customer = _unpackIndex(state["by_customer"])
+        self._by_agent = _unpackIndex(state["by_agent"])
+        self._by_prescription = _unpackIndex(state["by_prescription"])
+        (
+            self._total,
+            self._customer_totals,
+            self._agent_totals,
+            self._prescription_totals,
+        ) = state["totals"]
+        self._rows_by_time = unpackArray(state["rows_by_time"])
+        self._times = unpackArray(state["times"])
+
+    @classmethod
+    def _loadSnapshot(cls, journal) -> BookRecords:
+        """Loads columnar records from the snapshot kept next to a journal, then reads the sales appended since
+
+        The snapshot is only used if it was taken from that same journal,
+        and is taken again when it is missing or far behind the journal.
+        """
+        journal.migrate()
+        path = snapshotPath(journal.path)
+        journal_id = journal.identity()
+        state = readSnapshot(path)
+        if (
+            state is not None
+            and state["journal"] == journal_id[:2]
+            and state["offset"] <= journal_id[2]
+        ):
+            records = cls([], columnar=True)
+            records._unpack(state)
+            offset = state["offset"]
+            for transaction in journal.read(offset):
+                records.append(Sale(**transaction))
+        else:
+            transactions = ColumnarSales()
+            for transaction in journal.read():
+                transactions.appendRecord(transaction)
+            records = cls(transactions)
+            offset = None
+
+        if offset is None or journal.offset - offset >= SNAPSHOT_MIN_BYTES:
+            state = records._pack()
+            state["journal"] = journal_id[:2]
+            state["offset"] = journal.offset
+            try:
+                writeSnapshot(path, state)
+            except OSError:
+                # the snapshot only saves time, the records were loaded anyway
+                pass
+        return records
+
+    def append(self, transaction: Sale):
+        """Adds a new sale to the records
+
+        Args:
+            transaction: the sale to add
+        """
+        if self.streaming:
+            raise Exception("Streamed records can't be modified")
+        idx = len(self.transactions)
+        self.transactions.append(transaction)
+        self._index(
+            idx,
+            transaction.customerID,
+            transaction.salesperson,
+            transaction.prescriptionID,
+            transaction.purchase_price,
+        )
+
+        # Sales mostly come in time order, otherwise insert after the ones with the same timestamp
+        if not self._times or transaction.timestamp >= self._times[-1]:
+            self._times.append(transaction.timestamp)
+            self._rows_by_time.append(idx)
+        else:
+            pos = bisect.bisect_right(self._times, transaction.timestamp)
+            self._times.insert(pos, transaction.timestamp)
+            self._rows_by_time.insert(pos, idx)
+
+    def extend(self, transactions: Iterable[Sale]):
+        """Adds new sales to the records
+
+        Args:
+            transactions: the sales to add
+        """
+        for transaction in transactions:
+            self.append(transaction)
+
+    def record(self, path: str, start: int, end: int, transactions: List[Sale]):
+        """Adds sales that this process has just appended to a sales journal
+
+        The sales are added directly when nothing else was written to the
+        journal since the records were last read, otherwise the journal is
+        read again from where the records stopped.
+
+        Args:
+            path: path to the journal the sales were written to
+            start: position in the journal where the sales start
+            end: position in the journal where the sales end
+            transactions: the sales written
+        """
+        if self.streaming:
+            # the journal is read again on every report anyway
+            return
+        if self._journal is None:
+            self.extend(transactions)
+        elif path == self._journal.path:
+            if start == self._journal.offset:
+                self.extend(transactions)
+                self._journal.offset = end
+                self._journal_id = self._journal_id[:2] + (end,)
+            else:
+                self.refresh()
+
+    def refresh(self):
+        """Reads the sales recorded in the journal by other processes
+
+        Only what was appended since the last read is parsed, unless the
+        journal was replaced or truncated in which case it is loaded again.
+        """
+        if self._journal is None:
+            return
+        journal_id = self._journal.identity()
+        if journal_id == self._journal_id:
+            return
+
+        if (
+            journal_id[:2] != self._journal_id[:2]
+            or journal_id[2] < self._journal.offset
+        ):
+            offset = 0 if self._since is None else self._journal.position(self._since)
+            self._build([], self.columnar)
+        else:
+            offset = self._journal.offset
+        for transaction in self._journal.read(offset):
+            if self._since is None or transaction["timestamp"] >= self._since:
+                self.append(Sale(**transaction))
+        self._journal_id = journal_id[:2] + (self._journal.offset,)
+
+    def _rowsBetween(self, start: datetime, end: datetime) -> List[int]:
+        """Returns the rows of the transactions made between two dates (included), in time order"""
+        lo = bisect.bisect_left(self._times, start.timestamp())
+        hi = bisect.bisect_right(self._times, end.timestamp())
+        return self._rows_by_time[lo:hi]
+
+    @instrumented
+    def salesBetween(self, start: datetime, end: datetime) -> BookRecords:
+        """Returns the records of the sales made between two dates (included)
+
+        Args:
+            start: a datetime representing the start of the period
+            end: a datetime representing the end of the period
+
+        Returns: A new object with the transactions of the period, in time order
+        """
+        if self.streaming:
+            return BookRecords(
+                sorted(
+                    self.transactions.between(start.timestamp(), end.timestamp()),
+                    key=lambda transaction: transaction.timestamp,
+                )
+            )
+        return self._select(self._rowsBetween(start, end))
+
+    def _select(self, rows: List[int]) -> BookRecords:
+        """Returns new records holding the given rows of the transactions"""
+        if self.columnar:
+            return BookRecords(self.transactions.take(rows))
+        return BookRecords([self.transactions[idx] for idx in rows])
+
+    @property
+    def columnar(self) -> bool:
+        """Whether the transactions are kept in a `ColumnarSales` store"""
+        return isinstance(self.transactions, ColumnarSales)
+
+    @property
+    def streaming(self) -> bool:
+        """Whether the transactions are queried on each report instead of being held in memory"""
+        return isinstance(self.transactions, SaleScan)
+
+    def _reportRows(self, start: int = 0, stop: int = None) -> Iterator[tuple]:
+        """Iterates over the fields shown in the records table for some rows
+
+        Returns: tuples of (timestamp, customerID, name, quantity, purchase_price, prescriptionID)
+        """
+        if self.columnar:
+            return self.transactions.reportRows(start, stop)
+        if self.streaming:
+            transactions = self.transactions.slice(start, stop)
+        else:
+            transactions = self.transactions[start:stop]
+        return (
+            (
+                t.timestamp,
+                t.customerID,
+                t.name,
+                t.quantity,
+                t.purchase_price,
+                t.prescriptionID,
+            )
+            for t in transactions
+        )
+
+    @instrumented
+    def render(self, stream: TextIO, page_size: int = None, offset: int = 0) -> bool:
+        """Writes the table of the records to a text stream, as it is formatted
+
+        Args:
+            stream: where to write the table, for example sys.stdout
+            page_size: maximum number of rows to write (default: all of them)
+            offset: number of rows to skip
+
+        Returns: Whether there are rows after the ones written
+        """
+        stop = None if page_size is None else offset + page_size + 1
+        return renderRecords(
+            stream, self._reportRows(offset, stop), page_size=page_size, offset=offset
+        )
 
     def __str__(self) -> str:
         """Returns a string representation of a record.
@@ -28,24 +382,36 @@ class BookRecords:
         # Code to return a representation of the records in following format
         # |      # | Date                | Customer   | Medication | Quantity | Purchase Price | Prescription |
         # |      1 | 2023-06-03 21:23:25 | doe        | Quinine    |        3 |       1400 RWF | PHA1         |
+        record_str = io.StringIO()
+        self.render(record_str)
+        return record_str.getvalue()
 
-        record_str = (
-            "|    # | Date                | Customer   | Medication | Quantity | Purchase Price | Prescription |\n"
-            "|------|---------------------|------------|------------|----------|----------------|--------------|\n"
-        )
+    @instrumented
+    def renderPrescriptions(
+        self, stream: TextIO, page_size: int = None, offset: int = 0
+    ) -> bool:
+        """Writes the report on prescription sales to a text stream
 
-        for idx, transaction in enumerate(self.transactions, start=1):
-            timestamp = datetime.fromtimestamp(transaction.timestamp).strftime(
-                "%Y-%m-%d %H:%M:%S"
-            )
-            if transaction.prescriptionID is None:
-                transaction.prescriptionID = "None"
-            record_str += (
-                f"| {idx:4} | {timestamp} | {transaction.customerID:10} | {transaction.name:10} |"
-                f" {transaction.quantity:8} | {transaction.purchase_price:10.2f} Rwf | {transaction.prescriptionID:12} |\n"
-            )
+        Args:
+            stream: where to write the table, for example sys.stdout
+            page_size: maximum number of rows to write (default: all of them)
+            offset: number of rows to skip
 
-        return record_str
+        Returns: Whether there are rows after the ones written
+        """
+        # Retrieving for each prescription, the actual medications that were processed
+        # and aggregating for each, the corresponding total price.
+        if self.streaming:
+            prescription_report = self.transactions.prescriptionTotals()
+        else:
+            prescription_report = self._prescription_totals
+
+        return renderPrescriptions(
+            stream,
+            islice(prescription_report.items(), offset, None),
+            page_size=page_size,
+            offset=offset,
+        )
 
     def reportOnPrescriptions(self) -> str:
         """Reports on prescription sales.
@@ -54,35 +420,25 @@ class BookRecords:
 
         Returns: A string report of the prescriptions processed
         """
-        # Retrieving for each prescription, the actual medications that were processed
-        # and aggregating for each, the corresponding total price.
-
         # TThe format for the output:
         # |    # | Prescription ID | Total Price |
+        report_str = io.StringIO()
+        self.renderPrescriptions(report_str)
+        return report_str.getvalue()
 
-        prescription_report = {}
-        for transaction in self.transactions:
-            # Check if prescriptionID is not None
-            if transaction.prescriptionID is not None:
-                prescription_id = transaction.prescriptionID
-                if prescription_id in prescription_report:
-                    prescription_report[prescription_id] += transaction.purchase_price
-                else:
-                    prescription_report[prescription_id] = transaction.purchase_price
+    @instrumented
+    def userRecords(self, customerID: str) -> BookRecords:
+        """Returns the records of the sales performed by a customer.
 
-        report_str = (
-            "|    # | Prescription ID |  Total Price  |\n"
-            "|------|-----------------|---------------|\n"
-        )
-
-        for idx, (prescription_id, total_price) in enumerate(
-            prescription_report.items(), start=1
-        ):
-            report_str += (
-                f"| {idx:4} | {prescription_id:15} | {total_price:9.2f} Rwf |\n"
-            )
+        Args:
+            customerID: Username of the customer.
 
-        return report_str
+        Returns: A new object with the corresponding transactions
+        """
+        # Query the transactions of the customer from the index
+        if self.streaming:
+            return BookRecords(self.transactions.where("customerID", customerID))
+        return self._select(self._by_customer.get(customerID, []))
 
     def purchasesByUser(self, customerID: str):
         """Reports on the sales performed by a customer.
@@ -93,13 +449,21 @@ class BookRecords:
         Returns: A string representation of the corresponding transactions
 
         """
-        # TODO: Query the transactions to the `transactions` list below
-        transactions = [
-            transaction
-            for transaction in self.transactions
-            if transaction.customerID == customerID
-        ]
-        return BookRecords(transactions).__str__()
+        return self.userRecords(customerID).__str__()
+
+    @instrumented
+    def agentRecords(self, salesperson: str) -> BookRecords:
+        """Returns the records of the sales performed by a pharmacist.
+
+        Args:
+            salesperson: Username of the pharmacist.
+
+        Returns: A new object with the corresponding transactions
+        """
+        # Query the transactions of the agent from the index
+        if self.streaming:
+            return BookRecords(self.transactions.where("salesperson", salesperson))
+        return self._select(self._by_agent.get(salesperson, []))
 
     def salesByAgent(self, salesperson: str):
         """Reports on the sales performed by a pharmacist.
@@ -110,46 +474,64 @@ class BookRecords:
         Returns: A string representation of the corresponding transactions
 
         """
-        # TODO: Query the transactions to the `transactions` list below
-        transactions = [
-            transaction
-            for transaction in self.transactions
-            if transaction.salesperson == salesperson
-        ]
-
         # return the string representation
-        return BookRecords(transactions).__str__()
+        return self.agentRecords(salesperson).__str__()
+
+    @instrumented
+    def topNRecords(
+        self,
+        start: datetime = None,
+        end: datetime = None,
+        n=10,
+    ) -> BookRecords:
+        """Return the records of the top n sales ordered by the total price of purchases.
+
+        Args:
+            start: a datetime representing the start period to consider (datetime, default to 02 Jan 2023)
+            end: a datetime representing the end period to consider (datetime, default to current timestamp)
+            n: number of records to consider (int, default to 10)
+
+        Returns: A new object with the top n transactions
+        """
+        # The default dates are evaluated on each call
+        if start is None:
+            start = datetime.strptime("2023-01-02", "%Y-%m-%d")
+        if end is None:
+            end = datetime.now()
+
+        # Codes to Query the top transactions in the period, ties are kept in the order they were recorded
+        if self.streaming:
+            return BookRecords(
+                self.transactions.top(n, start.timestamp(), end.timestamp())
+            )
+        if self.columnar:
+            purchase_prices = self.transactions.purchase_price
+            key = lambda idx: (purchase_prices[idx], -idx)
+        else:
+            transactions = self.transactions
+            key = lambda idx: (transactions[idx].purchase_price, -idx)
+        return self._select(heapq.nlargest(n, self._rowsBetween(start, end), key=key))
 
     def topNSales(
         self,
-        start: datetime = datetime.strptime("2023-01-02", "%Y-%m-%d"),
-        end: datetime = datetime.now(),
+        start: datetime = None,
+        end: datetime = None,
         n=10,
     ) -> str:
         """Return the top n sales ordered by the total price of purchases.
 
         Args:
-            start: a datetime representing the start period to consider (datetime, default to 01 Jan 1970)
+            start: a datetime representing the start period to consider (datetime, default to 02 Jan 2023)
             end: a datetime representing the end period to consider (datetime, default to current timestamp)
             n: number of records to consider (int, default to 10)
 
         Returns:
         A string representation of the top n
         """
-        # Codes to Query the top transactions and save them to the variable `transactions`
-        transactions = sorted(
-            [
-                transaction
-                for transaction in self.transactions
-                if start <= datetime.fromtimestamp(transaction.timestamp) <= end
-            ],
-            key=lambda transaction: transaction.purchase_price,
-            reverse=True,
-        )[:n]
-
         # return the string representation of the transactions.
-        return BookRecords(transactions).__str__()
+        return self.topNRecords(start, end, n).__str__()
 
+    @instrumented
     def totalTransactions(self) -> float:
         """Returns the total cost of the transactions considered.
 
@@ -157,23 +539,106 @@ class BookRecords:
 
         Returns: A floating number representing the total price
         """
-        return sum([transaction.purchase_price for transaction in self.transactions])
+        if self.streaming:
+            return self.transactions.total()
+        # The total is kept up to date as sales are added
+        return self._total
+
+    @instrumented
+    def totalByCustomer(self, customerID: str) -> float:
+        """Returns the total cost of the purchases of a customer.
+
+        Args:
+            customerID: Username of the customer.
+
+        Returns: A floating number representing the total price
+        """
+        if self.streaming:
+            return self.transactions.totalWhere("customerID", customerID)
+        return self._customer_totals.get(customerID, 0)
+
+    @instrumented
+    def totalByAgent(self, salesperson: str) -> float:
+        """Returns the total cost of the sales performed by a pharmacist.
+
+        Args:
+            salesperson: Username of the pharmacist.
+
+        Returns: A floating number representing the total price
+        """
+        if self.streaming:
+            return self.transactions.totalWhere("salesperson", salesperson)
+        return self._agent_totals.get(salesperson, 0)
 
     @classmethod
-    def load(cls, inFile: str) -> BookRecords:
-        """Loads a JSON file containing a number of sales object
+    @instrumented
+    def load(
+        cls,
+        inFile: str,
+        columnar: bool = False,
+        streaming: bool = False,
+        workers: int = None,
+        since: datetime = None,
+        snapshot: bool = False,
+    ) -> BookRecords:
+        """Loads the sales journal kept for a sales file
 
         Args:
-            inFile: path to the file to be read
+            inFile: path to the sales file, a JSON array of sales is migrated to the journal on first use.
+                Can also be a SQLite database (see `storage`)
+            columnar: whether to keep the transactions in a `ColumnarSales` store
+            streaming: whether to query the file on every report instead of loading it (see `SaleStream`
+                and `SQLiteSales`)
+            workers: number of processes querying the file together on every report, 0 for the number of CPUs
+                (see `ParallelSaleStream`), implies streaming
+            since: only load the sales made from then on, reading only the partitions that hold them if the
+                journal is partitioned (see `SalesPartitions`), the sales recorded later are still followed
+            snapshot: whether to start from a binary snapshot of the records kept next to the journal, taken
+                again when missing or behind (see `snapshot`), implies columnar. Not used with since
         Returns: A new object with the transactions in the file
         """
-        # Loading JSON file that has sales objects
+        # Loading the sales objects from the journal
+        try:
+            journal = salesJournal(inFile)
+            if streaming or workers is not None:
+                # fail now rather than on the first report if the file is missing
+                journal.migrate()
+                journal.identity()
+                return cls(salesScan(inFile, workers))
+            if snapshot and since is None and not isDatabase(inFile):
+                records = cls._loadSnapshot(journal)
+            else:
+                records = journal.read()
+                if since is not None:
+                    since = since.timestamp()
+                    records = (
+                        record
+                        for record in journal.read(journal.position(since))
+                        if record["timestamp"] >= since
+                    )
+                if columnar or snapshot:
+                    transactions = ColumnarSales()
+                    for transaction in records:
+                        transactions.appendRecord(transaction)
+                else:
+                    transactions = [Sale(**transaction) for transaction in records]
+                records = cls(transactions)
+            records._since = since
+            records._journal = journal
+            records._journal_id = journal.identity()[:2] + (journal.offset,)
+            return records
+        except FileNotFoundError:
+            raise Exception("Records file not found")
+
+    @staticmethod
+    def stream(inFile: str) -> Iterator[Sale]:
+        """Reads the sales of a sales file one at a time
+
+        Args:
+            inFile: path to the sales file (see `load`)
+        Returns: An iterator over the sales, in the order they were recorded
+        """
         try:
-            with open(inFile, "r") as f:
-                transactions_data = json.load(f)
-                transactions = [
-                    Sale(**transaction) for transaction in transactions_data
-                ]
-                return cls(transactions)
+            yield from salesScan(inFile)
         except FileNotFoundError:
             raise Exception("Records file not found")
@@ -0,0 +1,286 @@
+"""Checks out a file of orders in batches, without the menu
+
+For headless work such as overnight refills or the orders of a partner
+clinic. The orders are read from a JSONL file, one order per line:
+
+    {"customerID": "customer1", "lines": {"P000001": 2, "P000002": 1}, "prescriptionID": "PHA3"}
+
+or from a CSV file with the columns customerID, productCode, quantity and
+optionally prescriptionID and order. Each row is an order of one product,
+unless the file has an order column: consecutive rows with the same order
+then make up one order.
+
+The orders are checked out by batches (see `Wrapper.checkoutMany`): each
+batch is validated in memory, then the stock is written once, the sales
+appended once and the prescriptions used saved once. An order that can't
+go through is reported with its row and the reason, the others go on.
+
+A prescription must be the customer's own, and the lines already filled
+(`ProcessedStatus`) can't be filled again, by a later batch or a rerun of
+the file. The orders of a batch sharing a prescription share the quantity
+of each of its lines, an order that doesn't go through takes none of it.
+
+Run from the root of the repository:
+
+    python -m order_management.bulk orders.jsonl [--agent agent0] [--report failed.csv]
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .config import dataPaths
+from .prescription import Prescription, PrescriptionStore
+from .stock import Stock
+from .user_management import UserManagement
+from .wrapper import Wrapper
+
+# number of orders checked out and saved together
+BATCH_SIZE = 5_000
+# number of times a batch is tried again when another terminal changed the stock meanwhile
+RETRIES = 3
+
+# the products (ID -> quantity), the customer ID and the prescription ID (or None) of an order
+Order = Tuple[Dict[str, int], str, Optional[str]]
+
+
+def _quantity(value) -> int:
+    quantity = int(value)
+    if quantity <= 0:
+        raise ValueError("Quantity must be greater than 0")
+    return quantity
+
+
+def _jsonOrders(path: str) -> Iterator[Tuple[int, Optional[Order], Optional[str]]]:
+    with open(path, "r") as f:
+        for row, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                order = json.loads(line)
+                products = {
+                    str(code): _quantity(quantity)
+                    for code, quantity in order["lines"].items()
+                }
+                yield row, (products, str(order["customerID"]), order.get("prescriptionID") or None), None
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                yield row, None, f"Invalid order: {e}"
+
+
+def _csvOrders(path: str) -> Iterator[Tuple[int, Optional[Order], Optional[str]]]:
+    with open(path, "r", newline="") as f:
+        reader = csv.DictReader(f)
+        # the order being read, its first row and the value of its order column
+        order, first, key = None, None, None
+        for record in reader:
+            row = reader.line_num
+            try:
+                code = record["productCode"].strip()
+                quantity = _quantity(record["quantity"])
+                customerID = record["customerID"].strip()
+            except (ValueError, KeyError, AttributeError) as e:
+                yield row, None, f"Invalid order: {e}"
+                continue
+            prescriptionID = (record.get("prescriptionID") or "").strip() or None
+            rowKey = (record.get("order") or "").strip() or None
+
+            if order is not None and rowKey is not None and rowKey == key:
+                order[0][code] = order[0].get(code, 0) + quantity
+                continue
+            if order is not None:
+                yield first, order, None
+            order, first, key = ({code: quantity}, customerID, prescriptionID), row, rowKey
+        if order is not None:
+            yield first, order, None
+
+
+def readOrders(path: str) -> Iterator[Tuple[int, Optional[Order], Optional[str]]]:
+    """Reads the orders of a file, a CSV file or a JSONL file (see `bulk`)
+
+    Args:
+        path: the file of the orders, read as CSV if it ends with .csv
+
+    Returns: The row of each order, and the order or why it could not be read
+    """
+    if path.endswith(".csv"):
+        return _csvOrders(path)
+    return _jsonOrders(path)
+
+
+def importOrders(
+    orders: Iterable[Tuple[int, Optional[Order], Optional[str]]],
+    wrap: Wrapper,
+    prescriptions_file: str = "data/prescriptions.json",
+    batch_size: int = BATCH_SIZE,
+) -> Iterator[Tuple[int, Optional[str]]]:
+    """Checks out orders by batches, saving each batch at once
+
+    Args:
+        orders: the orders, as given by `readOrders`
+        wrap: checks out the orders, its sales are saved after each batch
+        prescriptions_file: the file where the prescriptions are read and saved
+        batch_size: number of orders checked out and saved together
+
+    Returns: The row of each order, and None if it went through, otherwise the reason why not
+    """
+    batch = []
+    for row, order, error in orders:
+        batch.append((row, order, error))
+        if len(batch) == batch_size:
+            yield from _importBatch(batch, wrap, prescriptions_file)
+            batch = []
+    if batch:
+        yield from _importBatch(batch, wrap, prescriptions_file)
+
+
+def _checkPrescription(
+    prescription: Prescription,
+    products: Dict[str, int],
+    customerID: str,
+    remaining: Dict[Tuple[str, str], Optional[int]],
+) -> Optional[str]:
+    """Checks an order against what is left of its prescription in the batch
+
+    Args:
+        prescription: the prescription of the order
+        products: the products of the order (ID -> quantity)
+        customerID: the customer of the order
+        remaining: (prescription ID, product ID) -> quantity left to the orders of the batch, None if filled before it
+
+    Returns: None if the order fits the prescription, otherwise the reason why not
+    """
+    if customerID != prescription.CustomerID:
+        return "The prescription is for another customer"
+    for med in prescription.Medications:
+        if med["id"] not in products:
+            continue
+        left = remaining[(prescription.PrescriptionID, med["id"])]
+        if left is None:
+            return f"Prescription already filled for '{med['name']}'"
+        if products[med["id"]] > left:
+            return f"Prescription does not contain '{med['name']}' in the required quantity."
+    return None
+
+
+def _importBatch(
+    batch: List[Tuple[int, Optional[Order], Optional[str]]],
+    wrap: Wrapper,
+    prescriptions_file: str,
+) -> List[Tuple[int, Optional[str]]]:
+    store = PrescriptionStore.open(prescriptions_file)
+    for attempt in range(RETRIES + 1):
+        results = [error for _, _, error in batch]
+        # the orders that can be checked out, with their prescriptions
+        checkouts, indexes = [], []
+        # one object per prescription, so that the orders of a batch using the same one all update it
+        prescriptions = {}
+        # the quantity of each line of the prescriptions left to the orders of the batch
+        remaining = {}
+
+        def orders():
+            """The orders that fit their prescriptions, each checked once the ones before it went through or not"""
+            for i, (_, order, error) in enumerate(batch):
+                if order is None:
+                    continue
+                products, customerID, prescriptionID = order
+                prescription = None
+                if prescriptionID is not None:
+                    if prescriptionID not in prescriptions:
+                        prescriptions[prescriptionID] = store.getPrescriptionByID(prescriptionID)
+                    prescription = prescriptions[prescriptionID]
+                    if prescription is None:
+                        results[i] = "Prescription not found"
+                        continue
+                    # the lines filled by the orders of the batch are still shared by the others
+                    for med in prescription.Medications:
+                        key = (prescriptionID, med["id"])
+                        if key not in remaining:
+                            remaining[key] = None if med.get("ProcessedStatus") else med["quantity"]
+                    results[i] = _checkPrescription(prescription, products, customerID, remaining)
+                    if results[i] is not None:
+                        continue
+                checkouts.append((products, customerID, prescription))
+                indexes.append(i)
+                sold = len(wrap.sales)
+                yield products, customerID, prescription
+                # the quantities are taken once the order went through, one refused leaves them to the next ones
+                if prescription is not None and len(wrap.sales) > sold:
+                    for code in products:
+                        key = (prescriptionID, code)
+                        if key in remaining:
+                            remaining[key] -= products[code]
+
+        try:
+            outcomes = wrap.checkoutMany(orders())
+        except ValueError:
+            if attempt == RETRIES:
+                raise
+            # another terminal sold some of the products meanwhile: the stock is read again
+            wrap.stock = Stock.load(wrap.stock.filename)
+            continue
+        break
+
+    used = {}
+    for i, (_, _, prescription), outcome in zip(indexes, checkouts, outcomes):
+        results[i] = outcome
+        if outcome is None and prescription is not None:
+            used[prescription.PrescriptionID] = prescription
+    store.saveMany(list(used.values()))
+    return [(row, result) for (row, _, _), result in zip(batch, results)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("orders", help="the file of the orders, JSONL or CSV")
+    parser.add_argument("--data", default="data", help="directory of the JSON files")
+    parser.add_argument(
+        "--agent", help="username recorded as the agent of the sales (default: the logged in user)"
+    )
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--report", help="CSV file where the orders that failed are written")
+    args = parser.parse_args()
+
+    paths = dataPaths(args.data)
+    stock_file, sales_file, prescriptions_file = paths["stock"], paths["sales"], paths["prescriptions"]
+
+    try:
+        agent = args.agent
+        if agent is None:
+            profiles = UserManagement.load(paths["credentials"])
+            profiles.status_file = os.path.join(args.data, ".logged_in")
+            agent = profiles.get_logged_in_user().username
+        wrap = Wrapper(Stock.load(stock_file), agent, sales_file=sales_file)
+        orders = readOrders(args.orders)
+    except Exception as e:
+        sys.exit(f"Could not load the data: {e}")
+
+    start = time.perf_counter()
+    done = failed = 0
+    report_file = report = None
+    if args.report:
+        report_file = open(args.report, "w", newline="")
+        report = csv.writer(report_file)
+        report.writerow(["row", "error"])
+    try:
+        for row, error in importOrders(orders, wrap, prescriptions_file, args.batch_size):
+            if error is None:
+                done += 1
+                continue
+            failed += 1
+            if report is not None:
+                report.writerow([row, error])
+            else:
+                print(f"Row {row}: {error}")
+    finally:
+        if report_file is not None:
+            report_file.close()
+        elapsed = time.perf_counter() - start
+        print(f"{done} orders checked out, {failed} failed, in {elapsed:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,76 @@
+from types import MappingProxyType
+from typing import Dict, List, Mapping
 from .product import Product
 from .stock import Stock
 
 
+class CartLine:
+    """A product in a cart, with the quantity and the unit price it was added at
+
+    Attributes:
+        product: the product of the stock (the same object, its quantity and price are the live ones)
+        quantity: the quantity in the cart
+        price: the unit price of the product when it was added to the cart
+    """
+
+    __slots__ = ("product", "quantity", "price")
+
+    def __init__(self, product: Product, quantity: int, price: float = None) -> None:
+        self.product = product
+        self.quantity = quantity
+        self.price = product.price if price is None else price
+
+    @property
+    def code(self) -> str:
+        return self.product.code
+
+    @property
+    def total(self) -> float:
+        """The price of the line at the unit price it was added at"""
+        return self.price * self.quantity
+
+    @property
+    def priceChanged(self) -> bool:
+        """Whether the price of the product changed since it was added"""
+        return self.product.price != self.price
+
+    @property
+    def stale(self) -> bool:
+        """Whether the price of the product changed, or the stock known here no longer holds the quantity"""
+        return self.priceChanged or self.product.quantity < self.quantity
+
+
 class Cart:
     """Represents a cart with a list of products and quantity
 
+    Each line keeps the product and its unit price when it was added, so
+    that the cost and the checkout don't look the products up again. The
+    cost is kept up to date as lines are added and removed.
+
     Attributes:
-        products: a dictionary with the key being the ID of the products, and the value being the quantity
-        added
+        lines: the lines of the cart by product ID, in the order they were added
+        products: a read-only mapping with the key being the ID of the products, and the value being the quantity
+        added, assign a dictionary to replace the content of the cart
     """
 
     def __init__(self, stock: Stock) -> None:
-        self.products = {}
+        self.lines: Dict[str, CartLine] = {}
         self.stock = stock
+        self._cost = 0
+
+    @property
+    def products(self) -> Mapping[str, int]:
+        # a copy of the quantities, read-only so that changing it fails rather than being lost
+        return MappingProxyType({code: line.quantity for code, line in self.lines.items()})
+
+    @products.setter
+    def products(self, products: Dict[str, int]):
+        """Replaces the content of the cart, at the current prices and without checking the stock"""
+        self.clear()
+        for code, quantity in products.items():
+            line = CartLine(self.stock.getProductByID(code), quantity)
+            self.lines[code] = line
+            self._cost += line.total
 
     def add(self, productCode: str, quantity: int):
         """Adds a product to the cart with the specified quantity
@@ -24,67 +82,81 @@ class Cart:
         Returns: None
         """
 
-        # Make sure the quantity is valid (> 0 and <= the quantity in the stock)
+        # Make sure the quantity is valid (> 0 and, with what is already in the cart, <= the quantity in the stock)
         if quantity <= 0:
             raise ValueError("Quantity must be greater than 0")
 
-        product = self.stock.getProductByID(productCode)
+        line = self.lines.get(productCode)
+        product = self.stock.getProductByID(productCode) if line is None else line.product
+        in_cart = 0 if line is None else line.quantity
 
-        if quantity > product.quantity:
+        if in_cart + quantity > product.quantity:
             print("Not enough stock available")
             return
 
-        # If the product was already in the cart, increment the quantity
-        if productCode in self.products:
-            self.products[productCode] += quantity
+        # If the product was already in the cart, increment the quantity at the price it was added at
+        if line is not None:
+            line.quantity += quantity
+            self._cost += line.price * quantity
             print("Quantity increase by " + str(quantity))
         else:
-            self.products[productCode] = quantity
+            line = CartLine(product, quantity)
+            self.lines[productCode] = line
+            self._cost += line.total
             print("Product added to cart successfully")
 
     def __str__(self) -> str:
         """String representation of the cart"""
         # Returns a string representation of a cart that shows the products, their quantity, unit price, total price. And also the total price of the cart
         cart_str = ""
-        total_cart_cost = 0
 
-        for product_code, quantity in self.products.items():
-            product = self.stock.getProductByID(product_code)
-            total_price = quantity * product.price
+        for line in self.lines.values():
+            product = line.product
             cart_str += (
                 f"\nID: {product.code}\n"
                 f"Name: {product.name}\n"
-                f"Quantity: {quantity}\n"
-                f"Unit Price: ${product.price:.2f}\n"
-                f"Total Price: ${total_price:.2f}\n"
-                "----------------------\n"
+                f"Quantity: {line.quantity}\n"
+                f"Unit Price: ${line.price:.2f}\n"
+                f"Total Price: ${line.total:.2f}\n"
             )
-            total_cart_cost += total_price
+            if line.priceChanged:
+                cart_str += f"Price changed since added: now ${product.price:.2f}\n"
+            if product.quantity < line.quantity:
+                cart_str += f"Only {product.quantity} left in stock\n"
+            cart_str += "----------------------\n"
 
-        cart_str += f"Total Cart Cost: ${total_cart_cost:.2f}\n"
+        cart_str += f"Total Cart Cost: ${self.cost:.2f}\n"
         return cart_str
 
     def remove(self, code):
         """
         Removes a specific product from the cart"""
         # Removes a product from the cart. safely fail if the product code is not found
-        try:
-            if code in self.products:
-                del self.products[code]
-                print("Product removed successfully!")
-        except:
+        line = self.lines.pop(code, None)
+        if line is None:
             print("Product not found")
+            return
+        # an empty cart costs exactly 0, whatever the rounding of the additions
+        self._cost = self._cost - line.total if self.lines else 0
+        print("Product removed successfully!")
 
     def clear(self):
         """Clears up the cart."""
-        self.products.clear()
+        self.lines.clear()
+        self._cost = 0
+
+    def staleLines(self) -> List[CartLine]:
+        """Returns the lines whose product changed price, or no longer has the quantity in stock, since added"""
+        return [line for line in self.lines.values() if line.stale]
+
+    def refreshPrices(self):
+        """Takes the current prices for the lines of the cart"""
+        for line in self.lines.values():
+            line.price = line.product.price
+        self._cost = sum(line.total for line in self.lines.values())
 
     @property
     def cost(self):
         """Returns the total cost of the cart"""
-        # Function that returns the total cost of the cart
-        total_cost = 0
-        for product_code, quantity in self.products.items():
-            product = self.stock.getProductByID(product_code)
-            total_cost += product.price * quantity
-        return total_cost
+        # The total is kept up to date as products are added and removed
+        return self._cost
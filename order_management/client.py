@@ -0,0 +1,159 @@
+"""Thin client of the order service (see `service`)
+
+The classes here stand in for the stock, the cart, the wrapper and the
+records of a terminal, so that the menu runs unchanged against the service.
+What the service prints is printed here.
+"""
+
+import json
+import socket
+from typing import List, TextIO
+
+from .product import Product
+
+
+class ServiceClient:
+    """A connection to the order service
+
+    Attributes:
+        address: the path of the Unix socket of the service, or host:port
+    """
+
+    def __init__(self, address: str) -> None:
+        self.address = address
+        host, _, port = address.rpartition(":")
+        if port.isdigit():
+            self._socket = socket.create_connection((host or "127.0.0.1", int(port)))
+        else:
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._socket.connect(address)
+        self._file = self._socket.makefile("rwb")
+
+    def call(self, op: str, **args):
+        """Runs an operation on the service
+
+        Args:
+            op: name of the operation (see `OrderService.operations`)
+            args: arguments of the operation
+
+        Returns: The result of the operation
+        """
+        self._file.write(json.dumps({"op": op, "args": args}).encode() + b"\n")
+        self._file.flush()
+        line = self._file.readline()
+        if not line:
+            raise Exception("The order service closed the connection")
+        response = json.loads(line)
+        print(response.get("output", ""), end="")
+        if not response["ok"]:
+            raise Exception(response["error"])
+        return response["result"]
+
+    def close(self):
+        self._file.close()
+        self._socket.close()
+
+
+class RemoteStock:
+    """The stock of the service, read-only"""
+
+    def __init__(self, client: ServiceClient) -> None:
+        self.client = client
+
+    @property
+    def products(self) -> List[Product]:
+        return [Product(**product) for product in self.client.call("products")]
+
+    def getProductByID(self, id: str) -> Product:
+        return Product(**self.client.call("product", id=id))
+
+    def search(self, query: str, limit: int = None) -> List[Product]:
+        return [
+            Product(**product)
+            for product in self.client.call("search", query=query, limit=limit)
+        ]
+
+
+class RemoteCart:
+    """The cart of the connection, kept by the service"""
+
+    def __init__(self, client: ServiceClient) -> None:
+        self.client = client
+
+    @property
+    def products(self) -> dict:
+        return self.client.call("cart.products")
+
+    def add(self, productCode: str, quantity: int):
+        self.client.call("cart.add", productCode=productCode, quantity=quantity)
+
+    def remove(self, code: str):
+        self.client.call("cart.remove", code=code)
+
+    def clear(self):
+        self.client.call("cart.clear")
+
+    def __str__(self) -> str:
+        return self.client.call("cart.show")
+
+
+class RemoteWrapper:
+    """Checks out the cart of the connection on the service
+
+    Attributes:
+        books: unused, the service keeps its records up to date
+    """
+
+    def __init__(self, client: ServiceClient) -> None:
+        self.client = client
+        self.books = None
+
+    def checkout(self, cart: RemoteCart, customerID: str, prescription=None):
+        prescriptionID = None if prescription is None else prescription.PrescriptionID
+        self.client.call("checkout", customerID=customerID, prescriptionID=prescriptionID)
+
+
+class RemoteRecords:
+    """The sales records of the service, or a selection of them
+
+    Attributes:
+        kind: the report rendered by `render` (see `OrderService.report`)
+        filters: the customer or the agent of the report
+    """
+
+    def __init__(self, client: ServiceClient, kind: str = "records", **filters) -> None:
+        self.client = client
+        self.kind = kind
+        self.filters = filters
+
+    def refresh(self):
+        """Does nothing, the service refreshes its records before each report"""
+
+    def _render(
+        self, kind: str, stream: TextIO, page_size: int, offset: int, **filters
+    ) -> bool:
+        page = self.client.call(
+            "report", kind=kind, page_size=page_size, offset=offset, **filters
+        )
+        stream.write(page["text"])
+        return page["more"]
+
+    def render(self, stream: TextIO, page_size: int = None, offset: int = 0) -> bool:
+        return self._render(self.kind, stream, page_size, offset, **self.filters)
+
+    def renderPrescriptions(
+        self, stream: TextIO, page_size: int = None, offset: int = 0
+    ) -> bool:
+        return self._render("prescriptions", stream, page_size, offset)
+
+    def userRecords(self, customerID: str) -> "RemoteRecords":
+        return RemoteRecords(self.client, "user", customerID=customerID)
+
+    def agentRecords(self, salesperson: str) -> "RemoteRecords":
+        return RemoteRecords(self.client, "agent", salesperson=salesperson)
+
+    def topNRecords(self) -> "RemoteRecords":
+        return RemoteRecords(self.client, "top")
+
+    def totalTransactions(self) -> float:
+        return self.client.call("total")
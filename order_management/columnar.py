@@ -0,0 +1,190 @@
+from array import array
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from .sale import Sale
+from .snapshot import packArray, unpackArray
+
+# separates the ids of the sales in a snapshot, they are split back in one go
+_ID_SEPARATOR = "\0"
+
+
+class EncodedColumn:
+    """A dictionary encoded column of values, mostly strings.
+
+    Each distinct value is stored once, rows only hold the integer code of
+    their value. Codes are given in the order in which the values first
+    appear.
+
+    Attributes:
+        values: the distinct values, indexed by their code
+        codes: the code of each row
+    """
+
+    def __init__(self) -> None:
+        self.values: List = []
+        self.codes = array("l")
+        self._lookup: Dict = {}
+
+    def encode(self, value) -> int:
+        """Returns the code of a value, adding it to the dictionary if needed"""
+        code = self._lookup.get(value)
+        if code is None:
+            code = len(self.values)
+            self._lookup[value] = code
+            self.values.append(value)
+        return code
+
+    def append(self, value):
+        self.codes.append(self.encode(value))
+
+    def take(self, rows: List[int]) -> "EncodedColumn":
+        """Returns a new column with the given rows, keeping the same codes
+
+        The new column shares the dictionary of this one, only the codes of
+        the rows are copied. Values are only ever added to a dictionary, so
+        the codes of either column stay valid when the other encodes more.
+        """
+        column = EncodedColumn()
+        column.values = self.values
+        column._lookup = self._lookup
+        codes = self.codes
+        column.codes = array("l", [codes[idx] for idx in rows])
+        return column
+
+    def decoded(self, start: int = 0, stop: int = None) -> Iterator:
+        """Iterates over the values of the rows, or of a slice of them"""
+        values = self.values
+        codes = self.codes if start == 0 and stop is None else self.codes[start:stop]
+        return (values[code] for code in codes)
+
+    def __getitem__(self, idx: int):
+        return self.values[self.codes[idx]]
+
+    def pack(self) -> Tuple:
+        """Returns the column as saved in a snapshot (see `snapshot`)"""
+        return self.values, packArray(self.codes)
+
+    @staticmethod
+    def unpack(packed: Tuple) -> "EncodedColumn":
+        """Returns a column saved in a snapshot by `pack`"""
+        column = EncodedColumn()
+        column.values, codes = packed
+        column.codes = unpackArray(codes)
+        column._lookup = {value: code for code, value in enumerate(column.values)}
+        return column
+
+
+class ColumnarSales:
+    """A sequence of sales stored column by column.
+
+    Numeric fields are kept in typed arrays and text fields are dictionary
+    encoded, which takes a fraction of the memory of one `Sale` object per
+    transaction and lets the reports work on whole columns. Indexing or
+    iterating builds `Sale` objects on the fly.
+    """
+
+    def __init__(self, transactions: Iterable[Sale] = ()) -> None:
+        self.id: List[str] = []
+        self.quantity = array("q")
+        self.price = array("d")
+        self.purchase_price = array("d")
+        self.timestamp = array("d")
+        self.name = EncodedColumn()
+        self.customerID = EncodedColumn()
+        self.salesperson = EncodedColumn()
+        self.prescriptionID = EncodedColumn()
+        for transaction in transactions:
+            self.append(transaction)
+
+    def append(self, transaction: Sale):
+        """Adds a sale at the end of the columns"""
+        self.appendRecord(transaction.to_dict())
+
+    def appendRecord(self, record: Dict):
+        """Adds a sale given as a dictionary (see sales.json) at the end of the columns"""
+        self.id.append(record["id"])
+        self.quantity.append(record["quantity"])
+        self.price.append(record["price"])
+        self.purchase_price.append(record["purchase_price"])
+        self.timestamp.append(record["timestamp"])
+        self.name.append(record["name"])
+        self.customerID.append(record["customerID"])
+        self.salesperson.append(record["salesperson"])
+        self.prescriptionID.append(record["prescriptionID"])
+
+    def take(self, rows: Iterable[int]) -> "ColumnarSales":
+        """Returns a new store with the given rows, in the given order"""
+        rows = list(rows)
+        subset = ColumnarSales()
+        subset.id = [self.id[idx] for idx in rows]
+        for name in ("quantity", "price", "purchase_price", "timestamp"):
+            column = getattr(self, name)
+            setattr(subset, name, array(column.typecode, [column[idx] for idx in rows]))
+        for name in ("name", "customerID", "salesperson", "prescriptionID"):
+            setattr(subset, name, getattr(self, name).take(rows))
+        return subset
+
+    def reportRows(self, start: int = 0, stop: int = None) -> Iterator[tuple]:
+        """Iterates over the fields shown in the records table, without building `Sale` objects
+
+        Args:
+            start: the first row
+            stop: the row after the last one (default: the end of the store)
+
+        Returns: tuples of (timestamp, customerID, name, quantity, purchase_price, prescriptionID)
+        """
+        return zip(
+            self.timestamp[start:stop],
+            self.customerID.decoded(start, stop),
+            self.name.decoded(start, stop),
+            self.quantity[start:stop],
+            self.purchase_price[start:stop],
+            self.prescriptionID.decoded(start, stop),
+        )
+
+    def __len__(self) -> int:
+        return len(self.id)
+
+    def __getitem__(self, idx: int) -> Sale:
+        return Sale(
+            id=self.id[idx],
+            name=self.name[idx],
+            quantity=self.quantity[idx],
+            price=self.price[idx],
+            purchase_price=self.purchase_price[idx],
+            timestamp=self.timestamp[idx],
+            customerID=self.customerID[idx],
+            salesperson=self.salesperson[idx],
+            prescriptionID=self.prescriptionID[idx],
+        )
+
+    def __iter__(self) -> Iterator[Sale]:
+        for idx in range(len(self)):
+            yield self[idx]
+
+    def pack(self) -> Dict:
+        """Returns the columns as saved in a snapshot (see `snapshot`)"""
+        # the ids are joined into a single string, much faster to save and load than a list
+        ids = _ID_SEPARATOR.join(self.id)
+        if ids.count(_ID_SEPARATOR) != max(len(self.id) - 1, 0):
+            ids = self.id
+        state = {"count": len(self.id), "id": ids}
+        for name in ("quantity", "price", "purchase_price", "timestamp"):
+            state[name] = packArray(getattr(self, name))
+        for name in ("name", "customerID", "salesperson", "prescriptionID"):
+            state[name] = getattr(self, name).pack()
+        return state
+
+    @staticmethod
+    def unpack(state: Dict) -> "ColumnarSales":
+        """Returns the columns saved in a snapshot by `pack`"""
+        transactions = ColumnarSales()
+        ids = state["id"]
+        if isinstance(ids, str):
+            ids = ids.split(_ID_SEPARATOR) if state["count"] else []
+        transactions.id = ids
+        for name in ("quantity", "price", "purchase_price", "timestamp"):
+            setattr(transactions, name, unpackArray(state[name]))
+        for name in ("name", "customerID", "salesperson", "prescriptionID"):
+            setattr(transactions, name, EncodedColumn.unpack(state[name]))
+        return transactions
@@ -0,0 +1,32 @@
+"""Where the data of the application is kept, for the menu and the headless entry points"""
+
+import os
+from typing import Dict
+
+from .journal import salesFile
+
+
+def dataPaths(data: str = "data") -> Dict[str, str]:
+    """Returns the files of a data directory
+
+    A SQLite database can hold the stock, the sales, the prescriptions and
+    the wishlists instead, given by ORDER_MANAGEMENT_DB (see `migrate`).
+
+    Args:
+        data: the directory holding the JSON files
+
+    Returns: The path of each kind of data: credentials, stock, sales, prescriptions and wishlist
+    """
+    paths = {
+        "credentials": os.path.join(data, "credentials.txt"),
+        "stock": os.path.join(data, "products.json"),
+        # data/sales/ once the sales were split into partitions (see `partitions`)
+        "sales": salesFile(data),
+        "prescriptions": os.path.join(data, "prescriptions.json"),
+        "wishlist": os.path.join(data, "wishlist.json"),
+    }
+    database = os.environ.get("ORDER_MANAGEMENT_DB")
+    if database:
+        for kind in ("stock", "sales", "prescriptions", "wishlist"):
+            paths[kind] = database
+    return paths
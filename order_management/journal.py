@@ -0,0 +1,553 @@
+import contextlib
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from typing import IO, Dict, Iterator, List, Optional, Tuple
+from . import metrics
+from .atomic import atomic_open, atomic_write
+from .locking import fileLock
+
+
+def iter_jsonl(f: IO, limit: int = None) -> Iterator[Tuple[Dict, int]]:
+    """Iterates over the records of a JSON lines file, one per line, from the current position
+
+    A last line without its newline is a write that was interrupted, or
+    still going on: it is left for a later read. Blank lines are skipped.
+
+    Args:
+        f: a binary file holding one JSON object per line
+        limit: number of bytes to read at most, at the start of a line (default: to the end of the file)
+
+    Returns: An iterator over the decoded records, each with the number of bytes read for it, blank lines before it included
+    """
+
+    read = length = 0
+    for line in f:
+        if (limit is not None and read >= limit) or not line.endswith(b"\n"):
+            break
+        read += len(line)
+        length += len(line)
+        if line.strip():
+            yield json.loads(line), length
+            length = 0
+
+
+def iter_json_array(f: IO, chunk_size: int = 1 << 16) -> Iterator:
+    """Iterates over the elements of a JSON array without loading the whole file
+
+    Args:
+        f: a text file holding a JSON array of objects
+        chunk_size: number of characters read at a time
+
+    Returns: An iterator over the decoded elements
+    """
+
+    decoder = json.JSONDecoder()
+    buf, pos, eof = "", 0, False
+    expected = "["
+    while True:
+        # skip the whitespaces, reading more of the file when needed
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n":
+                pos += 1
+            if pos < len(buf) or eof:
+                break
+            chunk = f.read(chunk_size)
+            buf, pos, eof = buf[pos:] + chunk, 0, not chunk
+        if pos == len(buf):
+            raise ValueError("Unexpected end of the JSON array")
+
+        char = buf[pos]
+        if expected == "[":
+            if char != "[":
+                raise ValueError("The file does not hold a JSON array")
+            pos += 1
+            expected = "value or ]"
+        elif char == "]" and expected != "value":
+            return
+        elif expected == ", or ]":
+            if char != ",":
+                raise ValueError(f"Expected ',' or ']' at {char!r}")
+            pos += 1
+            expected = "value"
+        else:
+            try:
+                element, pos = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                # the element goes past what was read so far
+                chunk = f.read(chunk_size)
+                buf, pos, eof = buf[pos:] + chunk, 0, not chunk
+                continue
+            yield element
+            expected = ", or ]"
+
+
+class SalesJournal:
+    """Append-only store of the sales, one JSON object per line.
+
+    The sales used to be kept in a single JSON array which had to be read
+    and rewritten entirely on every checkout. The journal is created next
+    to that file (`sales.json` -> `sales.jsonl`) and the existing array is
+    migrated into it the first time the journal is used.
+
+    Attributes:
+        path: path to the journal file
+        legacy_path: path to the JSON array the journal is migrated from
+        offset: position in the journal right after the last record read
+    """
+
+    def __init__(self, path: str) -> None:
+        root, ext = os.path.splitext(path)
+        if ext == ".jsonl":
+            self.path = path
+            self.legacy_path = root + ".json"
+        else:
+            self.path = root + ".jsonl"
+            self.legacy_path = path
+        self.offset = 0
+        self._migrated = False
+
+    def migrate(self):
+        """Converts the legacy JSON array to the journal if not done yet"""
+
+        if self._migrated:
+            return
+        if not os.path.exists(self.path) and os.path.exists(self.legacy_path):
+            with fileLock(self.path):
+                # another process may have migrated it while waiting for the lock
+                if not os.path.exists(self.path):
+                    # written atomically so that a crash can't leave a half migrated journal,
+                    # and streamed so that the array never has to fit in memory
+                    with open(self.legacy_path, "r") as f, atomic_open(self.path) as out:
+                        for sale in iter_json_array(f):
+                            out.write(json.dumps(sale) + "\n")
+        self._migrated = True
+
+    def append(self, sales: List[Dict]) -> Tuple[int, int]:
+        """Appends sales records at the end of the journal
+
+        Args:
+            sales: the records to append, as dictionaries
+
+        Returns: The positions in the journal where the records start and end
+        """
+
+        self.migrate()
+        data = "".join(json.dumps(sale) + "\n" for sale in sales).encode()
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            # the lock keeps the records of concurrent checkouts from interleaving
+            with fileLock(self.path):
+                written = 0
+                while written < len(data):
+                    written += os.write(fd, data[written:])
+                end = os.lseek(fd, 0, os.SEEK_CUR)
+            if data:
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+        if metrics.ENABLED:
+            metrics.addBytes("written", "sales", len(data))
+        return end - len(data), end
+
+    def read(self, offset: int = 0, start: float = None, end: float = None) -> Iterator[Dict]:
+        """Reads the records of the journal in the order they were appended
+
+        Args:
+            offset: position in the journal where to start reading
+            start, end: a period the records are looked for in, unused as the whole journal is read (see `SalesPartitions`)
+
+        Returns: An iterator over the records, as dictionaries
+        """
+
+        self.migrate()
+        self.offset = offset
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(offset)
+                for record, length in iter_jsonl(f):
+                    self.offset += length
+                    yield record
+        finally:
+            if metrics.ENABLED:
+                metrics.addBytes("read", "sales", self.offset - offset)
+
+    def segments(self, start: float = None, end: float = None) -> List[Tuple[str, int, int]]:
+        """Returns the path of the journal, its position (0) and its size, the whole journal holding any period"""
+        self.migrate()
+        return [(self.path, 0, os.path.getsize(self.path))]
+
+    def position(self, since: float) -> int:
+        """Returns the position from which the sales made since a timestamp are found, the start of the journal"""
+        return 0
+
+    def identity(self) -> Tuple[int, int, int]:
+        """Returns the device, inode and size of the journal, to notice changes made by other processes"""
+        stat = os.stat(self.path)
+        return stat.st_dev, stat.st_ino, stat.st_size
+
+
+# the file listing the partitions of a partitioned journal (see `SalesPartitions`)
+MANIFEST = "manifest.json"
+# suffix of the single journal once split into partitions, renamed so that it is no longer used
+MIGRATED = ".migrated"
+
+
+def isPartitioned(path: str) -> bool:
+    """Whether a path designates the directory of a partitioned journal rather than a single journal file"""
+    return os.path.isdir(path) or not os.path.splitext(path)[1]
+
+
+def salesFile(data: str) -> str:
+    """Returns the sales file of a data directory: its partitions if the journal was split, sales.json otherwise"""
+    partitions = os.path.join(data, "sales")
+    return partitions if os.path.isdir(partitions) else os.path.join(data, "sales.json")
+
+
+def openJournal(path: str):
+    """Returns the journal of the sales kept at a path, partitioned (see `SalesPartitions`) or not (see `SalesJournal`)"""
+    return SalesPartitions(path) if isPartitioned(path) else SalesJournal(path)
+
+
+def monthOf(timestamp: float) -> str:
+    """Returns the month of a timestamp, as named in the partitions (%Y-%m)"""
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m")
+
+
+class SalesPartitions:
+    """Append-only store of the sales, split into a JSONL file per month
+
+    It has the interface of `SalesJournal`, positions being counted over
+    the partitions one after the other. The bounds in the manifest are
+    widened before the sales are written, so that after a crash they may
+    be too wide but never miss a sale.
+
+    The single journal next to the directory is split into it once, then
+    renamed (`sales.jsonl` -> `sales.jsonl.migrated`). A terminal still
+    running a version without partitions appends to the renamed journal,
+    or creates a new one: the sales it adds are moved into the partitions
+    the next time the partitions are opened.
+
+    Attributes:
+        path: path to the directory of the partitions
+        offset: position right after the last record read
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path.rstrip(os.sep) or path
+        self.offset = 0
+        self._migrated = False
+
+    def _manifestPath(self) -> str:
+        return os.path.join(self.path, MANIFEST)
+
+    def _readManifest(self) -> Dict:
+        with open(self._manifestPath(), "r") as f:
+            return json.load(f)
+
+    def manifest(self) -> List[Dict]:
+        """Returns the partitions: file, month, start, end (timestamps of the first and last sales) and rows"""
+        return self._readManifest()["partitions"]
+
+    def _writeManifest(self, manifest: Dict, directory: str = None):
+        atomic_write(os.path.join(directory or self.path, MANIFEST), json.dumps(manifest, indent=4))
+
+    @staticmethod
+    def _place(partitions: List[Dict], sales: List[Dict]) -> List[Tuple[str, List[Dict]]]:
+        """Assigns sales to the partitions, updating their entries
+
+        A sale goes to the last partition, unless it is of a later month
+        in which case it starts a new one.
+
+        Returns: The file of each partition written to, with its sales, in order
+        """
+        groups = []
+        for sale in sales:
+            timestamp = sale["timestamp"]
+            month = monthOf(timestamp)
+            if not partitions or month > partitions[-1]["month"]:
+                partitions.append(
+                    {"file": month + ".jsonl", "month": month, "start": timestamp, "end": timestamp, "rows": 0}
+                )
+            partition = partitions[-1]
+            if not groups or groups[-1][0] != partition["file"]:
+                groups.append((partition["file"], []))
+            partition["start"] = min(partition["start"], timestamp)
+            partition["end"] = max(partition["end"], timestamp)
+            partition["rows"] += 1
+            groups[-1][1].append(sale)
+        return groups
+
+    def migrate(self):
+        """Splits the single journal next to the directory into partitions if not done yet
+
+        Once split, picks up the sales appended to the single journal since
+        by a terminal running a version without partitions.
+        """
+
+        if self._migrated:
+            return
+        legacy = SalesJournal(self.path + ".json")
+        if not os.path.exists(self._manifestPath()):
+            if os.path.exists(legacy.path) or os.path.exists(legacy.legacy_path):
+                # the JSON array is converted first, under the lock of the journal only
+                legacy.migrate()
+                # the lock of the journal keeps the terminals of the previous version from appending meanwhile
+                with fileLock(self.path), fileLock(legacy.path):
+                    # another process may have split it while waiting for the lock
+                    if not os.path.exists(self._manifestPath()):
+                        self._split(legacy)
+        elif self._strayRecord(legacy) is not None:
+            with fileLock(self.path), fileLock(legacy.path):
+                self._absorb(legacy)
+        self._migrated = True
+
+    def _split(self, legacy: SalesJournal):
+        # written in a directory renamed at the end, so that a crash can't leave half of the partitions
+        tmp = tempfile.mkdtemp(dir=os.path.dirname(self.path) or ".")
+        partitions = []
+        files = {}
+        try:
+            for sale in legacy.read():
+                for name, records in self._place(partitions, [sale]):
+                    if name not in files:
+                        files[name] = open(os.path.join(tmp, name), "w")
+                    files[name].writelines(json.dumps(record) + "\n" for record in records)
+        finally:
+            for f in files.values():
+                f.close()
+        stat = os.stat(legacy.path)
+        self._writeManifest(
+            {"partitions": partitions, "legacy": {"inode": stat.st_ino, "size": legacy.offset}}, tmp
+        )
+        os.chmod(tmp, 0o755)
+        # an empty directory may have been made for the partitions
+        with contextlib.suppress(FileNotFoundError):
+            os.rmdir(self.path)
+        os.rename(tmp, self.path)
+        self._retire(legacy)
+        # the previous version would convert the JSON array again into a journal
+        with contextlib.suppress(FileNotFoundError):
+            os.rename(legacy.legacy_path, legacy.legacy_path + MIGRATED)
+
+    def _retire(self, legacy: SalesJournal):
+        """Renames the single journal aside, once its sales are in the partitions, keeping the name in the manifest"""
+        name = os.path.basename(legacy.path) + MIGRATED
+        count = 1
+        while os.path.exists(os.path.join(os.path.dirname(legacy.path), name)):
+            name = f"{os.path.basename(legacy.path)}{MIGRATED}.{count}"
+            count += 1
+        manifest = self._readManifest()
+        manifest["legacy"]["file"] = name
+        self._writeManifest(manifest)
+        os.rename(legacy.path, os.path.join(os.path.dirname(legacy.path), name))
+
+    def _strayRecord(self, legacy: SalesJournal) -> Optional[Tuple[str, int]]:
+        """Returns a single journal with sales not in the partitions yet, and where they start, None if there is none"""
+        try:
+            record = self._readManifest().get("legacy")
+        except FileNotFoundError:
+            return None
+        if record is None:
+            return None
+        if "file" in record:
+            # appended to through a descriptor opened before it was renamed
+            retired = os.path.join(os.path.dirname(legacy.path), record["file"])
+            with contextlib.suppress(FileNotFoundError):
+                if os.path.getsize(retired) > record["size"]:
+                    return retired, record["size"]
+        try:
+            stat = os.stat(legacy.path)
+        except FileNotFoundError:
+            return None
+        # a journal created again, or the one split and not renamed before a crash
+        return legacy.path, record["size"] if stat.st_ino == record["inode"] else 0
+
+    def _absorb(self, legacy: SalesJournal):
+        """Moves the sales appended to the single journal since the split into the partitions, the locks being held"""
+        while True:
+            stray = self._strayRecord(legacy)
+            if stray is None:
+                return
+            path, offset = stray
+            sales = []
+            with open(path, "rb") as f:
+                f.seek(offset)
+                for record, length in iter_jsonl(f):
+                    offset += length
+                    sales.append(record)
+            if sales:
+                self._append(sales)
+            manifest = self._readManifest()
+            manifest["legacy"].update(inode=os.stat(path).st_ino, size=offset)
+            if path != legacy.path:
+                self._writeManifest(manifest)
+                continue
+            manifest["legacy"].pop("file", None)
+            self._writeManifest(manifest)
+            self._retire(legacy)
+
+    def _size(self, partition: Dict) -> int:
+        try:
+            return os.path.getsize(os.path.join(self.path, partition["file"]))
+        except FileNotFoundError:
+            return 0
+
+    def append(self, sales: List[Dict]) -> Tuple[int, int]:
+        """Appends sales records at the end of the journal
+
+        Args:
+            sales: the records to append, as dictionaries
+
+        Returns: The positions in the journal where the records start and end
+        """
+
+        self.migrate()
+        os.makedirs(self.path, exist_ok=True)
+        with fileLock(self.path):
+            return self._append(sales)
+
+    def _append(self, sales: List[Dict]) -> Tuple[int, int]:
+        """Appends sales records at the end of the journal, the lock being held"""
+        written = 0
+        try:
+            manifest = self._readManifest()
+        except FileNotFoundError:
+            manifest = {"partitions": []}
+        partitions = manifest["partitions"]
+        start = sum(self._size(partition) for partition in partitions)
+        groups = self._place(partitions, sales)
+        if groups:
+            self._writeManifest(manifest)
+        for name, records in groups:
+            data = "".join(json.dumps(record) + "\n" for record in records).encode()
+            fd = os.open(
+                os.path.join(self.path, name), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644
+            )
+            try:
+                while data:
+                    count = os.write(fd, data)
+                    written += count
+                    data = data[count:]
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        if metrics.ENABLED:
+            metrics.addBytes("written", "sales", written)
+        return start, start + written
+
+    def segments(self, start: float = None, end: float = None) -> List[Tuple[str, int, int]]:
+        """Returns the partitions that may hold sales made between two timestamps (included)
+
+        Args:
+            start: the start of the period (default: the first sale)
+            end: the end of the period (default: the last sale)
+
+        Returns: The path of each partition, its position in the journal and its size
+        """
+        self.migrate()
+        segments = []
+        position = 0
+        for partition in self.manifest():
+            size = self._size(partition)
+            if (
+                size
+                and (start is None or partition["end"] >= start)
+                and (end is None or partition["start"] <= end)
+            ):
+                segments.append((os.path.join(self.path, partition["file"]), position, size))
+            position += size
+        return segments
+
+    def position(self, since: float) -> int:
+        """Returns the position from which the sales made since a timestamp are found"""
+        segments = self.segments(start=since)
+        if segments:
+            return segments[0][1]
+        return self.identity()[2]
+
+    def read(self, offset: int = 0, start: float = None, end: float = None) -> Iterator[Dict]:
+        """Reads the records of the journal in the order they were appended
+
+        Args:
+            offset: position in the journal where to start reading
+            start: only read the partitions that may hold sales made from then (default: all of them)
+            end: only read the partitions that may hold sales made until then (default: all of them)
+
+        Returns: An iterator over the records, as dictionaries, possibly from outside of the period
+        """
+
+        self.offset = offset
+        read = 0
+        with contextlib.ExitStack() as stack:
+            # opened before any is read, so that a compaction meanwhile doesn't remove them under the reader
+            files = []
+            for path, position, size in self.segments(start, end):
+                if position + size > offset:
+                    files.append((stack.enter_context(open(path, "rb")), position))
+            try:
+                for f, position in files:
+                    f.seek(max(offset - position, 0))
+                    self.offset = position + f.tell()
+                    for record, length in iter_jsonl(f):
+                        self.offset += length
+                        read += length
+                        yield record
+            finally:
+                if metrics.ENABLED:
+                    metrics.addBytes("read", "sales", read)
+
+    def identity(self) -> Tuple[int, int, int]:
+        """Returns the device and inode of the directory and the size of the journal, to notice changes made by other processes"""
+        stat = os.stat(self.path)
+        if not os.path.exists(self._manifestPath()):
+            raise FileNotFoundError(self._manifestPath())
+        size = sum(self._size(partition) for partition in self.manifest())
+        return stat.st_dev, stat.st_ino, size
+
+    def compact(self, before: float) -> int:
+        """Merges the first partitions, those of the sales made before a timestamp, into a single file
+
+        The last partition, where the sales are appended, is never merged.
+        The positions in the journal don't change.
+
+        Args:
+            before: the timestamp before which the sales of the partitions to merge were all made
+
+        Returns: The number of partitions merged, 0 if there weren't at least two
+        """
+        self.migrate()
+        with fileLock(self.path):
+            manifest = self._readManifest()
+            partitions = manifest["partitions"]
+            count = 0
+            while count < len(partitions) - 1 and partitions[count]["end"] < before:
+                count += 1
+            if count < 2:
+                return 0
+
+            merged = partitions[:count]
+            first = os.path.splitext(merged[0]["file"])[0].split("--")[0]
+            name = f"{first}--{merged[-1]['month']}.jsonl"
+            with atomic_open(os.path.join(self.path, name), "wb") as out:
+                for partition in merged:
+                    with contextlib.suppress(FileNotFoundError):
+                        with open(os.path.join(self.path, partition["file"]), "rb") as f:
+                            shutil.copyfileobj(f, out)
+            entry = {
+                "file": name,
+                "month": merged[-1]["month"],
+                "start": min(partition["start"] for partition in merged),
+                "end": max(partition["end"] for partition in merged),
+                "rows": sum(partition["rows"] for partition in merged),
+            }
+            manifest["partitions"] = [entry] + partitions[count:]
+            self._writeManifest(manifest)
+            for partition in merged:
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(os.path.join(self.path, partition["file"]))
+            return count
@@ -0,0 +1,57 @@
+import os
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows, where the files are not locked
+    fcntl = None
+
+
+@contextmanager
+def fileLock(path: str) -> Iterator[Optional[int]]:
+    """Holds an exclusive lock on a file, shared between processes
+
+    The lock is taken on a separate `<path>.lock` file so that the file
+    itself can be replaced while the lock is held. Only the processes
+    going through this function are excluded.
+
+    The lock is not reentrant: a process holding it must not take it again.
+
+    Args:
+        path: path to the file to lock
+
+    Returns: The descriptor of the lock file, where the holder of the lock may keep a few bytes of state (None when files are not locked)
+    """
+
+    if fcntl is None:
+        yield None
+        return
+    fd = os.open(path + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield fd
+    finally:
+        # closing the descriptor releases the lock
+        os.close(fd)
+
+
+def readGeneration(lock: Optional[int]) -> int:
+    """Returns the generation of a locked file, kept in its lock file
+
+    The generation is increased by the writers that replace the file
+    (see `writeGeneration`), so that the readers notice it even when the
+    new file has the same inode, modification time and size as the old one.
+
+    Args:
+        lock: the descriptor returned by `fileLock`
+    """
+    if lock is None:
+        return 0
+    return int.from_bytes(os.pread(lock, 8, 0).ljust(8, b"\0"), "little")
+
+
+def writeGeneration(lock: Optional[int], generation: int):
+    """Records the generation of a locked file in its lock file (see `readGeneration`)"""
+    if lock is not None:
+        os.pwrite(lock, generation.to_bytes(8, "little"), 0)
@@ -1,27 +1,40 @@
-from . import (
-    Stock,
-    Cart,
-    User,
-    UserManagement,
-    BookRecords,
-    Wrapper,
-    Wishlist,
-    Prescription,
-)
+from __future__ import annotations
+
+import sys
+from typing import TYPE_CHECKING
+
+# the modules are imported where first used, so that the main menu shows up without them
+if TYPE_CHECKING:
+    from .books import BookRecords
+    from .cart import Cart
+    from .stock import Stock
+    from .user import User
+    from .user_management import UserManagement
+    from .wishlist import Wishlist
+    from .wrapper import Wrapper
 
 MSG_WRONG_INPUT = "Wrong input. Try again!"
+# number of rows of a report printed before asking to continue
+PAGE_SIZE = 50
+# number of products found by a search shown at a time
+SEARCH_PAGE_SIZE = 10
 
 
 class Menu:
     """Represents the menu class for the project
 
     Attributes:
-        stock: stock variable
+        stock: stock variable (default: loaded from stock_file on first use)
         profiles: user management module
         pharmacist: account of the salesperson
+        wrap: checks out the cart (default: one for the pharmacist, created on first use)
+        wishlist: the wishlist of the pharmacist (default: the one in wishlist_file, created on first use)
         records_file: path to the file containing the sales
         prescriptions_file: path to the file containing the prescriptions.
         stock_file: path to the file containing the stock data
+        books: the records of the sales (default: loaded from records_file on first use)
+        cart: the cart of the terminal (default: a new, empty one)
+        wishlist_file: path to the file containing the wishlists
     """
 
     def __init__(
@@ -34,18 +47,82 @@ class Menu:
         records_file: str,
         prescriptions_file: str,
         stock_file: str,
+        books: BookRecords = None,
+        cart: Cart = None,
+        wishlist_file: str = "data/wishlist.json",
     ) -> None:
-        self.stock = stock
+        self._stock = stock
         self.profiles = profiles
         self.pharmacist = pharmacist
-        self.cart = Cart(stock=stock)
-        self.wrap = wrap
-        self.wishlist = wishlist
-        self.books = BookRecords.load(records_file)
+        self._cart = cart
+        self._wrap = wrap
+        self._wishlist = wishlist
         # use the file instead of the object so that we can keep track
         self.records_file = records_file
         self.prescriptions_file = prescriptions_file
         self.stock_file = stock_file
+        self.wishlist_file = wishlist_file
+        self._books = None
+        if books is not None:
+            self.books = books
+
+    @property
+    def stock(self) -> Stock:
+        """The stock, loaded from stock_file when the order management first needs it"""
+        if self._stock is None:
+            from .stock import Stock
+
+            # from the snapshot when up to date (see `Stock.load`)
+            self._stock = Stock.load(self.stock_file, snapshot=True)
+        return self._stock
+
+    @property
+    def cart(self) -> Cart:
+        if self._cart is None:
+            from .cart import Cart
+
+            self._cart = Cart(stock=self.stock)
+        return self._cart
+
+    @property
+    def wrap(self) -> Wrapper:
+        if self._wrap is None:
+            from .wrapper import Wrapper
+
+            self._wrap = Wrapper(
+                self.stock, self.pharmacist.username, books=self._books, sales_file=self.records_file
+            )
+        return self._wrap
+
+    @property
+    def wishlist(self) -> Wishlist:
+        if self._wishlist is None:
+            from .wishlist import Wishlist
+
+            self._wishlist = Wishlist(self.pharmacist.username, self.wishlist_file)
+        return self._wishlist
+
+    @property
+    def books(self) -> BookRecords:
+        """The records of the sales, loaded from records_file when first needed"""
+        if self._books is None:
+            from .books import BookRecords
+            from .storage import isDatabase
+
+            if isDatabase(self.records_file):
+                # a database answers the reports with its indexes, without loading the sales (see `SQLiteSales`)
+                self.books = BookRecords.load(self.records_file, streaming=True)
+            else:
+                # only the analytics need them, from the snapshot when up to date (see `BookRecords.load`)
+                self.books = BookRecords.load(self.records_file, snapshot=True)
+        return self._books
+
+    @books.setter
+    def books(self, books: BookRecords):
+        self._books = books
+        # the checkouts add their sales to the records directly
+        if self._wrap is not None and self._wrap.books is None:
+            self._wrap.books = books
 
     """
     1. Order management
@@ -79,11 +156,15 @@ class Menu:
             if choice == "1":
                 self.order_management_menu()
             elif choice == "2":
-                self.books = BookRecords.load("data/sales.json")
+                # only picks up the sales recorded by other terminals, if any
+                self.books.refresh()
                 self.analytics_menu()
             elif choice == "3":
                 print("\nExiting the program...")
                 break
+            elif choice == "metrics":
+                # not listed, for whoever looks into the performance
+                self.show_metrics()
             else:
                 print(MSG_WRONG_INPUT)
 
@@ -100,26 +181,12 @@ class Menu:
             choice = input("\nChoose an option: ")
 
             if choice == "1":
-                print("\n Select from Product List:")
-                # listing products list for the user to be able to select from it before adding them to cart
-                for i, product in enumerate(self.stock.products):
-                    print(
-                        f"\t {i+1}. ID: {product.code}, Name: {product.name}, Price: ${product.price:.2f}, Quantity: {product.quantity}"
-                    )
-                print()
-
-                #  Prompt user to input the selected product until it is correct number
-                while True:
-                    product_no = int(input("Enter the # product to add to your cart: "))
-                    if 1 <= product_no <= len(self.stock.products):
-                        break
-                    print(
-                        "Invalid input. Please enter a number from 1 to",
-                        len(self.stock.products),
-                    )
-                product_id = self.stock.products[product_no - 1].code
+                # searching the catalog, then picking the product among those found
+                product = self.choose_product("your cart")
+                if product is None:
+                    continue
                 quantity = int(input("Enter Quantity: "))
-                self.cart.add(productCode=product_id, quantity=quantity)
+                self.cart.add(productCode=product.code, quantity=quantity)
 
             elif choice == "2":
                 if bool(self.cart.products):
@@ -143,28 +210,9 @@ class Menu:
                 except:
                     print("Something went wrong! Can't checkout")
             elif choice == "5":
-                print("\n Available medications: \n")
-                # listing products list for the user to be able to select from it before adding them to cart
-                for i, product in enumerate(self.stock.products):
-                    print(
-                        f"\t {i+1}. ID: {product.code}, Name: {product.name}, Price: ${product.price:.2f}, Quantity: {product.quantity}"
-                    )
-                print()
-
-                #  Prompt user to input the selected product until it is correct number
-                while True:
-                    product_no = int(
-                        input("Enter the # product to add to your wishlist: ")
-                    )
-                    if 1 <= product_no <= len(self.stock.products):
-                        break
-                    print(
-                        "Invalid input. Please enter a number from 1 to",
-                        len(self.stock.products),
-                    )
-                product_id = self.stock.products[product_no - 1].code
-                medicine = self.stock.getProductByID(id=product_id)
-                self.wishlist.add_to_wishlist(medicine)
+                medicine = self.choose_product("your wishlist")
+                if medicine is not None:
+                    self.wishlist.add_to_wishlist(medicine)
 
             elif choice == "6":
                 self.wishlist.show_wishlist()
@@ -174,6 +222,80 @@ class Menu:
             else:
                 print(MSG_WRONG_INPUT)
 
+    def choose_product(self, destination: str):
+        """Asks for a search, then for one of the products found, shown a page at a time
+
+        Args:
+            destination: where the product goes, such as "your cart"
+
+        Returns: The product chosen, or None if the search found nothing or was cancelled
+        """
+        query = input("\nSearch products by name, brand, category or description (Enter for all): ")
+        # the best matches first, the whole catalog in its order for an empty search
+        if query.strip():
+            products = self.stock.search(query)
+        else:
+            products = self.stock.products
+        if not products:
+            print("No product found")
+            return None
+
+        offset = 0
+        while True:
+            print()
+            for i, product in enumerate(products[offset : offset + SEARCH_PAGE_SIZE], offset + 1):
+                print(
+                    f"\t {i}. ID: {product.code}, Name: {product.name}, Brand: {product.brand}, Price: ${product.price:.2f}, Quantity: {product.quantity}"
+                )
+            more = offset + SEARCH_PAGE_SIZE < len(products)
+            if more:
+                print(f"\t ({len(products) - offset - SEARCH_PAGE_SIZE} more)")
+
+            #  Prompt user to input the selected product until it is correct number
+            choice = input(
+                f"\nEnter the # product to add to {destination}"
+                + (", n for the next page" if more else "")
+                + ", or nothing to cancel: "
+            ).strip().lower()
+            if not choice:
+                return None
+            if choice == "n" and more:
+                offset += SEARCH_PAGE_SIZE
+            elif choice.isdigit() and 1 <= int(choice) <= len(products):
+                return products[int(choice) - 1]
+            else:
+                print("Invalid input. Please enter a number from 1 to", len(products))
+
+    def show_metrics(self):
+        """Prints the calls, the latency and the bytes read or written recorded so far"""
+        from . import metrics
+
+        if not metrics.ENABLED:
+            print("\nThe instrumentation is off, set ORDER_MANAGEMENT_METRICS=1 to turn it on")
+            return
+        snapshot = metrics.snapshot()
+        print(f"\n{'Operation':<40}{'Calls':>8}{'Total ms':>12}{'Mean ms':>10}")
+        for name, stats in snapshot["operations"].items():
+            if stats["calls"]:
+                total = stats["seconds"] * 1000
+                print(f"{name:<40}{stats['calls']:>8}{total:>12.2f}{total / stats['calls']:>10.3f}")
+        for direction, kinds in snapshot["bytes"].items():
+            for kind, count in kinds.items():
+                print(f"Bytes {direction} ({kind}): {count}")
+
+    def print_pages(self, render):
+        """Prints a report page by page, asking before each new page
+
+        Args:
+            render: the function writing the report, such as `BookRecords.render`
+        """
+        offset = 0
+        while render(sys.stdout, page_size=PAGE_SIZE, offset=offset):
+            offset += PAGE_SIZE
+            if input("\nPress Enter for more, or q to stop: ").strip().lower() == "q":
+                break
+        print()
+
     def analytics_menu(self):
         while True:
             print("\nAnalytics Menu:")
@@ -191,17 +313,19 @@ class Menu:
                 print(f"\nTotal income from purchases: {total_income:.2f} Rwf")
             elif choice == "2":
                 print(f"\nPrescription Statistics\n")
-                print(self.books.reportOnPrescriptions())
+                self.print_pages(self.books.renderPrescriptions)
             elif choice == "3":
                 customer_id = input("\nEnter customer ID: ")
-                print(self.books.purchasesByUser(customerID=customer_id))
+                self.print_pages(self.books.userRecords(customerID=customer_id).render)
 
             elif choice == "4":
                 agent_username = input("\nEnter agent's username: ")
-                print(self.books.salesByAgent(salesperson=agent_username))
+                self.print_pages(
+                    self.books.agentRecords(salesperson=agent_username).render
+                )
             elif choice == "5":
                 print("\nTop 10 Sales from 2017\n")
-                print(self.books.topNSales())
+                self.print_pages(self.books.topNRecords().render)
             elif choice == "6":
                 break
             else:
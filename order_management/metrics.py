@@ -0,0 +1,148 @@
+"""Opt-in instrumentation of the hot paths: calls, latencies and bytes read or written.
+
+Set ORDER_MANAGEMENT_METRICS before starting the program to switch it on,
+to 1 or to a file where a snapshot is written at exit (in the Prometheus
+text format for a `.prom` file, in JSON otherwise). When it isn't set,
+`instrumented` returns the functions unchanged and the I/O code skips
+`addBytes`, so nothing is paid.
+
+Set ORDER_MANAGEMENT_PROFILE to a file to profile the whole session with
+cProfile, the statistics are written to it at exit (read them with `pstats`).
+"""
+
+import atexit
+import cProfile
+import functools
+import json
+import os
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Tuple
+
+SETTING = os.environ.get("ORDER_MANAGEMENT_METRICS", "")
+ENABLED = bool(SETTING)
+
+# upper bounds of the latency buckets, in seconds
+BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+# by operation: number of calls, total seconds, then the count of each bucket (the last one unbounded)
+_operations: Dict[str, List] = {}
+# by direction ("read" or "written") and kind of file: number of bytes
+_bytes: Dict[Tuple[str, str], int] = {}
+
+
+def instrumented(function: Callable) -> Callable:
+    """Records the calls and the latency of a function, when the instrumentation is on
+
+    The operation is named after the function, such as `Stock.load`.
+    """
+    if not ENABLED:
+        return function
+    stats = _operations.setdefault(function.__qualname__, [0, 0.0] + [0] * (len(BUCKETS) + 1))
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            stats[0] += 1
+            stats[1] += elapsed
+            stats[2 + bisect_left(BUCKETS, elapsed)] += 1
+
+    return wrapper
+
+
+def addBytes(direction: str, kind: str, count: int):
+    """Records bytes read or written, to be called only if `ENABLED`
+
+    Args:
+        direction: "read" or "written"
+        kind: the kind of file, such as "products" or "sales"
+        count: number of bytes
+    """
+    key = (direction, kind)
+    _bytes[key] = _bytes.get(key, 0) + count
+
+
+def reset():
+    """Sets all the counts back to zero"""
+    for stats in _operations.values():
+        stats[:] = [0, 0.0] + [0] * (len(BUCKETS) + 1)
+    _bytes.clear()
+
+
+def snapshot() -> Dict:
+    """Returns the counts recorded so far
+
+    Returns: A dictionary with, by operation, the number of calls, the total seconds and the count of each latency bucket, and the bytes by direction and kind of file
+    """
+    operations = {}
+    for name, (calls, seconds, *buckets) in sorted(_operations.items()):
+        operations[name] = {
+            "calls": calls,
+            "seconds": seconds,
+            "buckets": dict(zip([str(bound) for bound in BUCKETS] + ["+Inf"], buckets)),
+        }
+    data = {"read": {}, "written": {}}
+    for (direction, kind), count in sorted(_bytes.items()):
+        data[direction][kind] = count
+    return {"enabled": ENABLED, "operations": operations, "bytes": data}
+
+
+def prometheus() -> str:
+    """Returns the counts recorded so far in the Prometheus text format"""
+    lines = [
+        "# HELP order_management_calls_total Calls of the instrumented operations.",
+        "# TYPE order_management_calls_total counter",
+    ]
+    for name, (calls, *_) in sorted(_operations.items()):
+        lines.append(f'order_management_calls_total{{operation="{name}"}} {calls}')
+
+    lines += [
+        "# HELP order_management_latency_seconds Latency of the instrumented operations.",
+        "# TYPE order_management_latency_seconds histogram",
+    ]
+    for name, (calls, seconds, *buckets) in sorted(_operations.items()):
+        cumulative = 0
+        for bound, count in zip([str(bound) for bound in BUCKETS] + ["+Inf"], buckets):
+            cumulative += count
+            lines.append(
+                f'order_management_latency_seconds_bucket{{operation="{name}",le="{bound}"}} {cumulative}'
+            )
+        lines.append(f'order_management_latency_seconds_sum{{operation="{name}"}} {seconds}')
+        lines.append(f'order_management_latency_seconds_count{{operation="{name}"}} {calls}')
+
+    lines += [
+        "# HELP order_management_bytes_total Bytes read from and written to the data files.",
+        "# TYPE order_management_bytes_total counter",
+    ]
+    for (direction, kind), count in sorted(_bytes.items()):
+        lines.append(f'order_management_bytes_total{{direction="{direction}",file="{kind}"}} {count}')
+    return "\n".join(lines) + "\n"
+
+
+def writeSnapshot(path: str):
+    """Writes the counts recorded so far to a file, as Prometheus text for a `.prom` file, as JSON otherwise"""
+    if path.endswith(".prom"):
+        text = prometheus()
+    else:
+        text = json.dumps(snapshot(), indent=4)
+    with open(path, "w") as f:
+        f.write(text)
+
+
+if ENABLED and SETTING != "1":
+    atexit.register(writeSnapshot, SETTING)
+
+_profile = os.environ.get("ORDER_MANAGEMENT_PROFILE")
+if _profile:
+    _profiler = cProfile.Profile()
+    _profiler.enable()
+
+    def _dumpProfile():
+        _profiler.disable()
+        _profiler.dump_stats(_profile)
+
+    atexit.register(_dumpProfile)
@@ -0,0 +1,112 @@
+"""Copies the JSON data files into a SQLite database.
+
+Run from the root of the repository:
+
+    python -m order_management.migrate [--data data] [--db data/pharmacy.db]
+
+then start the application with ORDER_MANAGEMENT_DB=data/pharmacy.db to use it.
+"""
+
+import argparse
+import os
+import sys
+
+from .journal import openJournal, salesFile
+from .storage import (
+    JSONPrescriptions,
+    JSONProducts,
+    JSONWishlist,
+    SQLitePrescriptions,
+    SQLiteProducts,
+    SQLiteSalesJournal,
+    SQLiteWishlist,
+    disconnect,
+)
+
+# number of sales inserted per transaction
+BATCH_SIZE = 10_000
+
+
+def _remove(db: str):
+    """Removes a database and the files SQLite keeps next to it"""
+    for path in (db, db + "-wal", db + "-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def migrate(data: str, db: str):
+    """Copies the products, sales, prescriptions and wishlists of a data directory to a new database
+
+    The database is built next to its path and moved there once complete,
+    so a migration that is interrupted can just be run again.
+
+    Args:
+        data: the directory holding the JSON files
+        db: path to the database to create
+    """
+
+    if os.path.exists(db):
+        raise Exception(f"{db} already exists")
+
+    # what is left of an interrupted migration is started over
+    root, extension = os.path.splitext(db)
+    building = f"{root}.migrating{extension}"
+    _remove(building)
+    try:
+        _copy(data, building)
+        disconnect(building)
+        os.replace(building, db)
+    except:
+        disconnect(building)
+        _remove(building)
+        raise
+
+
+def _copy(data: str, db: str):
+    """Copies the JSON files of a data directory to a database (see `migrate`)"""
+    products = JSONProducts(os.path.join(data, "products.json")).load()
+    SQLiteProducts(db).save(products)
+    print(f"{len(products)} products")
+
+    sales = SQLiteSalesJournal(db)
+    batch, count = [], 0
+    for sale in openJournal(salesFile(data)).read():
+        batch.append(sale)
+        if len(batch) == BATCH_SIZE:
+            sales.append(batch)
+            count += len(batch)
+            batch = []
+    sales.append(batch)
+    print(f"{count + len(batch)} sales")
+
+    prescriptions = SQLitePrescriptions(db)
+    data_prescriptions = {}
+    # the prescriptions saved since the file was written are in its journal
+    for prescription in JSONPrescriptions(os.path.join(data, "prescriptions.json")).load():
+        data_prescriptions[prescription["PrescriptionID"]] = prescription
+    prescriptions.saveMany(list(data_prescriptions.values()))
+    print(f"{len(data_prescriptions)} prescriptions")
+
+    legacy = JSONWishlist(os.path.join(data, "wishlist.json"))
+    wishlists = SQLiteWishlist(db)
+    count = 0
+    for user in legacy.users():
+        items = legacy.load(user)
+        wishlists.save(user, items)
+        count += len(items)
+    print(f"{count} wishlist items")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", default="data", help="directory of the JSON files")
+    parser.add_argument("--db", default="data/pharmacy.db", help="database to create")
+    args = parser.parse_args()
+    try:
+        migrate(args.data, args.db)
+    except Exception as e:
+        sys.exit(f"Migration failed: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""Queries of the sales journal split over several processes
+
+Each query is run on chunks of the journal, line aligned ranges of bytes
+(within the partitions overlapping the period queried, if the journal is
+partitioned), by a pool of processes. Each process parses its chunk and returns a
+partial result: a sum, the totals by key, the matching sales or its top n.
+The partial results are merged in the order of the chunks, so that the
+sales come out in the order they were recorded, as with `SaleStream`. The
+sums are returned exactly (see `addExactly`) and rounded once merged, so
+they are the same as in a single pass.
+"""
+
+import heapq
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Tuple
+
+from .journal import iter_jsonl, openJournal
+from .sale import Sale
+from .stream import SaleStream, addExactly
+
+# number of chunks per process, so that a process given a slower chunk doesn't hold the others back
+CHUNKS_PER_WORKER = 4
+# below that size for a chunk, the journal is scanned in this process as the pool would cost more than it saves
+MIN_CHUNK_BYTES = 1 << 20
+
+# the pool of each number of processes, started on first use
+_executors: Dict[int, ProcessPoolExecutor] = {}
+
+
+def _records(path: str, start: int, end: int) -> Iterator[Dict]:
+    """Reads the records of the journal between two positions, at the start of lines"""
+    with open(path, "rb") as f:
+        f.seek(start)
+        for record, _ in iter_jsonl(f, end - start):
+            yield record
+
+
+def _total(records: Iterator[Dict]) -> List[float]:
+    partials = []
+    for record in records:
+        addExactly(partials, record["purchase_price"])
+    return partials
+
+
+def _totalWhere(records: Iterator[Dict], field: str, value) -> List[float]:
+    return _total(record for record in records if record[field] == value)
+
+
+def _where(records: Iterator[Dict], field: str, value) -> List[Dict]:
+    return [record for record in records if record[field] == value]
+
+
+def _prescriptionTotals(records: Iterator[Dict]) -> Dict[str, List[float]]:
+    totals = {}
+    for record in records:
+        prescriptionID = record["prescriptionID"]
+        if prescriptionID is not None:
+            addExactly(totals.setdefault(prescriptionID, []), record["purchase_price"])
+    return totals
+
+
+def _between(records: Iterator[Dict], start: float, end: float) -> List[Dict]:
+    return [record for record in records if start <= record["timestamp"] <= end]
+
+
+def _top(records: Iterator[Dict], n: int, start: float, end: float) -> Tuple[int, List]:
+    """Returns the number of sales of the period in the chunk, and its n largest with their rank among them"""
+    count = 0
+
+    def period():
+        nonlocal count
+        for record in records:
+            if start <= record["timestamp"] <= end:
+                yield count, record
+                count += 1
+
+    top = heapq.nlargest(n, period(), key=lambda row: (row[1]["purchase_price"], -row[0]))
+    return count, top
+
+
+QUERIES = {
+    "total": _total,
+    "totalWhere": _totalWhere,
+    "where": _where,
+    "prescriptionTotals": _prescriptionTotals,
+    "between": _between,
+    "top": _top,
+}
+
+
+def _scan(query: str, path: str, start: int, end: int, args: tuple):
+    """Runs a query on a chunk of the journal, in a process of the pool"""
+    return QUERIES[query](_records(path, start, end), *args)
+
+
+class ParallelSaleStream(SaleStream):
+    """The sales of a journal, each query being split over several processes
+
+    Gives the same results as `SaleStream`, the sums included.
+
+    Attributes:
+        path: path to the sales file (see `SalesJournal`)
+        workers: number of processes (default: the number of CPUs)
+    """
+
+    def __init__(self, path: str, workers: int = None) -> None:
+        super().__init__(path)
+        self.workers = workers or os.cpu_count() or 1
+
+    def _chunks(self, start: float = None, end: float = None) -> List[Tuple[str, int, int]]:
+        """Splits the journal into ranges of bytes starting and ending at the start of lines
+
+        Args:
+            start, end: a period, only the partitions overlapping it are split (see `SalesPartitions.segments`)
+
+        Returns: The file of each range, where it starts and where it ends in the file
+        """
+        segments = openJournal(self.path).segments(start, end)
+        total = sum(size for _, _, size in segments)
+        count = 1
+        if self.workers > 1:
+            count = max(1, min(self.workers * CHUNKS_PER_WORKER, total // MIN_CHUNK_BYTES))
+        chunks = []
+        for path, _, size in segments:
+            # the files get chunks in proportion to their size
+            parts = max(1, round(count * size / total)) if total else 1
+            bounds = [0]
+            with open(path, "rb") as f:
+                for i in range(1, parts):
+                    # the chunk ends after the line going over its share of the file
+                    f.seek(size * i // parts - 1)
+                    f.readline()
+                    bound = f.tell()
+                    if bound > bounds[-1]:
+                        bounds.append(bound)
+            if bounds[-1] < size:
+                bounds.append(size)
+            chunks.extend((path, begin, stop) for begin, stop in zip(bounds, bounds[1:]))
+        return chunks
+
+    def _run(self, query: str, *args, start: float = None, end: float = None) -> list:
+        """Runs a query on each chunk of the journal, returns the partial results in the order of the chunks"""
+        chunks = self._chunks(start, end)
+        if len(chunks) <= 1 or self.workers == 1:
+            return [_scan(query, path, begin, stop, args) for path, begin, stop in chunks]
+        executor = _executors.get(self.workers)
+        if executor is None:
+            executor = _executors[self.workers] = ProcessPoolExecutor(self.workers)
+        futures = [
+            executor.submit(_scan, query, path, begin, stop, args)
+            for path, begin, stop in chunks
+        ]
+        return [future.result() for future in futures]
+
+    def total(self) -> float:
+        return math.fsum(partial for partials in self._run("total") for partial in partials)
+
+    def where(self, field: str, value) -> List[Sale]:
+        return [Sale(**record) for records in self._run("where", field, value) for record in records]
+
+    def totalWhere(self, field: str, value) -> float:
+        return math.fsum(
+            partial for partials in self._run("totalWhere", field, value) for partial in partials
+        )
+
+    def prescriptionTotals(self) -> Dict[str, float]:
+        # the chunks are merged in order, so that the prescriptions stay in the order they first appear
+        totals = {}
+        for chunk in self._run("prescriptionTotals"):
+            for prescriptionID, partials in chunk.items():
+                totals.setdefault(prescriptionID, []).extend(partials)
+        return {prescriptionID: math.fsum(partials) for prescriptionID, partials in totals.items()}
+
+    def between(self, start: float, end: float) -> Iterator[Sale]:
+        return (
+            Sale(**record)
+            for records in self._run("between", start, end, start=start, end=end)
+            for record in records
+        )
+
+    def top(self, n: int, start: float, end: float) -> List[Sale]:
+        # the rank of a sale in the period is its rank in its chunk after those of the chunks before
+        candidates = []
+        offset = 0
+        for count, top in self._run("top", n, start, end, start=start, end=end):
+            candidates.extend((offset + rank, record) for rank, record in top)
+            offset += count
+        top = heapq.nlargest(
+            n, candidates, key=lambda row: (row[1]["purchase_price"], -row[0])
+        )
+        return [Sale(**record) for _, record in top]
@@ -0,0 +1,53 @@
+"""Splits the sales journal into partitions by month, or merges the old ones.
+
+See `SalesPartitions`: a directory (data/sales/ next to data/sales.jsonl)
+holds a JSONL file per month of sales and a manifest of their periods and
+numbers of sales. A query over a period only reads the partitions that
+overlap it.
+
+Run from the root of the repository to split data/sales.jsonl into
+partitions, or to merge those of the sales made before a date:
+
+    python -m order_management.partitions data/sales [--compact-before 2024-01-01]
+
+then the application uses data/sales/ instead of data/sales.jsonl.
+"""
+
+import argparse
+import sys
+from datetime import datetime
+
+from .journal import SalesPartitions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", nargs="?", default="data/sales", help="directory of the partitions")
+    parser.add_argument(
+        "--compact-before",
+        type=datetime.fromisoformat,
+        help="merge the partitions of the sales made before that date (YYYY-MM-DD)",
+    )
+    args = parser.parse_args()
+
+    journal = SalesPartitions(args.path)
+    try:
+        journal.migrate()
+        if args.compact_before is not None:
+            count = journal.compact(args.compact_before.timestamp())
+            print(f"{count} partitions merged")
+        partitions = journal.manifest()
+    except FileNotFoundError:
+        sys.exit(f"No sales found at {args.path}")
+
+    print(f"{'File':<24} {'First sale':<20} {'Last sale':<20} {'Rows':>10}")
+    for partition in partitions:
+        first, last = (
+            datetime.fromtimestamp(partition[key]).strftime("%Y-%m-%d %H:%M:%S")
+            for key in ("start", "end")
+        )
+        print(f"{partition['file']:<24} {first:<20} {last:<20} {partition['rows']:>10}")
+
+
+if __name__ == "__main__":
+    main()
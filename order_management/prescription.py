@@ -1,7 +1,10 @@
-import json
+from __future__ import annotations
 
-from typing import List, Dict, Union
+import os
+from typing import List, Dict, Optional, Union
+from .metrics import instrumented
 from .product import Product
+from .storage import prescriptionRepository
 
 
 class Prescription:
@@ -13,6 +16,7 @@ class Prescription:
         Medications: list of the medications, this is the quantity, the ID, the name, and whether it was processed or not
         # see format in prescriptions.json
         CustomerID: ID of the customer
+        Date: the date of the prescription
     """
 
     def __init__(
@@ -27,6 +31,7 @@ class Prescription:
         self.PrescriptionID = PrescriptionID
         self.Medications = Medications
         self.CustomerID = CustomerID
+        self.Date = Date
 
     def medicineInPrescription(self, product: Product, quantity: int) -> bool:
         """Verifies if a medicine with the specified quantity is included in a prescription
@@ -37,10 +42,9 @@ class Prescription:
 
         Returns: A boolean denoting whether the value was found
         """
-        # Check if the quantity is within the specified prescription
-        #
+        # Check if the quantity is within the specified prescription (see the keys in prescriptions.json)
         for med in self.Medications:
-            if med["ID"] == product.code and med["Quantity"] <= quantity:
+            if med["id"] == product.code and quantity <= med["quantity"]:
                 return True
         return False
 
@@ -54,49 +58,147 @@ class Prescription:
         """
         # Changing the value "ProcessedStatus" of the relevant product to True
         for med in self.Medications:
-            if med["ID"] == product.code:
+            if med["id"] == product.code:
                 med["ProcessedStatus"] = True
 
+    @instrumented
     def dump(self, outfile: str):
         """Dumps the updated prescription to the specified file
 
         Args:
-            outfile: path to the file where the output should be written
+            outfile: path to the file where the output should be written, a JSON file or a SQLite database
 
         Returns: None
         """
 
-        #  Writing changes back to the original file
-        try:
-            with open(outfile, "r") as f:
-                data = json.load(f)
-        except FileNotFoundError:
-            data = []
-
-        for idx, prescription in enumerate(data):
-            if prescription["PrescriptionID"] == self.PrescriptionID:
-                data[idx] = self.__dict__  # Update the prescription object
-
-        with open(outfile, "w") as f:
-            json.dump(data, f, indent=4)
+        #  Only this prescription is written (see `PrescriptionStore.save`)
+        PrescriptionStore.open(outfile).save(self)
 
     @classmethod
+    @instrumented
     def get(cls, inFile: str, id: str):
         """Retrieves a specific prescription from a file
 
         Args:
-            inFile: path to the input file
+            inFile: path to the input file, a JSON file or a SQLite database
             id: identifier of the prescription to add
 
-        Returns: A prescription object as a dictionary
+        Returns: A prescription object, None if it isn't found
         """
 
-        #  Reading the file and returning relevant prescriptions depending on ID
+        #  The prescriptions of the file are kept in memory between calls
         try:
-            with open(inFile, "r") as f:
-                data = json.load(f)
-                for prescription in data:
-                    if prescription["PrescriptionID"] == id:
-                        return cls(**prescription)
+            return PrescriptionStore.open(inFile).getPrescriptionByID(id)
         except FileNotFoundError:
             raise Exception("Prescriptions file not found")
+
+
+# one store per file, shared by the calls to `Prescription.get` and `Prescription.dump`
+_stores = {}
+
+
+class PrescriptionStore:
+    """The prescriptions of a file, kept in memory and indexed by ID and by customer
+
+    The prescriptions are loaded on first use. Each lookup first picks up
+    the prescriptions saved since (by this process or another one), reading
+    the whole file again only if it was rewritten.
+
+    Attributes:
+        filename: the file of the prescriptions, a JSON file or a SQLite database
+    """
+
+    def __init__(self, filename: str = "data/prescriptions.json") -> None:
+        self.filename = filename
+        self._repository = prescriptionRepository(filename)
+        # the prescriptions as dictionaries, by ID, None until loaded
+        self._by_id = None
+        self._by_customer = {}
+
+    def _index(self, prescription: Dict):
+        """Adds a prescription to the indexes, replacing the one with the same ID"""
+        id = prescription["PrescriptionID"]
+        previous = self._by_id.get(id)
+        if previous is not None and previous["CustomerID"] != prescription["CustomerID"]:
+            self._by_customer[previous["CustomerID"]].remove(id)
+            previous = None
+        self._by_id[id] = prescription
+        if previous is None:
+            self._by_customer.setdefault(prescription["CustomerID"], []).append(id)
+
+    def refresh(self):
+        """Picks up the prescriptions saved since the last lookup"""
+        updates = None if self._by_id is None else self._repository.updates()
+        if updates is None:
+            self._by_id = {}
+            self._by_customer = {}
+            updates = self._repository.load()
+        for prescription in updates:
+            self._index(prescription)
+
+    @staticmethod
+    def _toPrescription(prescription: Dict) -> Prescription:
+        # the callers may modify the prescription, without it changing here before it is saved
+        medications = [dict(med) for med in prescription["Medications"]]
+        return Prescription(**dict(prescription, Medications=medications))
+
+    def getPrescriptionByID(self, id: str) -> Optional[Prescription]:
+        """Gets a prescription by its ID
+
+        Args:
+            id: identifier of the prescription
+
+        Returns: The prescription, None if it isn't found
+        """
+        self.refresh()
+        prescription = self._by_id.get(id)
+        if prescription is None:
+            return None
+        return self._toPrescription(prescription)
+
+    def getPrescriptionsByCustomer(self, customerID: str) -> List[Prescription]:
+        """Gets the prescriptions of a customer, for example to refill them
+
+        Args:
+            customerID: ID of the customer
+
+        Returns: The prescriptions of the customer, in the order they were first saved
+        """
+        self.refresh()
+        return [
+            self._toPrescription(self._by_id[id])
+            for id in self._by_customer.get(customerID, [])
+        ]
+
+    def save(self, prescription: Prescription):
+        """Saves a prescription, replacing the one with the same ID
+
+        Args:
+            prescription: the prescription to save
+        """
+        self.saveMany([prescription])
+
+    def saveMany(self, prescriptions: List[Prescription]):
+        """Saves several prescriptions at once, replacing those with the same IDs
+
+        Args:
+            prescriptions: the prescriptions to save
+        """
+        records = [self._toPrescription(prescription.__dict__).__dict__ for prescription in prescriptions]
+        self._repository.saveMany(records)
+        if self._by_id is not None:
+            for record in records:
+                self._index(record)
+
+    @staticmethod
+    def open(filename: str) -> PrescriptionStore:
+        """Returns the store of a file, created on first use
+
+        Args:
+            filename: the file of the prescriptions, a JSON file or a SQLite database
+        """
+        key = os.path.abspath(filename)
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = PrescriptionStore(filename)
+        return store
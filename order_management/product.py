@@ -16,6 +16,19 @@ class Product:
 
     """
 
+    # no per-instance dictionary, catalogs can hold a large number of products
+    __slots__ = (
+        "code",
+        "name",
+        "brand",
+        "quantity",
+        "category",
+        "description",
+        "price",
+        "dosage_instruction",
+        "requires_prescription",
+    )
+
     def __init__(
         self,
         code: str,
@@ -38,6 +51,23 @@ class Product:
         self.dosage_instruction = dosage_instruction
         self.requires_prescription = requires_prescription != 0
 
+    def to_dict(self) -> dict:
+        """Returns the product as a dictionary, in the format of the stock file
+
+        Returns: A dictionary
+        """
+        return {
+            "code": self.code,
+            "name": self.name,
+            "brand": self.brand,
+            "description": self.description,
+            "quantity": self.quantity,
+            "price": self.price,
+            "dosage_instruction": self.dosage_instruction,
+            "requires_prescription": self.requires_prescription,
+            "category": self.category,
+        }
+
     def to_json(self) -> str:
         """Returns a valid JSON representation of the object
 
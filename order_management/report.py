@@ -0,0 +1,117 @@
+from datetime import datetime
+from functools import lru_cache
+from itertools import islice
+from typing import Iterable, TextIO, Tuple
+
+RECORDS_HEADER = (
+    "|    # | Date                | Customer   | Medication | Quantity | Purchase Price | Prescription |\n"
+    "|------|---------------------|------------|------------|----------|----------------|--------------|\n"
+)
+PRESCRIPTIONS_HEADER = (
+    "|    # | Prescription ID |  Total Price  |\n"
+    "|------|-----------------|---------------|\n"
+)
+
+# number of rows formatted before they are written to the stream
+CHUNK_ROWS = 1000
+
+
+@lru_cache(maxsize=1 << 16)
+def _formatSecond(second: int) -> str:
+    """Formats a whole UNIX timestamp, the sales of a same second share the result"""
+    return datetime.fromtimestamp(second).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def formatTimestamp(timestamp: float) -> str:
+    """Formats a UNIX timestamp as shown in the reports (%Y-%m-%d %H:%M:%S)
+
+    Args:
+        timestamp: the UNIX timestamp
+
+    Returns: A string
+    """
+    second = int(timestamp // 1)
+    # datetime rounds to the microsecond, which can carry to the next second
+    if timestamp - second >= 0.9999995:
+        return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+    return _formatSecond(second)
+
+
+def _write(stream: TextIO, header: str, lines: Iterable[str]):
+    """Writes a header and lines to a stream, a chunk of lines at a time"""
+    stream.write(header)
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) == CHUNK_ROWS:
+            stream.write("".join(chunk))
+            chunk.clear()
+    if chunk:
+        stream.write("".join(chunk))
+
+
+def _page(rows: Iterable, page_size: int, more: list) -> Iterable:
+    """Yields at most page_size rows, and records in `more` whether rows were left"""
+    rows = iter(rows)
+    if page_size is None:
+        yield from rows
+        return
+    yield from islice(rows, page_size)
+    more.append(next(rows, None) is not None)
+
+
+def renderRecords(
+    stream: TextIO, rows: Iterable[Tuple], page_size: int = None, offset: int = 0
+) -> bool:
+    """Writes a table of sales to a text stream
+
+    Args:
+        stream: where to write the table, for example sys.stdout or an io.StringIO
+        rows: tuples of (timestamp, customerID, name, quantity, purchase_price, prescriptionID), starting at `offset`
+        page_size: maximum number of rows to write (default: all of them)
+        offset: number of rows before the first one, to number them
+
+    Returns: Whether there are rows after the ones written
+    """
+    more = []
+    lines = (
+        f"| {idx:4} | {formatTimestamp(timestamp)} | {customerID:10} | {name:10} |"
+        f" {quantity:8} | {purchase_price:10.2f} Rwf | {'None' if prescriptionID is None else prescriptionID:12} |\n"
+        for idx, (
+            timestamp,
+            customerID,
+            name,
+            quantity,
+            purchase_price,
+            prescriptionID,
+        ) in enumerate(_page(rows, page_size, more), start=offset + 1)
+    )
+    _write(stream, RECORDS_HEADER, lines)
+    return bool(more and more[0])
+
+
+def renderPrescriptions(
+    stream: TextIO,
+    totals: Iterable[Tuple[str, float]],
+    page_size: int = None,
+    offset: int = 0,
+) -> bool:
+    """Writes a table of the total price of each prescription to a text stream
+
+    Args:
+        stream: where to write the table
+        totals: pairs of (prescription ID, total price), starting at `offset`
+        page_size: maximum number of rows to write (default: all of them)
+        offset: number of rows before the first one, to number them
+
+    Returns: Whether there are rows after the ones written
+    """
+    more = []
+    lines = (
+        f"| {idx:4} | {prescription_id:15} | {total_price:9.2f} Rwf |\n"
+        for idx, (prescription_id, total_price) in enumerate(
+            _page(totals, page_size, more), start=offset + 1
+        )
+    )
+    _write(stream, PRESCRIPTIONS_HEADER, lines)
+    return bool(more and more[0])
@@ -13,6 +13,19 @@ class Sale:
         prescriptionID: identifier of the prescription used in the sale
     """
 
+    # no per-instance dictionary, the records can number in the millions
+    __slots__ = (
+        "id",
+        "name",
+        "quantity",
+        "price",
+        "purchase_price",
+        "timestamp",
+        "customerID",
+        "salesperson",
+        "prescriptionID",
+    )
+
     def __init__(
         self,
         id: str,
@@ -35,6 +48,13 @@ class Sale:
         self.salesperson = salesperson
         self.prescriptionID = prescriptionID
 
+    def to_dict(self) -> dict:
+        """Returns the sale as a dictionary, in the format of the sales file
+
+        Returns: A dictionary
+        """
+        return {field: getattr(self, field) for field in self.__slots__}
+
     def __str__(self) -> str:
         """Returns a string representation of a Sale object.
 
@@ -0,0 +1,171 @@
+import bisect
+import heapq
+import re
+from typing import Dict, Iterable, List, Tuple
+from .product import Product
+
+WORD = re.compile(r"\w+")
+# weight of a word in each field of a product, a match in the name ranks first
+FIELD_WEIGHTS = (("name", 8), ("brand", 4), ("category", 2), ("description", 1))
+# a word matching a term exactly weighs that much more than one only starting with it
+EXACT_BONUS = 2
+# up to that many words starting with a term, the products are looked up in their postings rather than checked word by word
+LOOKUP_WORDS = 8
+
+
+def tokenize(text: str) -> List[str]:
+    """Returns the words of a text, in lower case"""
+    return WORD.findall(text.lower()) if text else []
+
+
+class SearchIndex:
+    """Inverted index of the products over their name, brand, category and description
+
+    Every word of a query matches the words of the products starting with
+    it, and a product is found if it matches all the words of the query.
+    The words of the index are kept sorted, so that the words starting
+    with a term are a range found by binary search.
+    """
+
+    def __init__(self, products: Iterable[Product] = ()) -> None:
+        # word -> the products holding it, by code, with the weight of the fields it is in
+        self._postings: Dict[str, Dict[str, int]] = {}
+        # the words of the postings, sorted
+        self._words: List[str] = []
+        # code -> the words of the product with their weight, to check the other terms of a query
+        self._words_of: Dict[str, Dict[str, int]] = {}
+        self._products: Dict[str, Product] = {}
+        # code -> rank of the product by name, to order the products with the same score, None after a change
+        self._order: Dict[str, int] = None
+        for product in products:
+            self._add(product)
+        self._words = sorted(self._postings)
+        self._nameOrder()
+
+    @staticmethod
+    def _weights(product: Product) -> Dict[str, int]:
+        """Returns the words of a product, with the weights of the fields they are in added up"""
+        weights = {}
+        for field, weight in FIELD_WEIGHTS:
+            for word in set(tokenize(getattr(product, field))):
+                weights[word] = weights.get(word, 0) + weight
+        return weights
+
+    def _add(self, product: Product) -> List[str]:
+        """Indexes a product, returns the words new to the index"""
+        weights = self._weights(product)
+        self._words_of[product.code] = weights
+        self._products[product.code] = product
+        new = []
+        for word, weight in weights.items():
+            postings = self._postings.get(word)
+            if postings is None:
+                postings = self._postings[word] = {}
+                new.append(word)
+            postings[product.code] = weight
+        return new
+
+    def add(self, product: Product):
+        """Adds a product to the index, replacing the one with the same code"""
+        if product.code in self._products:
+            self.remove(self._products[product.code])
+        self._order = None
+        for word in self._add(product):
+            bisect.insort(self._words, word)
+
+    def remove(self, product: Product):
+        """Removes a product from the index"""
+        self._products.pop(product.code, None)
+        self._order = None
+        for word in self._words_of.pop(product.code, {}):
+            postings = self._postings[word]
+            del postings[product.code]
+            if not postings:
+                del self._postings[word]
+                del self._words[bisect.bisect_left(self._words, word)]
+
+    def _nameOrder(self) -> Dict[str, int]:
+        """Returns the rank of each product by name, computed again after a change"""
+        if self._order is None:
+            ranked = sorted(self._products.values(), key=lambda product: (product.name, product.code))
+            self._order = {product.code: i for i, product in enumerate(ranked)}
+        return self._order
+
+    def _range(self, term: str) -> Tuple[int, int]:
+        """Returns where the words starting with a term are in the sorted words"""
+        lo = bisect.bisect_left(self._words, term)
+        hi = bisect.bisect_left(self._words, term + "\U0010ffff", lo)
+        return lo, hi
+
+    def search(self, query: str, limit: int = None) -> List[Product]:
+        """Finds the products matching all the words of a query, as prefixes
+
+        Args:
+            query: the words to look for, in any case
+            limit: maximum number of products to return (default: all of them)
+
+        Returns: The products found, the best matches first, then by name
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+
+        # the products of the term with the fewest products are checked against the other terms
+        ranges = []
+        for term in terms:
+            lo, hi = self._range(term)
+            size = sum(len(self._postings[word]) for word in self._words[lo:hi])
+            ranges.append((size, lo, hi, term))
+        ranges.sort()
+        _, lo, hi, term = ranges[0]
+        if hi - lo == 1 and len(ranges) == 1:
+            # a single word, the bonus of an exact match doesn't change the order
+            scores = dict(self._postings[self._words[lo]])
+        else:
+            scores = {}
+            for word in self._words[lo:hi]:
+                bonus = EXACT_BONUS if word == term else 1
+                for code, weight in self._postings[word].items():
+                    scores[code] = scores.get(code, 0) + weight * bonus
+        for _, lo, hi, term in ranges[1:]:
+            words = self._words[lo:hi]
+            matched = {}
+            if len(words) <= LOOKUP_WORDS:
+                # few words start with the term, each product is looked up in their postings
+                postings = [
+                    (self._postings[word], EXACT_BONUS if word == term else 1) for word in words
+                ]
+                for code, score in scores.items():
+                    term_score = 0
+                    for word_postings, bonus in postings:
+                        weight = word_postings.get(code)
+                        if weight is not None:
+                            term_score += weight * bonus
+                    if term_score:
+                        matched[code] = score + term_score
+            else:
+                # otherwise the words of each product are checked
+                for code, score in scores.items():
+                    term_score = 0
+                    for word, weight in self._words_of[code].items():
+                        if word.startswith(term):
+                            term_score += weight * (EXACT_BONUS if word == term else 1)
+                    if term_score:
+                        matched[code] = score + term_score
+            scores = matched
+
+        # the best scores first, and the products of a score by name
+        order = self._nameOrder()
+        by_score = {}
+        for code, score in scores.items():
+            by_score.setdefault(score, []).append(code)
+        ranked = []
+        for score in sorted(by_score, reverse=True):
+            codes = by_score[score]
+            if limit is None:
+                ranked.extend(sorted(codes, key=order.__getitem__))
+            else:
+                ranked.extend(heapq.nsmallest(limit - len(ranked), codes, key=order.__getitem__))
+                if len(ranked) >= limit:
+                    break
+        return [self._products[code] for code in ranked]
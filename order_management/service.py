@@ -0,0 +1,415 @@
+"""A local service holding the stock and the sales records of the pharmacy
+
+One process keeps the stock and the records in memory and serves all the
+terminals, instead of each terminal loading its own copy of the files. It
+listens on a Unix socket, or on a TCP port for an address `host:port`, and
+speaks JSON, one object per line:
+
+    {"op": "cart.add", "args": {"productCode": "P1", "quantity": 2}}
+    {"ok": true, "result": null, "output": "Product added to cart successfully\\n"}
+
+`output` is what the operation printed, as the menu would have shown it.
+Each connection has its own cart. The checkouts received while others are
+being saved are saved together: one write of the stock and one append to
+the sales journal for the whole batch.
+
+Run from the root of the repository:
+
+    python -m order_management.service [--socket data/service.sock]
+
+then start the terminals with ORDER_MANAGEMENT_SERVICE=data/service.sock
+(see `client`).
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sys
+from typing import Dict, List, Tuple
+
+from .books import BookRecords
+from .cart import Cart
+from .config import dataPaths
+from .prescription import Prescription, PrescriptionStore
+from .stock import Stock
+from .wrapper import Wrapper
+
+# how long a checkout waits for others to be saved with it, in seconds
+BATCH_DELAY = 0.002
+
+
+class Session:
+    """The state of a connection to the service
+
+    Attributes:
+        agent: username of the pharmacist using the connection
+        cart: the cart of the connection
+    """
+
+    def __init__(self, stock: Stock) -> None:
+        self.agent = None
+        self.cart = Cart(stock)
+
+
+class OrderService:
+    """Serves the cart, checkout and analytics operations of several terminals
+
+    The operations run one at a time in the event loop, so they don't need
+    any lock around the stock or the records. Saving a batch of checkouts
+    blocks the loop; the requests arriving meanwhile make the next batch.
+
+    Attributes:
+        stock: the stock, shared by all the connections
+        books: the records of the sales, kept up to date by the checkouts
+        wrap: records the sales of all the connections
+        prescriptions_file: the file where the prescriptions are read
+        batch_delay: how long a checkout waits for others to be saved with it, in seconds
+        checkouts: number of checkouts done
+        batches: number of batches of checkouts saved
+    """
+
+    def __init__(
+        self,
+        stock: Stock,
+        books: BookRecords,
+        sales_file: str = "data/sales.json",
+        prescriptions_file: str = "data/prescriptions.json",
+        batch_delay: float = BATCH_DELAY,
+    ) -> None:
+        self.stock = stock
+        self.books = books
+        self.wrap = Wrapper(
+            stock, None, books=books, sales_file=sales_file, autosave=False
+        )
+        self.prescriptions_file = prescriptions_file
+        self.batch_delay = batch_delay
+        self.checkouts = 0
+        self.batches = 0
+        # the checkouts waiting to be saved, and the task saving them
+        self._pending = []
+        self._saving = None
+        self.operations = {
+            "login": self.login,
+            "products": self.products,
+            "product": self.product,
+            "search": self.search,
+            "cart.add": self.cartAdd,
+            "cart.remove": self.cartRemove,
+            "cart.clear": self.cartClear,
+            "cart.products": self.cartProducts,
+            "cart.show": self.cartShow,
+            "checkout": self.checkout,
+            "total": self.total,
+            "report": self.report,
+            "stats": self.stats,
+        }
+
+    def login(self, session: Session, agent: str):
+        """Sets the pharmacist using the connection, recorded as the agent of its sales"""
+        session.agent = agent
+
+    def products(self, session: Session) -> List[dict]:
+        """Returns all the products of the stock"""
+        return [product.to_dict() for product in self.stock.products]
+
+    def product(self, session: Session, id: str) -> dict:
+        """Returns a product of the stock by its ID"""
+        return self.stock.getProductByID(id).to_dict()
+
+    def search(self, session: Session, query: str, limit: int = None) -> List[dict]:
+        """Returns the products matching a search, the best matches first (see `Stock.search`)"""
+        return [product.to_dict() for product in self.stock.search(query, limit)]
+
+    def cartAdd(self, session: Session, productCode: str, quantity: int):
+        session.cart.add(productCode, quantity)
+
+    def cartRemove(self, session: Session, code: str):
+        session.cart.remove(code)
+
+    def cartClear(self, session: Session):
+        session.cart.clear()
+
+    def cartProducts(self, session: Session) -> dict:
+        return dict(session.cart.products)
+
+    def cartShow(self, session: Session) -> str:
+        return str(session.cart)
+
+    def checkout(
+        self, session: Session, customerID: str, prescriptionID: str = None
+    ) -> asyncio.Future:
+        """Queues the checkout of the cart of a connection
+
+        Returns: A future of whether the checkout went through, and what it printed
+        """
+        if session.agent is None:
+            raise Exception("Log in before checking out")
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((session, customerID, prescriptionID, future))
+        if self._saving is None:
+            self._saving = asyncio.ensure_future(self._save())
+        return future
+
+    async def _save(self):
+        """Checks out and saves the queued carts, by batches"""
+        try:
+            while self._pending:
+                # the checkouts arriving meanwhile join the batch
+                await asyncio.sleep(self.batch_delay)
+                batch, self._pending = self._pending, []
+                try:
+                    results = self._checkoutBatch([request[:3] for request in batch])
+                except Exception as e:
+                    for *_, future in batch:
+                        future.set_exception(e)
+                    continue
+                for (*_, future), result in zip(batch, results):
+                    future.set_result(result)
+        finally:
+            self._saving = None
+
+    def _checkoutBatch(self, batch: List[tuple]) -> List[Tuple[bool, str]]:
+        """Checks out several carts and saves them at once
+
+        Args:
+            batch: the session, customer ID and prescription ID of each checkout
+
+        Returns: Whether each checkout went through, and what it printed
+        """
+        carts = [dict(session.cart.products) for session, *_ in batch]
+        # one object per prescription, so that the checkouts of a batch using the same one all update it
+        prescriptions = {}
+        try:
+            try:
+                with self.stock.deferWrites():
+                    results = [self._checkout(*request, prescriptions) for request in batch]
+            except ValueError:
+                # another terminal changed the stock file meanwhile: each checkout is done again on its own
+                self.wrap.discard()
+                for (session, *_), products in zip(batch, carts):
+                    session.cart.products = products
+                prescriptions = {}
+                self.wrap.autosave = True
+                try:
+                    results = [self._checkout(*request, prescriptions) for request in batch]
+                finally:
+                    self.wrap.autosave = False
+            else:
+                self.wrap.dump(self.wrap.sales_file)
+        except:
+            # nothing of the batch was saved: the sales are forgotten and the carts given back
+            self.wrap.discard()
+            for (session, *_), products in zip(batch, carts):
+                session.cart.products = products
+            raise
+
+        # the prescriptions filled, so that they can't be filled again, even after a restart
+        used = [prescription for prescription in prescriptions.values() if prescription is not None]
+        if used:
+            PrescriptionStore.open(self.prescriptions_file).saveMany(used)
+        self.batches += 1
+        self.checkouts += len(batch)
+        return results
+
+    def _checkout(
+        self,
+        session: Session,
+        customerID: str,
+        prescriptionID: str = None,
+        prescriptions: Dict[str, Prescription] = None,
+    ) -> Tuple[bool, str]:
+        """Checks out the cart of a connection
+
+        Args:
+            prescriptions: the prescriptions used by the batch so far, by ID, the one of this checkout is added to it
+
+        Returns: Whether the checkout went through, and what it printed
+        """
+        output = io.StringIO()
+        sold = len(self.wrap.sales)
+        if prescriptions is None:
+            prescriptions = {}
+        with contextlib.redirect_stdout(output):
+            prescription = None
+            if prescriptionID:
+                try:
+                    if prescriptionID not in prescriptions:
+                        prescriptions[prescriptionID] = Prescription.get(
+                            self.prescriptions_file, prescriptionID
+                        )
+                    prescription = prescriptions[prescriptionID]
+                except Exception as e:
+                    print(e)
+                    return False, output.getvalue()
+                if prescription is None:
+                    print("Prescription not found")
+                    return False, output.getvalue()
+                # a line already filled, by this batch or before, can't be filled again
+                for med in prescription.Medications:
+                    if med["id"] in session.cart.lines and med.get("ProcessedStatus"):
+                        print(f"Prescription already filled for '{med['name']}'")
+                        return False, output.getvalue()
+            self.wrap.agentID = session.agent
+            self.wrap.checkout(session.cart, customerID, prescription)
+        return len(self.wrap.sales) > sold, output.getvalue()
+
+    def total(self, session: Session) -> float:
+        """Returns the total income from the sales"""
+        # only picks up the sales recorded by terminals not using the service, if any
+        self.books.refresh()
+        return self.books.totalTransactions()
+
+    def report(
+        self,
+        session: Session,
+        kind: str,
+        page_size: int = None,
+        offset: int = 0,
+        customerID: str = None,
+        salesperson: str = None,
+    ) -> dict:
+        """Renders a page of a report on the sales
+
+        Args:
+            kind: "records", "prescriptions", "user" (with customerID), "agent" (with salesperson) or "top"
+            page_size: maximum number of rows (default: all of them)
+            offset: number of rows to skip
+
+        Returns: The text of the page, and whether there are rows after it
+        """
+        self.books.refresh()
+        if kind == "records":
+            render = self.books.render
+        elif kind == "prescriptions":
+            render = self.books.renderPrescriptions
+        elif kind == "user":
+            render = self.books.userRecords(customerID=customerID).render
+        elif kind == "agent":
+            render = self.books.agentRecords(salesperson=salesperson).render
+        elif kind == "top":
+            render = self.books.topNRecords().render
+        else:
+            raise Exception(f"Unknown report '{kind}'")
+        text = io.StringIO()
+        more = render(text, page_size=page_size, offset=offset)
+        return {"text": text.getvalue(), "more": more}
+
+    def stats(self, session: Session) -> dict:
+        """Returns the number of checkouts done and of batches saved, for the load tests"""
+        return {"checkouts": self.checkouts, "batches": self.batches}
+
+    async def handle(self, session: Session, line: bytes) -> dict:
+        """Runs a request of a connection
+
+        Args:
+            session: the state of the connection
+            line: the request, as a line of JSON
+
+        Returns: The response
+        """
+        try:
+            request = json.loads(line)
+            operation = self.operations[request["op"]]
+            args = request.get("args", {})
+        except (ValueError, KeyError, TypeError):
+            return {"ok": False, "error": "Invalid request"}
+
+        output = io.StringIO()
+        try:
+            with contextlib.redirect_stdout(output):
+                result = operation(session, **args)
+            if isinstance(result, asyncio.Future):
+                result, printed = await result
+                output.write(printed)
+        except Exception as e:
+            return {"ok": False, "error": str(e), "output": output.getvalue()}
+        return {"ok": True, "result": result, "output": output.getvalue()}
+
+    async def serve(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        """Answers the requests of a connection, in order"""
+        session = Session(self.stock)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                response = await self.handle(session, line)
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def run(self, address: str):
+        """Serves the connections until the process is stopped
+
+        Args:
+            address: the path of a Unix socket, or host:port
+        """
+        host, _, port = address.rpartition(":")
+        if port.isdigit():
+            server = await asyncio.start_server(
+                self.serve, host or "127.0.0.1", int(port)
+            )
+        else:
+            # a socket left by a service that stopped
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(address)
+            server = await asyncio.start_unix_server(self.serve, address)
+        async with server:
+            await server.serve_forever()
+
+    @staticmethod
+    def load(
+        stock_file: str,
+        sales_file: str,
+        prescriptions_file: str,
+        batch_delay: float = BATCH_DELAY,
+    ) -> "OrderService":
+        """Loads the stock and the records of the service from the files
+
+        Args:
+            stock_file: the stock file, a JSON file or a SQLite database
+            sales_file: the sales file, a JSON file or a SQLite database
+            prescriptions_file: the prescriptions file, a JSON file or a SQLite database
+            batch_delay: how long a checkout waits for others to be saved with it, in seconds
+        """
+        return OrderService(
+            Stock.load(stock_file),
+            BookRecords.load(sales_file),
+            sales_file,
+            prescriptions_file,
+            batch_delay,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--socket", default="data/service.sock", help="Unix socket, or host:port"
+    )
+    parser.add_argument("--data", default="data", help="directory of the JSON files")
+    args = parser.parse_args()
+
+    paths = dataPaths(args.data)
+    stock_file, sales_file, prescriptions_file = paths["stock"], paths["sales"], paths["prescriptions"]
+
+    try:
+        service = OrderService.load(stock_file, sales_file, prescriptions_file)
+    except Exception as e:
+        sys.exit(f"Could not load the data: {e}")
+    print(f"Serving on {args.socket}")
+    try:
+        asyncio.run(service.run(args.socket))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
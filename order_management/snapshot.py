@@ -0,0 +1,130 @@
+"""Binary snapshots of what is loaded at startup, written next to the files they are read from
+
+A snapshot is a pickle (protocol 5) whose arrays are written out of band,
+as raw bytes after it, followed by a checksum of the whole:
+
+    MAGIC | size of the pickle | number of buffers | size of each buffer | checksum | pickle | buffers
+
+It is memory mapped on load and the arrays are copied out of the mapping
+in one go, without parsing anything, so that loading takes about the same
+time whatever the number of sales. The JSON files stay the source of
+truth: a snapshot records the version of the file it was taken from, and
+is ignored, then taken again, once that file has changed.
+"""
+
+import mmap
+import os
+import pickle
+import struct
+import zlib
+from array import array
+from pickle import PickleBuffer
+from typing import Dict, Optional, Tuple
+
+from . import metrics
+from .atomic import atomic_open
+
+MAGIC = b"OMSNAP1\n"
+_HEADER = struct.Struct("<8sQQ")
+_CHECKSUM = struct.Struct("<I")
+
+
+def snapshotPath(path: str) -> str:
+    """Returns the path of the snapshot of a file or directory, next to it"""
+    return path.rstrip("/" + os.sep) + ".snapshot"
+
+
+def packArray(values: array) -> Tuple[str, PickleBuffer]:
+    """Wraps an array for `writeSnapshot` to write its content out of band"""
+    return values.typecode, PickleBuffer(values)
+
+
+def unpackArray(packed: Tuple[str, memoryview]) -> array:
+    """Copies an array packed with `packArray` out of the snapshot read by `readSnapshot`"""
+    typecode, view = packed
+    values = array(typecode)
+    values.frombytes(view)
+    view.release()
+    return values
+
+
+def writeSnapshot(path: str, state: Dict):
+    """Writes a snapshot, replacing the previous one at once
+
+    Args:
+        path: path to the snapshot (see `snapshotPath`)
+        state: the objects to save, with arrays wrapped by `packArray`
+    """
+    buffers = []
+    data = pickle.dumps(state, protocol=5, buffer_callback=buffers.append)
+    views = [buffer.raw() for buffer in buffers]
+    header = _HEADER.pack(MAGIC, len(data), len(views)) + struct.pack(
+        f"<{len(views)}Q", *(view.nbytes for view in views)
+    )
+    checksum = zlib.crc32(header)
+    checksum = zlib.crc32(data, checksum)
+    for view in views:
+        checksum = zlib.crc32(view, checksum)
+
+    with atomic_open(path, "wb") as f:
+        f.write(header)
+        f.write(_CHECKSUM.pack(checksum))
+        f.write(data)
+        for view in views:
+            f.write(view)
+    if metrics.ENABLED:
+        metrics.addBytes(
+            "written", "snapshot", len(header) + len(data) + sum(view.nbytes for view in views)
+        )
+
+
+def readSnapshot(path: str) -> Optional[Dict]:
+    """Reads a snapshot written by `writeSnapshot`
+
+    The arrays come out as (typecode, memoryview) pairs over the mapped
+    file, to be copied with `unpackArray`.
+
+    Args:
+        path: path to the snapshot
+
+    Returns: The objects saved, or None if there is no snapshot or it is damaged
+    """
+    try:
+        with open(path, "rb") as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (FileNotFoundError, ValueError):
+        # ValueError: an empty file can't be mapped
+        return None
+
+    view = memoryview(mapping)
+    try:
+        if len(view) < _HEADER.size:
+            return None
+        magic, size, count = _HEADER.unpack_from(view)
+        if magic != MAGIC:
+            return None
+        header_size = _HEADER.size + 8 * count
+        sizes = struct.unpack_from(f"<{count}Q", view, _HEADER.size)
+        start = header_size + _CHECKSUM.size
+        if start + size + sum(sizes) != len(view):
+            return None
+
+        # the file is checked whole, a snapshot cut short or damaged is taken again
+        checksum = zlib.crc32(view[:header_size])
+        checksum = zlib.crc32(view[start:], checksum)
+        if checksum != _CHECKSUM.unpack_from(view, header_size)[0]:
+            return None
+
+        buffers = []
+        position = start + size
+        for buffer_size in sizes:
+            buffers.append(view[position : position + buffer_size])
+            position += buffer_size
+        if metrics.ENABLED:
+            metrics.addBytes("read", "snapshot", len(view))
+        return pickle.loads(view[start : start + size], buffers=buffers)
+    except (pickle.UnpicklingError, EOFError, struct.error):
+        return None
+    finally:
+        # the mapping is closed once the arrays have been copied out of it
+        view.release()
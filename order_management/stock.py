@@ -1,6 +1,9 @@
-import json
-from typing import List
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Tuple
+from .metrics import instrumented
 from .product import Product
+from .search import SearchIndex
+from .storage import StockShortage, productRepository
 
 
 class Stock:
@@ -8,11 +11,91 @@ class Stock:
 
     Attributes:
         products: the list of products
+        filename: the file where the stock is saved on update
     """
 
-    def __init__(self, products: List[Product]) -> None:
+    def __init__(
+        self, products: List[Product], filename: str = "data/products.json"
+    ) -> None:
         self.products = products
+        self.filename = filename
+        self._repository = None
+        # changes not written yet, while in `deferWrites`
+        self._deferred = None
+        self.reindex()
 
+    def _store(self):
+        """Returns the repository of the stock file (see `storage`)"""
+        if self._repository is None or self._repository.path != self.filename:
+            self._repository = productRepository(self.filename)
+        return self._repository
+
+    def reindex(self):
+        """Rebuilds the lookup indexes from the list of products
+
+        Needs to be called if `products` is modified in place instead of
+        through `add` and `remove`.
+        """
+
+        # code -> product, and name/brand/category -> list of products
+        self._by_code: Dict[str, Product] = {}
+        self._by_name: Dict[str, List[Product]] = {}
+        self._by_brand: Dict[str, List[Product]] = {}
+        self._by_category: Dict[str, List[Product]] = {}
+        # the full-text index, built on the first search (see `search`)
+        self._search: SearchIndex = None
+        for product in self.products:
+            self._index(product)
+
+    def _index(self, product: Product):
+        """Adds a product to the lookup indexes"""
+        self._by_code[product.code] = product
+        self._by_name.setdefault(product.name, []).append(product)
+        self._by_brand.setdefault(product.brand, []).append(product)
+        self._by_category.setdefault(product.category, []).append(product)
+        if self._search is not None:
+            self._search.add(product)
+
+    def _unindex(self, product: Product):
+        """Removes a product from the lookup indexes"""
+        del self._by_code[product.code]
+        for index, key in (
+            (self._by_name, product.name),
+            (self._by_brand, product.brand),
+            (self._by_category, product.category),
+        ):
+            bucket = index[key]
+            bucket.remove(product)
+            if not bucket:
+                del index[key]
+        if self._search is not None:
+            self._search.remove(product)
+
+    def add(self, product: Product):
+        """Adds a new product to the catalog
+
+        Args:
+            product: the product to add, its code must not be in the catalog yet
+        """
+        if product.code in self._by_code:
+            raise Exception("Product already exists")
+        self.products.append(product)
+        self._index(product)
+
+    def remove(self, id: str) -> Product:
+        """Removes a product from the catalog
+
+        Args:
+            id: identifier of the product
+
+        Returns: the removed product
+        """
+        product = self.getProductByID(id)
+        self.products.remove(product)
+        self._unindex(product)
+        return product
+
+    @instrumented
     def update(self, id: str, change: int):
         """Update the quantity of a product by adding or removing
 
@@ -22,15 +105,97 @@ class Stock:
         """
 
         # Updating the quantity of a product and writing back the updated quantity to the file
-        product = self.getProductByID(id)
-        new_quantity = product.quantity + (change)
-        if new_quantity >= 0:
-            product.quantity = new_quantity
-            self.dump(outfile="data/products.json")
-        else:
+        self.getProductByID(id)
+        try:
+            self.updateMany({id: change})
+        except StockShortage:
             print("Quantity cannot be negative")
             return
 
+    @instrumented
+    def updateMany(self, changes: Dict[str, int]):
+        """Updates the quantities of several products as a single transaction
+
+        All the changes are validated before any is applied, and the stock is
+        written once (only the changed rows with a SQLite database). If a
+        change is invalid or the stock can't be saved, no quantity is modified.
+
+        Other terminals may share the stock file: the changes are validated
+        against and applied to the quantities in the file, under a lock, and
+        the quantities and prices in memory are updated from it, whether the
+        changes went through or not.
+
+        Args:
+            changes: a dictionary with the key being the ID of the products, and the value being the change
+
+        Raises: StockShortage (a ValueError) if the file doesn't hold the quantities
+        """
+
+        # Only kept in memory while the writes are deferred, so validated against the quantities known here
+        if self._deferred is not None:
+            for id, change in changes.items():
+                product = self.getProductByID(id)
+                if product.quantity + change < 0:
+                    raise ValueError(f"Not enough stock available for '{product.name}'")
+            for id, change in changes.items():
+                self._by_code[id].quantity += change
+                self._deferred[id] = self._deferred.get(id, 0) + change
+            return
+
+        # Otherwise validated against the file only, which is the reference
+        try:
+            current = self._store().applyChanges(changes, self.products)
+        except StockShortage as e:
+            # the quantities known here were out of date
+            self._take(e.current)
+            raise
+        self._take(current)
+
+    def refresh(self, codes: Iterable[str]):
+        """Takes the quantities and prices of the stock file for products, if another terminal changed them
+
+        Args:
+            codes: the ID of the products to refresh (all of them are with a JSON file changed since)
+        """
+        # while the writes are deferred the quantities here are ahead of the file, they are refreshed on the write
+        if self._deferred is not None:
+            return
+        self._take(self._store().current(codes))
+
+    def _take(self, current: Dict[str, Tuple[int, float]]):
+        """Takes the quantities and prices read from the stock file for the products known here"""
+        for code, (quantity, price) in current.items():
+            product = self._by_code.get(code)
+            if product is not None:
+                product.quantity = quantity
+                product.price = price
+
+    @contextmanager
+    def deferWrites(self) -> Iterator[None]:
+        """Groups the updates made in the block into a single write
+
+        Inside the block `updateMany` only validates and applies the changes
+        in memory. They are written together at the end, as a single
+        transaction: if they no longer fit the quantities in the file (sold
+        by another terminal meanwhile), a StockShortage is raised, none of
+        them is kept and the quantities in memory are those of the file. An
+        exception raised in the block discards them too.
+        """
+
+        changes = {}
+        self._deferred = changes
+        try:
+            yield
+        finally:
+            self._deferred = None
+            # the quantities in memory go back to those of the file
+            for id, change in changes.items():
+                self._by_code[id].quantity -= change
+
+        if changes:
+            self.updateMany(changes)
+
+    @instrumented
     def getProductByID(self, id: int) -> Product:
         """Gets a product by its ID
 
@@ -40,47 +205,83 @@ class Stock:
         Returns: the product's object
         """
         # Returns a specific product depending on the product code/ID
-        for product in self.products:
-            if product.code == id:
-                return product
-        raise Exception("Product not found")
+        try:
+            return self._by_code[id]
+        except KeyError:
+            raise Exception("Product not found") from None
+
+    @instrumented
+    def search(self, query: str, limit: int = None) -> List[Product]:
+        """Searches the products by the words of their name, brand, category and description
+
+        Each word of the query matches the words starting with it, in any case.
+
+        Args:
+            query: the words to look for
+            limit: maximum number of products to return (default: all of them)
+
+        Returns: a list of the products matching all the words, the best matches first (see `SearchIndex`)
+        """
+        if self._search is None:
+            self._search = SearchIndex(self.products)
+        return self._search.search(query, limit)
 
+    def getProductsByName(self, name: str) -> List[Product]:
+        """Gets the products with the given name
+
+        Args:
+            name: name of the product
+
+        Returns: a list of products, empty if none matches
+        """
+        return list(self._by_name.get(name, []))
+
+    def getProductsByBrand(self, brand: str) -> List[Product]:
+        """Gets the products of a brand
+
+        Args:
+            brand: the brand of the products
+
+        Returns: a list of products, empty if none matches
+        """
+        return list(self._by_brand.get(brand, []))
+
+    def getProductsByCategory(self, category: str) -> List[Product]:
+        """Gets the products of a category
+
+        Args:
+            category: the category of the products
+
+        Returns: a list of products, empty if none matches
+        """
+        return list(self._by_category.get(category, []))
+
+    @instrumented
     def dump(self, outfile: str):
-        """Saves the stock to a JSON file"""
+        """Saves the stock to a JSON file, or a SQLite database (see `storage`)"""
 
-        # Writing back to the original Stock JSON file (sales)
-        product_list = []
-        for product in self.products:
-            product_dict = {
-                "code": product.code,
-                "name": product.name,
-                "brand": product.brand,
-                "description": product.description,
-                "quantity": product.quantity,
-                "price": product.price,
-                "dosage_instruction": product.dosage_instruction,
-                "requires_prescription": product.requires_prescription,
-                "category": product.category,
-            }
-            product_list.append(product_dict)
-
-        with open(outfile, "w") as f:
-            json.dump(product_list, f, indent=4)
+        # Writing back to the original Stock file
+        if outfile == self.filename:
+            self._store().save(self.products)
+        else:
+            productRepository(outfile).save(self.products)
 
     @staticmethod
-    def load(inFile: str):
+    @instrumented
+    def load(inFile: str, snapshot: bool = False):
         """Loads the stock from an existing file
 
         Args:
-            inFile: input file to the function
+            inFile: input file to the function, a JSON file or a SQLite database (see `storage`)
+            snapshot: whether to read a JSON file from its binary snapshot when up to date (see `snapshot`)
         """
 
         # Loading data from the file
         try:
-            with open(inFile, "r") as f:
-                stock_data = json.load(f)
-            products = [Product(**p) for p in stock_data]
-            return Stock(products)
+            repository = productRepository(inFile, snapshot)
+            stock = Stock(repository.load(), filename=inFile)
+            stock._repository = repository
+            return stock
         except FileNotFoundError:
             raise Exception("Stock file not found")
 
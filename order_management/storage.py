@@ -0,0 +1,891 @@
+"""Storage backends of the persistent entities.
+
+Every entity can be kept in its JSON file (the default) or in a SQLite
+database. The backend is chosen from the path given to the repository
+functions: a path ending in `.db`, `.sqlite` or `.sqlite3` is a SQLite
+database holding all the entities, anything else is a JSON file.
+"""
+
+import json
+import os
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import quote, unquote
+
+from . import metrics
+from .atomic import atomic_write
+from .journal import iter_jsonl, openJournal
+from .locking import fileLock, readGeneration, writeGeneration
+from .product import Product
+from .sale import Sale
+from .snapshot import readSnapshot, snapshotPath, writeSnapshot
+from .stream import SaleScan, SaleStream
+
+DATABASE_EXTENSIONS = (".db", ".sqlite", ".sqlite3")
+
+# size under which the journal of the prescriptions is never merged into the JSON file
+COMPACT_MIN_BYTES = 1 << 20
+# a wishlist journal is rewritten on load once it has more lines than that per product
+WISHLIST_COMPACT_RATIO = 2
+
+SALE_FIELDS = (
+    "id",
+    "name",
+    "quantity",
+    "price",
+    "purchase_price",
+    "timestamp",
+    "customerID",
+    "salesperson",
+    "prescriptionID",
+)
+PRODUCT_FIELDS = (
+    "code",
+    "name",
+    "brand",
+    "description",
+    "quantity",
+    "price",
+    "dosage_instruction",
+    "requires_prescription",
+    "category",
+)
+WISH_FIELDS = PRODUCT_FIELDS + ("user",)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    code TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    brand TEXT,
+    description TEXT,
+    quantity INTEGER NOT NULL CHECK (quantity >= 0),
+    price REAL NOT NULL,
+    dosage_instruction TEXT,
+    requires_prescription INTEGER NOT NULL,
+    category TEXT
+);
+CREATE TABLE IF NOT EXISTS sales (
+    position INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT,
+    name TEXT,
+    quantity INTEGER,
+    price REAL,
+    purchase_price REAL,
+    timestamp REAL,
+    customerID TEXT,
+    salesperson TEXT,
+    prescriptionID TEXT
+);
+CREATE INDEX IF NOT EXISTS sales_customer ON sales (customerID);
+CREATE INDEX IF NOT EXISTS sales_salesperson ON sales (salesperson);
+CREATE INDEX IF NOT EXISTS sales_prescription ON sales (prescriptionID);
+CREATE INDEX IF NOT EXISTS sales_timestamp ON sales (timestamp);
+CREATE TABLE IF NOT EXISTS prescriptions (
+    PrescriptionID TEXT PRIMARY KEY,
+    DoctorName TEXT,
+    CustomerID TEXT,
+    Date TEXT,
+    Medications TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS prescriptions_customer ON prescriptions (CustomerID);
+CREATE TABLE IF NOT EXISTS wishlist (
+    user TEXT NOT NULL,
+    code TEXT NOT NULL,
+    name TEXT,
+    brand TEXT,
+    description TEXT,
+    quantity INTEGER,
+    price REAL,
+    dosage_instruction TEXT,
+    requires_prescription INTEGER,
+    category TEXT,
+    UNIQUE (user, code)
+);
+"""
+
+# one connection per database and per process, connections can't be shared after a fork
+_connections: Dict[Tuple[int, str], sqlite3.Connection] = {}
+
+
+def isDatabase(path: str) -> bool:
+    """Whether a path designates a SQLite database rather than a JSON file"""
+    return path.endswith(DATABASE_EXTENSIONS)
+
+
+def connect(path: str, create: bool = False) -> sqlite3.Connection:
+    """Returns the connection to a SQLite database, creating its tables if needed
+
+    Args:
+        path: path to the database
+        create: whether to create the database if it doesn't exist
+    """
+    key = (os.getpid(), os.path.abspath(path))
+    connection = _connections.get(key)
+    if connection is None:
+        if not create and not os.path.exists(path):
+            raise FileNotFoundError(path)
+        # autocommit, the writes are grouped with `transaction`
+        connection = sqlite3.connect(path, isolation_level=None, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(SCHEMA)
+        _connections[key] = connection
+    return connection
+
+
+def disconnect(path: str):
+    """Closes the connection of this process to a SQLite database, if open
+
+    The last connection to close writes the changes of the WAL back to the
+    database, which can then be moved as a single file.
+    """
+    connection = _connections.pop((os.getpid(), os.path.abspath(path)), None)
+    if connection is not None:
+        connection.close()
+
+
+@contextmanager
+def transaction(connection: sqlite3.Connection) -> Iterator[sqlite3.Connection]:
+    """Runs a block in a write transaction, rolled back if the block raises"""
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        yield connection
+    except:
+        connection.execute("ROLLBACK")
+        raise
+    connection.execute("COMMIT")
+
+
+class StockShortage(ValueError):
+    """Raised when changes would make a quantity of the stock file negative, nothing is written then
+
+    Attributes:
+        current: the quantity and price now in the file, for the products known to be out of date here
+    """
+
+    def __init__(self, message: str, current: Dict[str, Tuple[int, float]]) -> None:
+        super().__init__(message)
+        self.current = current
+
+
+class JSONProducts:
+    """The products kept in a JSON file (see data/products.json)
+
+    The version of the file last read or written is remembered, so that a
+    change made by another process is noticed before it gets overwritten.
+    Besides the inode, modification time and size of the file, which may all
+    repeat on a fast writer, the version includes a generation counter kept
+    in the lock file and increased on every write.
+
+    A binary snapshot of the products can be kept next to the file (see
+    `snapshot`), it is read instead of the file as long as it was taken
+    from the current version.
+    """
+
+    def __init__(self, path: str, snapshot: bool = False) -> None:
+        self.path = path
+        self.snapshot = snapshot
+        self._version = None
+
+    def _versionOf(self, lock: Optional[int]) -> Tuple[int, int, int, int]:
+        # the file is always replaced, never modified in place
+        stat = os.stat(self.path)
+        return readGeneration(lock), stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _load(self, lock: Optional[int]) -> List[Product]:
+        if self.snapshot:
+            version = self._versionOf(lock)
+            state = readSnapshot(snapshotPath(self.path))
+            if state is not None and state["version"] == version:
+                self._version = version
+                return [Product(**p) for p in state["products"]]
+        with open(self.path, "r") as f:
+            self._version = self._versionOf(lock)
+            if metrics.ENABLED:
+                metrics.addBytes("read", "products", self._version[3])
+            product_list = json.load(f)
+        if self.snapshot:
+            try:
+                writeSnapshot(
+                    snapshotPath(self.path),
+                    {"version": self._version, "products": product_list},
+                )
+            except OSError:
+                # the snapshot only saves time, the products were loaded anyway
+                pass
+        return [Product(**p) for p in product_list]
+
+    def load(self) -> List[Product]:
+        with fileLock(self.path) as lock:
+            return self._load(lock)
+
+    def _write(self, product_list: List[Dict], lock: Optional[int]):
+        generation = readGeneration(lock) + 1
+        text = json.dumps(product_list, indent=4)
+        atomic_write(self.path, text)
+        writeGeneration(lock, generation)
+        self._version = self._versionOf(lock)
+        if metrics.ENABLED:
+            metrics.addBytes("written", "products", len(text))
+
+    def save(self, products: List[Product]):
+        with fileLock(self.path) as lock:
+            self._write([product.to_dict() for product in products], lock)
+
+    def current(self, codes: Iterable[str]) -> Dict[str, Tuple[int, float]]:
+        """Returns the quantity and price in the file of the products, if another process wrote it since
+
+        Args:
+            codes: the ID of the products needed
+
+        Returns: The quantity and price of all the products if the file was read again, otherwise nothing as they are known here
+        """
+        with fileLock(self.path) as lock:
+            try:
+                if self._versionOf(lock) == self._version:
+                    return {}
+            except FileNotFoundError:
+                return {}
+            # read without taking its version: the products added or removed meanwhile are not known here,
+            # so the next change still has to apply to the file rather than to the products given
+            with open(self.path, "r") as f:
+                product_list = json.load(f)
+            return {product["code"]: (product["quantity"], product["price"]) for product in product_list}
+
+    def applyChanges(
+        self, changes: Dict[str, int], products: List[Product]
+    ) -> Dict[str, Tuple[int, float]]:
+        """Applies quantity changes to the file, without modifying the products given
+
+        The changes are applied to the quantities in the file, which are
+        read again if another process wrote the file since this one last
+        did. Nothing is written if one of the changes would make a quantity
+        negative.
+
+        Args:
+            changes: a dictionary with the key being the ID of the products, and the value being the change
+            products: the products as this process knows them
+
+        Returns: The quantity and price now in the file, of the changed products or of all of them if another process changed the file
+
+        Raises: StockShortage with the same, before the changes, if one of them would make a quantity negative
+        """
+        with fileLock(self.path) as lock:
+            try:
+                changed = self._versionOf(lock) != self._version
+            except FileNotFoundError:
+                changed = False
+            current = self._load(lock) if changed else products
+
+            product_list = [product.to_dict() for product in current]
+            by_code = {product["code"]: product for product in product_list}
+
+            def current() -> Dict[str, Tuple[int, float]]:
+                return {
+                    code: (by_code[code]["quantity"], by_code[code]["price"])
+                    for code in (by_code if changed else changes)
+                }
+
+            for code in changes:
+                if code not in by_code:
+                    # the products given are out of date, the file is read again next time
+                    self._version = None
+                    raise Exception("Product not found")
+            for code, change in changes.items():
+                if by_code[code]["quantity"] + change < 0:
+                    if changed:
+                        # only the quantities and prices are taken from the file, which is read again next time
+                        self._version = None
+                    raise StockShortage(
+                        f"Not enough stock available for '{by_code[code]['name']}'",
+                        current(),
+                    )
+            for code, change in changes.items():
+                by_code[code]["quantity"] += change
+
+            # a JSON file can only be rewritten entirely
+            self._write(product_list, lock)
+        return current()
+
+
+class SQLiteProducts:
+    """The products kept in a SQLite database, one row per product"""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def load(self) -> List[Product]:
+        rows = connect(self.path).execute(
+            f"SELECT {', '.join(PRODUCT_FIELDS)} FROM products ORDER BY rowid"
+        )
+        return [Product(**dict(zip(PRODUCT_FIELDS, row))) for row in rows]
+
+    def save(self, products: List[Product]):
+        connection = connect(self.path, create=True)
+        with transaction(connection):
+            connection.execute("DELETE FROM products")
+            connection.executemany(
+                f"INSERT INTO products ({', '.join(PRODUCT_FIELDS)}) VALUES ({', '.join('?' * len(PRODUCT_FIELDS))})",
+                [tuple(product.to_dict().values()) for product in products],
+            )
+
+    def current(self, codes: Iterable[str]) -> Dict[str, Tuple[int, float]]:
+        """Returns the quantity and price in the database of the products (see `JSONProducts.current`)"""
+        codes = list(codes)
+        rows = connect(self.path).execute(
+            f"SELECT code, quantity, price FROM products WHERE code IN ({', '.join('?' * len(codes))})",
+            codes,
+        )
+        return {code: (quantity, price) for code, quantity, price in rows}
+
+    def applyChanges(
+        self, changes: Dict[str, int], products: List[Product]
+    ) -> Dict[str, Tuple[int, float]]:
+        """Applies quantity changes to the rows of the changed products (see `JSONProducts.applyChanges`)
+
+        Raises: StockShortage if a quantity would become negative, an Exception if a product is not in the database
+        """
+        connection = connect(self.path)
+
+        try:
+            with transaction(connection):
+                for code, change in changes.items():
+                    cursor = connection.execute(
+                        "UPDATE products SET quantity = quantity + ? WHERE code = ?",
+                        (change, code),
+                    )
+                    if cursor.rowcount == 0:
+                        raise Exception("Product not found")
+                changed = self.current(changes)
+        except sqlite3.IntegrityError:
+            # rolled back, the quantities are those before the changes
+            raise StockShortage("Not enough stock available", self.current(changes)) from None
+        return changed
+
+
+class SQLiteSalesJournal:
+    """The sales kept in a SQLite database, with the interface of `SalesJournal`
+
+    Positions in the journal are the positions of the rows in the sales
+    table, which only grow.
+
+    Attributes:
+        path: path to the database
+        offset: position of the last sale read
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.offset = 0
+
+    def migrate(self):
+        # nothing to migrate, but fails like `SalesJournal` if there is no database
+        connect(self.path)
+
+    def append(self, sales: List[Dict]) -> Tuple[int, int]:
+        """Inserts sales records, returns the positions before the first and of the last one"""
+        connection = connect(self.path, create=True)
+        with transaction(connection):
+            connection.executemany(
+                f"INSERT INTO sales ({', '.join(SALE_FIELDS)}) VALUES ({', '.join('?' * len(SALE_FIELDS))})",
+                [tuple(sale[field] for field in SALE_FIELDS) for sale in sales],
+            )
+            # the transaction holds the write lock, so the rows just inserted are the last ones
+            end = connection.execute(
+                "SELECT coalesce(max(position), 0) FROM sales"
+            ).fetchone()[0]
+        return end - len(sales), end
+
+    def read(self, offset: int = 0) -> Iterator[Dict]:
+        """Reads the records after a position, in the order they were inserted"""
+        self.offset = offset
+        rows = connect(self.path).execute(
+            f"SELECT position, {', '.join(SALE_FIELDS)} FROM sales WHERE position > ? ORDER BY position",
+            (offset,),
+        )
+        for row in rows:
+            self.offset = row[0]
+            yield dict(zip(SALE_FIELDS, row[1:]))
+
+    def position(self, since: float) -> int:
+        """Returns the position from which the sales made since a timestamp are found"""
+        first = (
+            connect(self.path)
+            .execute("SELECT min(position) FROM sales WHERE timestamp >= ?", (since,))
+            .fetchone()[0]
+        )
+        if first is None:
+            return self.identity()[2]
+        return first - 1
+
+    def identity(self) -> Tuple[int, int, int]:
+        """Returns the device and inode of the database and the position of its last sale"""
+        stat = os.stat(self.path)
+        last = (
+            connect(self.path)
+            .execute("SELECT coalesce(max(position), 0) FROM sales")
+            .fetchone()[0]
+        )
+        return stat.st_dev, stat.st_ino, last
+
+
+class SQLiteSales(SaleScan):
+    """The sales of a SQLite database, where the queries run as indexed SQL
+
+    Attributes:
+        path: path to the database
+    """
+
+    # fields that can be queried with `where`
+    KEYS = ("id", "name", "customerID", "salesperson", "prescriptionID")
+
+    def __init__(self, path: str) -> None:
+        super().__init__()
+        self.path = path
+
+    def _query(self, condition: str = "", params: tuple = (), order: str = "position"):
+        rows = connect(self.path).execute(
+            f"SELECT {', '.join(SALE_FIELDS)} FROM sales {condition} ORDER BY {order}",
+            params,
+        )
+        return (Sale(*row) for row in rows)
+
+    def _condition(self, field: str, value) -> Tuple[str, tuple]:
+        if field not in self.KEYS:
+            raise ValueError(f"Can't query the sales by {field}")
+        if value is None:
+            return f"WHERE {field} IS NULL", ()
+        return f"WHERE {field} = ?", (value,)
+
+    def __iter__(self) -> Iterator[Sale]:
+        return self._query()
+
+    def slice(self, start: int = 0, stop: int = None) -> Iterator[Sale]:
+        limit = -1 if stop is None else max(stop - start, 0)
+        return self._query(params=(limit, start), order="position LIMIT ? OFFSET ?")
+
+    def total(self) -> float:
+        return (
+            connect(self.path)
+            .execute("SELECT coalesce(sum(purchase_price), 0) FROM sales")
+            .fetchone()[0]
+        )
+
+    def where(self, field: str, value) -> List[Sale]:
+        return list(self._query(*self._condition(field, value)))
+
+    def totalWhere(self, field: str, value) -> float:
+        condition, params = self._condition(field, value)
+        return (
+            connect(self.path)
+            .execute(
+                f"SELECT coalesce(sum(purchase_price), 0) FROM sales {condition}", params
+            )
+            .fetchone()[0]
+        )
+
+    def prescriptionTotals(self) -> Dict[str, float]:
+        rows = connect(self.path).execute(
+            "SELECT prescriptionID, sum(purchase_price) FROM sales"
+            " WHERE prescriptionID IS NOT NULL"
+            " GROUP BY prescriptionID ORDER BY min(position)"
+        )
+        return dict(rows.fetchall())
+
+    def between(self, start: float, end: float) -> Iterator[Sale]:
+        return self._query("WHERE timestamp BETWEEN ? AND ?", (start, end))
+
+    def top(self, n: int, start: float, end: float) -> List[Sale]:
+        return list(
+            self._query(
+                "WHERE timestamp BETWEEN ? AND ?",
+                (start, end, n),
+                order="purchase_price DESC, position LIMIT ?",
+            )
+        )
+
+
+class JSONPrescriptions:
+    """The prescriptions kept in a JSON file (see data/prescriptions.json)
+
+    The saved prescriptions are appended to a journal next to the file
+    (prescriptions.updates.jsonl), one per line, the last line of an ID
+    replacing the prescription of the file. The journal is merged into the
+    file once it is larger than it, so that a save costs an append and
+    only once in a while a rewrite.
+
+    What was read last is remembered, so that `updates` only reads the
+    lines saved since, by this process or another one.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.updates_path = os.path.splitext(path)[0] + ".updates.jsonl"
+        # version of the file and position in the journal when last read
+        self._version = None
+        self._offset = 0
+
+    def _versionOf(self, lock: Optional[int]) -> Optional[Tuple[int, int, int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return readGeneration(lock), stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _readUpdates(self, offset: int) -> List[Dict]:
+        self._offset = offset
+        try:
+            f = open(self.updates_path, "rb")
+        except FileNotFoundError:
+            return []
+        with f:
+            f.seek(offset)
+            updates = []
+            for update, length in iter_jsonl(f):
+                self._offset += length
+                updates.append(update)
+            if metrics.ENABLED:
+                metrics.addBytes("read", "prescriptions", self._offset - offset)
+            return updates
+
+    def _load(self, lock: Optional[int]) -> List[Dict]:
+        self._version = self._versionOf(lock)
+        try:
+            with open(self.path, "r") as f:
+                if metrics.ENABLED:
+                    metrics.addBytes("read", "prescriptions", os.fstat(f.fileno()).st_size)
+                prescriptions = json.load(f)
+        except FileNotFoundError:
+            if not os.path.exists(self.updates_path):
+                raise
+            prescriptions = []
+        return prescriptions + self._readUpdates(0)
+
+    def load(self) -> List[Dict]:
+        """Returns all the prescriptions as dictionaries, an ID may appear several times (the last one counts)"""
+        with fileLock(self.path) as lock:
+            return self._load(lock)
+
+    def updates(self) -> Optional[List[Dict]]:
+        """Returns the prescriptions saved since the last `load` or `updates`, None if they all need to be loaded again"""
+        with fileLock(self.path) as lock:
+            if self._version is None or self._versionOf(lock) != self._version:
+                return None
+            try:
+                if os.path.getsize(self.updates_path) < self._offset:
+                    return None
+            except FileNotFoundError:
+                return None if self._offset else []
+            return self._readUpdates(self._offset)
+
+    def get(self, id: str) -> Dict:
+        """Returns a prescription as a dictionary, None if it isn't found"""
+        found = None
+        for prescription in self.load():
+            if prescription["PrescriptionID"] == id:
+                found = prescription
+        return found
+
+    def save(self, prescription: Dict):
+        """Replaces a prescription, or adds it if it isn't found"""
+        self.saveMany([prescription])
+
+    def saveMany(self, prescriptions: List[Dict]):
+        """Replaces several prescriptions, or adds them if they aren't found, with a single append"""
+        if not prescriptions:
+            return
+        data = "".join(json.dumps(prescription) + "\n" for prescription in prescriptions).encode()
+        with fileLock(self.path) as lock:
+            fd = os.open(
+                self.updates_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644
+            )
+            try:
+                end = os.lseek(fd, 0, os.SEEK_END)
+                written = 0
+                while written < len(data):
+                    written += os.write(fd, data[written:])
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            if metrics.ENABLED:
+                metrics.addBytes("written", "prescriptions", len(data))
+
+            # what was read last is still up to date if nothing was saved meanwhile
+            if end == self._offset and self._versionOf(lock) == self._version:
+                self._offset = end + len(data)
+
+            try:
+                size = os.path.getsize(self.path)
+            except FileNotFoundError:
+                size = 0
+            if end + len(data) > max(size, COMPACT_MIN_BYTES):
+                self._compact(lock)
+
+    def _compact(self, lock: Optional[int]):
+        """Merges the journal into the file, the lock being held"""
+        prescriptions = {}
+        for prescription in self._load(lock):
+            prescriptions[prescription["PrescriptionID"]] = prescription
+        generation = readGeneration(lock) + 1
+        text = json.dumps(list(prescriptions.values()), indent=4)
+        atomic_write(self.path, text)
+        os.truncate(self.updates_path, 0)
+        if metrics.ENABLED:
+            metrics.addBytes("written", "prescriptions", len(text))
+        writeGeneration(lock, generation)
+        # the caller may not have seen everything that was merged
+        self._version = None
+
+
+class SQLitePrescriptions:
+    """The prescriptions kept in a SQLite database, medications are stored as JSON"""
+
+    FIELDS = ("DoctorName", "PrescriptionID", "Medications", "CustomerID", "Date")
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._version = None
+
+    def get(self, id: str) -> Dict:
+        row = (
+            connect(self.path)
+            .execute(
+                f"SELECT {', '.join(self.FIELDS)} FROM prescriptions WHERE PrescriptionID = ?",
+                (id,),
+            )
+            .fetchone()
+        )
+        if row is None:
+            return None
+        return self._fromRow(row)
+
+    def _fromRow(self, row: tuple) -> Dict:
+        prescription = dict(zip(self.FIELDS, row))
+        prescription["Medications"] = json.loads(prescription["Medications"])
+        return prescription
+
+    def load(self) -> List[Dict]:
+        connection = connect(self.path)
+        self._version = connection.execute("PRAGMA data_version").fetchone()
+        rows = connection.execute(f"SELECT {', '.join(self.FIELDS)} FROM prescriptions")
+        return [self._fromRow(row) for row in rows]
+
+    def updates(self) -> Optional[List[Dict]]:
+        """Returns None if another connection changed the prescriptions since the last `load`, to load them again"""
+        version = connect(self.path).execute("PRAGMA data_version").fetchone()
+        return [] if version == self._version else None
+
+    def save(self, prescription: Dict):
+        self.saveMany([prescription])
+
+    def saveMany(self, prescriptions: List[Dict]):
+        connection = connect(self.path, create=True)
+        with transaction(connection):
+            connection.executemany(
+                f"INSERT OR REPLACE INTO prescriptions ({', '.join(self.FIELDS)}) VALUES ({', '.join('?' * len(self.FIELDS))})",
+                [
+                    tuple(
+                        json.dumps(prescription["Medications"])
+                        if field == "Medications"
+                        else prescription.get(field)
+                        for field in self.FIELDS
+                    )
+                    for prescription in prescriptions
+                ],
+            )
+
+
+class JSONWishlist:
+    """The wishlists kept as JSON, one file per user
+
+    The wishlist of a user is a journal of the products added and removed
+    (data/wishlist/<user>.jsonl, one change per line): a change is an
+    append, and a load only reads the file of that user. The journal is
+    rewritten with the products left when it is loaded and has more than
+    WISHLIST_COMPACT_RATIO lines per product.
+
+    The single file of all the wishlists used before (data/wishlist.json)
+    is split into the files of the users the first time it is used.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.directory = os.path.splitext(path)[0]
+
+    def _userPath(self, user: str) -> str:
+        return os.path.join(self.directory, quote(user, safe="") + ".jsonl")
+
+    def migrate(self):
+        """Splits the legacy file into the files of the users if not done yet
+
+        Raises:
+            json.JSONDecodeError: if the legacy file is corrupt, it isn't split then
+        """
+        if os.path.isdir(self.directory) or not os.path.exists(self.path):
+            return
+        with fileLock(self.path):
+            # another process may have split it while waiting for the lock
+            if os.path.isdir(self.directory):
+                return
+            wishlists = {}
+            try:
+                with open(self.path, "r") as f:
+                    for record in json.load(f):
+                        wishlists.setdefault(record["user"], []).append(record)
+            except json.JSONDecodeError as e:
+                # left as it is rather than split into nothing, the next uses try again once it is fixed
+                raise json.JSONDecodeError(f"{self.path} is corrupt: {e.msg}", e.doc, e.pos) from None
+            # written in a directory renamed at the end, so that a crash can't leave a half split file
+            tmp = tempfile.mkdtemp(dir=os.path.dirname(self.directory) or ".")
+            for user, items in wishlists.items():
+                with open(os.path.join(tmp, quote(user, safe="") + ".jsonl"), "w") as f:
+                    f.writelines(json.dumps({"add": item}) + "\n" for item in items)
+            os.chmod(tmp, 0o755)
+            os.rename(tmp, self.directory)
+
+    @staticmethod
+    def _replay(path: str) -> Tuple[Dict[str, Dict], int]:
+        """Returns the products left in a journal, by code, and its number of lines"""
+        items, lines = {}, 0
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            return items, lines
+        with f:
+            for change, _ in iter_jsonl(f):
+                lines += 1
+                if "add" in change:
+                    items[change["add"]["code"]] = change["add"]
+                else:
+                    items.pop(change["remove"], None)
+            if metrics.ENABLED:
+                metrics.addBytes("read", "wishlist", f.tell())
+        return items, lines
+
+    @staticmethod
+    def _write(path: str, items: Iterable[Dict]):
+        text = "".join(json.dumps({"add": item}) + "\n" for item in items)
+        atomic_write(path, text)
+        if metrics.ENABLED:
+            metrics.addBytes("written", "wishlist", len(text))
+
+    def load(self, user: str) -> List[Dict]:
+        self.migrate()
+        path = self._userPath(user)
+        with fileLock(path):
+            items, lines = self._replay(path)
+            if lines > WISHLIST_COMPACT_RATIO * (len(items) + 1):
+                self._write(path, items.values())
+        return list(items.values())
+
+    def _append(self, user: str, change: Dict):
+        self.migrate()
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._userPath(user)
+        with fileLock(path):
+            with open(path, "a") as f:
+                written = f.write(json.dumps(change) + "\n")
+        if metrics.ENABLED:
+            metrics.addBytes("written", "wishlist", written)
+
+    def add(self, user: str, item: Dict):
+        """Adds a product to the wishlist of a user, replacing the one with the same code"""
+        self._append(user, {"add": item})
+
+    def remove(self, user: str, code: str):
+        """Removes a product from the wishlist of a user"""
+        self._append(user, {"remove": code})
+
+    def save(self, user: str, items: List[Dict]):
+        """Replaces the wishlist of a user, the other users' ones are kept"""
+        self.migrate()
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._userPath(user)
+        with fileLock(path):
+            self._write(path, items)
+
+    def users(self) -> List[str]:
+        """Returns the users who have a wishlist"""
+        self.migrate()
+        try:
+            names = sorted(os.listdir(self.directory))
+        except FileNotFoundError:
+            return []
+        return [unquote(name[: -len(".jsonl")]) for name in names if name.endswith(".jsonl")]
+
+
+class SQLiteWishlist:
+    """The wishlists kept in a SQLite database, one row per user and product"""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def load(self, user: str) -> List[Dict]:
+        rows = connect(self.path).execute(
+            f"SELECT {', '.join(WISH_FIELDS)} FROM wishlist WHERE user = ? ORDER BY rowid",
+            (user,),
+        )
+        return [dict(zip(WISH_FIELDS, row)) for row in rows]
+
+    def add(self, user: str, item: Dict):
+        connect(self.path, create=True).execute(
+            f"INSERT OR REPLACE INTO wishlist ({', '.join(WISH_FIELDS)}) VALUES ({', '.join('?' * len(WISH_FIELDS))})",
+            tuple(dict(item, user=user)[field] for field in WISH_FIELDS),
+        )
+
+    def remove(self, user: str, code: str):
+        connect(self.path, create=True).execute(
+            "DELETE FROM wishlist WHERE user = ? AND code = ?", (user, code)
+        )
+
+    def users(self) -> List[str]:
+        rows = connect(self.path).execute("SELECT DISTINCT user FROM wishlist ORDER BY user")
+        return [user for (user,) in rows]
+
+    def save(self, user: str, items: List[Dict]):
+        connection = connect(self.path, create=True)
+        with transaction(connection):
+            connection.execute("DELETE FROM wishlist WHERE user = ?", (user,))
+            connection.executemany(
+                f"INSERT OR REPLACE INTO wishlist ({', '.join(WISH_FIELDS)}) VALUES ({', '.join('?' * len(WISH_FIELDS))})",
+                [tuple(dict(item, user=user)[field] for field in WISH_FIELDS) for item in items],
+            )
+
+
+def productRepository(path: str, snapshot: bool = False):
+    """Returns the store of the products kept at a path, a JSON file can be read from its snapshot (see `JSONProducts`)"""
+    return SQLiteProducts(path) if isDatabase(path) else JSONProducts(path, snapshot)
+
+
+def salesJournal(path: str):
+    """Returns the journal of the sales kept at a path (see `SalesJournal` and `SalesPartitions`)"""
+    return SQLiteSalesJournal(path) if isDatabase(path) else openJournal(path)
+
+
+def salesScan(path: str, workers: int = None) -> SaleScan:
+    """Returns the sales kept at a path, queried without loading them in memory
+
+    Args:
+        path: the sales file, a JSON file or a SQLite database
+        workers: number of processes querying a JSON file together (see `ParallelSaleStream`), a database queries itself
+    """
+    if isDatabase(path):
+        return SQLiteSales(path)
+    if workers is not None:
+        # imported here, the process pools take a while to import and most runs never use them
+        from .parallel import ParallelSaleStream
+
+        return ParallelSaleStream(path, workers)
+    return SaleStream(path)
+
+
+def prescriptionRepository(path: str):
+    """Returns the store of the prescriptions kept at a path"""
+    return SQLitePrescriptions(path) if isDatabase(path) else JSONPrescriptions(path)
+
+
+def wishlistRepository(path: str):
+    """Returns the store of the wishlists kept at a path"""
+    return SQLiteWishlist(path) if isDatabase(path) else JSONWishlist(path)
@@ -0,0 +1,123 @@
+import heapq
+import math
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List
+
+from .journal import openJournal
+from .sale import Sale
+
+
+def addExactly(partials: List[float], value: float):
+    """Adds a value to a sum kept exactly, as floats that don't overlap (Shewchuk's algorithm, see `math.fsum`)
+
+    `math.fsum(partials)` is then the sum of all the values added, rounded
+    once, whatever the order they were added in or how the partials of
+    several sums are put together.
+
+    Args:
+        partials: the sum, updated in place
+        value: the value to add
+    """
+    i = 0
+    for partial in partials:
+        if abs(value) < abs(partial):
+            value, partial = partial, value
+        high = value + partial
+        low = partial - (high - value)
+        if low:
+            partials[i] = low
+            i += 1
+        value = high
+    partials[i:] = [value]
+
+
+class SaleScan:
+    """Sales that are read again for every query instead of being held in memory.
+
+    Each query makes a single pass over the sales and only keeps its own
+    result. Subclasses can answer the queries more directly, for example
+    with a database query.
+
+    Attributes:
+        iterable: the sales, it must be possible to iterate over them more than once
+    """
+
+    def __init__(self, iterable: Iterable[Sale] = ()) -> None:
+        self.iterable = iterable
+
+    def __iter__(self) -> Iterator[Sale]:
+        return iter(self.iterable)
+
+    def slice(self, start: int = 0, stop: int = None) -> Iterator[Sale]:
+        """Iterates over the sales from position start to stop (excluded)"""
+        return islice(self, start, stop)
+
+    # the sums are exact, rounded once: the same however the sales are split up (see `ParallelSaleStream`)
+
+    def total(self) -> float:
+        """Returns the sum of the purchase prices"""
+        return math.fsum(transaction.purchase_price for transaction in self)
+
+    def where(self, field: str, value) -> List[Sale]:
+        """Returns the sales with the given value for a field, in the order they were recorded"""
+        return [transaction for transaction in self if getattr(transaction, field) == value]
+
+    def totalWhere(self, field: str, value) -> float:
+        """Returns the sum of the purchase prices of the sales with the given value for a field"""
+        return math.fsum(
+            transaction.purchase_price
+            for transaction in self
+            if getattr(transaction, field) == value
+        )
+
+    def prescriptionTotals(self) -> Dict[str, float]:
+        """Returns the sum of the purchase prices for each prescription, in the order they first appear"""
+        totals = {}
+        for transaction in self:
+            if transaction.prescriptionID is not None:
+                addExactly(totals.setdefault(transaction.prescriptionID, []), transaction.purchase_price)
+        return {prescriptionID: math.fsum(partials) for prescriptionID, partials in totals.items()}
+
+    def between(self, start: float, end: float) -> Iterator[Sale]:
+        """Iterates over the sales made between two timestamps (included), in the order they were recorded"""
+        return (
+            transaction for transaction in self if start <= transaction.timestamp <= end
+        )
+
+    def top(self, n: int, start: float, end: float) -> List[Sale]:
+        """Returns the n largest purchases made between two timestamps (included)
+
+        Ties are kept in the order they were recorded.
+        """
+        top = heapq.nlargest(
+            n,
+            enumerate(self.between(start, end)),
+            key=lambda row: (row[1].purchase_price, -row[0]),
+        )
+        return [transaction for _, transaction in top]
+
+
+class SaleStream(SaleScan):
+    """The sales of a journal, read from the file each time they are iterated over.
+
+    The queries over a period only read the partitions overlapping it, if
+    the journal is partitioned.
+
+    Attributes:
+        path: path to the sales file (see `SalesJournal` and `SalesPartitions`)
+    """
+
+    def __init__(self, path: str) -> None:
+        super().__init__()
+        self.path = path
+
+    def __iter__(self) -> Iterator[Sale]:
+        for transaction in openJournal(self.path).read():
+            yield Sale(**transaction)
+
+    def between(self, start: float, end: float) -> Iterator[Sale]:
+        return (
+            Sale(**transaction)
+            for transaction in openJournal(self.path).read(start=start, end=end)
+            if start <= transaction["timestamp"] <= end
+        )
@@ -1,60 +1,137 @@
 from __future__ import annotations
 
+import os
 from .user import User
-from typing import List
+from typing import List, Optional, Tuple
 
 
 class UserManagement:
     """Main class to manage the user accounts
 
+    The accounts are indexed by username. When they come from a credentials
+    file, the file is read as the lookups need it: only up to the account
+    looked for, the following lines are read by the next lookups.
+
     Attributes:
-        users: A list of users
+        users: the users, as a tuple so that changing it fails rather than being lost (assign a list to replace them)
         status_file: file where log ins are recorded
+        credentials_file: file the accounts are read from, if any
     """
 
     def __init__(
-        self, status_file: str = "data/.logged_in", users: List[User] = []
+        self,
+        status_file: str = "data/.logged_in",
+        users: List[User] = [],
+        credentials_file: str = None,
     ) -> None:
-        self.users = users
         self.status_file = status_file
+        self.credentials_file = credentials_file
+        self.users = users
+        # position in the credentials file of the first line not indexed yet, None once it was all read
+        self._offset = None if credentials_file is None else 0
+        # the logged in user, and the version of the status file it was read from
+        self._session = None
+
+    @property
+    def users(self) -> Tuple[User, ...]:
+        # all the accounts are needed, the rest of the file is read
+        self._find(None)
+        return tuple(self._user(username) for username in self._by_username)
+
+    @users.setter
+    def users(self, users: List[User]):
+        # the first account of a username is the one found, as when the list was scanned
+        self._by_username = {}
+        for user in users:
+            self._by_username.setdefault(user.username, user)
+
+    def _user(self, username: str) -> User:
+        """Returns an indexed account, parsing its line of the credentials file on first use"""
+        user = self._by_username[username]
+        if isinstance(user, bytes):
+            elements = user.decode().strip().split(":")
+            user = User(elements[0], elements[3], elements[4], bool(elements[5]))
+            self._by_username[username] = user
+        return user
+
+    def _find(self, username: Optional[str]) -> Optional[User]:
+        """Returns the account of a user, reading the credentials file up to it if needed
+
+        The lines read are indexed by username, and only parsed when their
+        account is looked up.
+
+        Args:
+            username: the username looked for (None reads all the file)
+
+        Returns: The account, None if there is none with that username
+        """
+        if username in self._by_username:
+            return self._user(username)
+        if self._offset is None:
+            return None
+
+        with open(self.credentials_file, "rb") as f:
+            f.seek(self._offset)
+            for line in f:
+                self._offset += len(line)
+                name, _, rest = line.partition(b":")
+                # not an account, such as an empty line
+                if rest.count(b":") < 4:
+                    continue
+                name = name.decode().strip()
+                if name in self._by_username:
+                    continue
+                self._by_username[name] = line
+                if name == username:
+                    return self._user(name)
+        self._offset = None
+        return None
 
     def get_logged_in_user(self) -> User:
-        """Returns the logged in user"""
+        """Returns the logged in user
+
+        The user is remembered until the status file changes.
+        """
 
         # Reads the file and returns the user
         try:
             with open(self.status_file, "r") as f:
+                stat = os.fstat(f.fileno())
+                version = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+                if self._session is not None and self._session[0] == version:
+                    return self._session[1]
                 username = (
                     f.readline().strip()
                 )  # Assuming the first line contains the username
-                for user in self.users:
-                    if user.username == username:
-                        return user
-                raise Exception("No logged-in user found")
         except FileNotFoundError:
             raise Exception("Status file not found")
 
+        user = self._find(username)
+        if user is None:
+            raise Exception("No logged-in user found")
+        self._session = (version, user)
+        return user
+
     def get_user_details(self, username: str) -> User:
         """Returns the account of a user
 
         Args:
             username: the target username
         """
-        # Loop through the loaded accounts and return the one with the right username
-        for user in self.users:
-            if user.username == username:
-                return user
-        raise Exception("User not found")
+        # Look the account up in the index
+        user = self._find(username)
+        if user is None:
+            raise Exception("User not found")
+        return user
 
     @staticmethod
     def load(inFile: str = "data/credentials.txt") -> UserManagement:
-        """Loads the accounts from a file"""
-
-        # open the file and retrieve the relevant fields to create the objects.
-        with open(inFile, "r") as f:
-            users = [
-                User(elements[0], elements[3], elements[4], bool(elements[5]))
-                for line in f.readlines()
-                if (elements := line.strip().split(":"))
-            ]
-            return UserManagement(users=users)
+        """Loads the accounts from a file
+
+        The file is only read by the lookups (see `UserManagement`).
+        """
+
+        # fail now, like when the whole file was read here, if there is no file
+        if not os.path.exists(inFile):
+            raise FileNotFoundError(inFile)
+        return UserManagement(credentials_file=inFile)
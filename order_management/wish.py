@@ -17,6 +17,20 @@ class Wish:
 
     """
 
+    # no per-instance dictionary, like `Product`
+    __slots__ = (
+        "code",
+        "name",
+        "brand",
+        "quantity",
+        "category",
+        "description",
+        "price",
+        "dosage_instruction",
+        "requires_prescription",
+        "username",
+    )
+
     def __init__(
         self,
         code: str,
@@ -1,26 +1,76 @@
 import json
+from typing import Dict
 
+from .storage import wishlistRepository
 from .wish import Wish
 
 
 class Wishlist:
-    def __init__(self, user: str):
+    """The wishlist of a user
+
+    Attributes:
+        username: the user the wishlist belongs to
+        filename: the file of the wishlists, a JSON file or a SQLite database (see `storage`)
+        items: the products of the wishlist by code, in the order they were added, read when first needed
+    """
+
+    def __init__(self, user: str, filename: str = "data/wishlist.json"):
         self.username = user
-        self.filename = "data/wishlist.json"
-        self.items = self.load(self.filename)
+        self.filename = filename
+        self._items = None
+
+    @property
+    def items(self) -> Dict[str, Wish]:
+        if self._items is None:
+            self._items = self.load(self.filename)
+        return self._items
+
+    @items.setter
+    def items(self, items: Dict[str, Wish]):
+        self._items = items
+
+    def __contains__(self, product) -> bool:
+        """Whether a product, or a product code, is on the wishlist"""
+        return getattr(product, "code", product) in self.items
+
+    def _record(self, product) -> Dict:
+        """Returns a product of the wishlist as a dictionary, in the format of the wishlist file"""
+        return {
+            "code": product.code,
+            "name": product.name,
+            "brand": product.brand,
+            "description": product.description,
+            "quantity": product.quantity,
+            "price": product.price,
+            "dosage_instruction": product.dosage_instruction,
+            "requires_prescription": product.requires_prescription,
+            "category": product.category,
+            "user": self.username,
+        }
 
     def add_to_wishlist(self, product):
-        if product in self.items and self.items["user"] == self.username:
+        if product in self:
             print("Oops! This product is already on wishlist")
         else:
-            self.items.append(product)
-            self.dump()
+            # only the product added is written
+            record = self._record(product)
+            try:
+                wishlistRepository(self.filename).add(self.username, record)
+            except json.JSONDecodeError as e:
+                print(f"Oops! {e.msg}")
+                return
+            self.items[product.code] = Wish(**record)
             print("Product added to your wishlist")
 
     def remove_from_wishlist(self, product):
-        if product in self.items:
-            self.items.remove(product)
-            self.dump()
+        if product in self:
+            code = getattr(product, "code", product)
+            try:
+                wishlistRepository(self.filename).remove(self.username, code)
+            except json.JSONDecodeError as e:
+                print(f"Oops! {e.msg}")
+                return
+            del self.items[code]
             print("Product removed from wishlist")
         else:
             print("Oops! This product is not on wishlist")
@@ -31,45 +81,25 @@ class Wishlist:
             return
 
         print("\n\t===== My wishlist =====")
-        for i, product in enumerate(self.items):
+        for i, product in enumerate(self.items.values()):
             print(
                 f"{i+1}. ID: {product.code}, Name: {product.name}, Price: ${product.price:.2f}, Quantity: {product.quantity}"
             )
         print()
 
     def dump(self):
-        """Saves the stock to a JSON file"""
-
-        # Writing back to the original Stock JSON file (sales)
-        wish_list = []
-        for item in self.items:
-            product_dict = {
-                "code": item.code,
-                "name": item.name,
-                "brand": item.brand,
-                "description": item.description,
-                "quantity": item.quantity,
-                "price": item.price,
-                "dosage_instruction": item.dosage_instruction,
-                "requires_prescription": item.requires_prescription,
-                "category": item.category,
-                "user": self.username,
-            }
-            wish_list.append(product_dict)
+        """Saves the whole wishlist of the user to its JSON file or SQLite database"""
 
-        with open(self.filename, "w") as f:
-            json.dump(wish_list, f, indent=4)
+        # Writing back the items of the user, the other users' wishlists are kept
+        wish_list = [self._record(item) for item in self.items.values()]
+        wishlistRepository(self.filename).save(self.username, wish_list)
 
-    def load(self, filename):
+    def load(self, filename) -> Dict[str, Wish]:
+        # Only the wishlist of the user is read
         try:
-            with open(filename, "r") as f:
-                data = json.load(f)
-                user_data = [
-                    Wish(**record) for record in data if record["user"] == self.username
-                ]
-                if user_data is None:
-                    return []
-                else:
-                    return user_data
+            return {
+                record["code"]: Wish(**record)
+                for record in wishlistRepository(filename).load(self.username)
+            }
         except (FileNotFoundError, json.JSONDecodeError):
-            return []
+            return {}
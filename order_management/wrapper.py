@@ -1,10 +1,13 @@
 import uuid
-from .cart import Cart
+from typing import Dict, Iterable, List, Optional, Tuple
+from .cart import Cart, CartLine
+from .metrics import instrumented
 from .stock import Stock
 from .product import Product
 from .prescription import Prescription
+from .storage import salesJournal
+from .books import BookRecords, Sale
 import time
-import json
 
 
 ## would need to create a new object for each new order
@@ -16,13 +19,88 @@ class Wrapper:
         sales: A list of the sales done during the program's execution
         stock: The stock used in the execution
         agentID: the username of the pharmacist running the program
+        books: the records in which the sales are added after being saved (optional)
+        sales_file: the file where the sales are saved, a JSON file or a SQLite database
+        autosave: whether each checkout is saved right away, otherwise `dump` saves the pending sales
     """
 
-    def __init__(self, stock: Stock, agentID: str) -> None:
+    def __init__(
+        self,
+        stock: Stock,
+        agentID: str,
+        books: BookRecords = None,
+        sales_file: str = "data/sales.json",
+        autosave: bool = True,
+    ) -> None:
         self.sales = []
+        self.sales_file = sales_file
+        self.autosave = autosave
+        # number of entries of `sales` already written to the journal
+        self._dumped = 0
         self.stock = stock
         self.agentID = agentID
+        self.books = books
 
+    def _lines(self, products: Dict[str, int]) -> List[CartLine]:
+        """Returns the lines of an order given as a dictionary of product ID -> quantity, at the current prices"""
+        return [
+            CartLine(self.stock.getProductByID(product_id), quantity)
+            for product_id, quantity in products.items()
+        ]
+
+    def _sell(
+        self, lines: Iterable[CartLine], customerID: str, prescription: Prescription = None
+    ):
+        """Takes the products of an order out of the stock and records its sales
+
+        Args:
+            lines: the products of the order with their quantity, sold at the unit price of each line
+            customerID: ID of the customer
+            prescription: the prescription that accompanies the order (default: None)
+
+        Raises: ValueError with the reason if the order can't go through, nothing is sold then
+        """
+
+        # First check that all the products that require a prescription have all the criteria met
+        lines = list(lines)
+        for line in lines:
+            product = line.product
+            if product.requires_prescription:
+                if prescription is None:
+                    raise ValueError(f"Product '{product.name}' requires a prescription.")
+                if not prescription.medicineInPrescription(product, line.quantity):
+                    raise ValueError(
+                        f"Prescription does not contain '{product.name}' in the required quantity."
+                    )
+
+        # Take all the products out of the stock at once, nothing is sold if one of them is short
+        self.stock.updateMany({line.code: -line.quantity for line in lines})
+
+        # Get the current datetime
+        timestamp = time.time()
+
+        # Generate sale information for each product sold
+        pres_id = None if prescription is None else prescription.PrescriptionID
+        for line in lines:
+            self.sales.append(
+                {
+                    "id": uuid.uuid4().hex[:4],
+                    "name": line.product.name,
+                    "quantity": line.quantity,
+                    "price": line.price,
+                    "purchase_price": line.total,
+                    "timestamp": timestamp,
+                    "customerID": customerID,
+                    "salesperson": self.agentID,
+                    "prescriptionID": pres_id,
+                }
+            )
+
+            # Mark the product as complete in the prescription
+            if prescription is not None:
+                prescription.markComplete(line.product)
+
+    @instrumented
     def checkout(self, cart: Cart, customerID: str, prescription: Prescription = None):
         """Handles the checkout procedure of the program.
 
@@ -31,56 +109,27 @@ class Wrapper:
             prescription: the prescription that accompanies the order (default: None)
         """
 
-        # First check that all the products that require a prescription have all the criteria met
         try:
-            if cart.products.items():
-                for product_id, quantity in cart.products.items():
-                    product = self.stock.getProductByID(product_id)
-                    if product.requires_prescription:
-                        if prescription is None:
-                            print(
-                                f"\nProduct '{product.name}' requires a prescription."
-                            )
-                            return
-                        if not prescription.medicineInPrescription(product, quantity):
-                            print(
-                                f"Prescription does not contain '{product.name}' in the required quantity."
-                            )
-                            return
-
-                # Get the current datetime
-                timestamp = time.time()
-
-                # Generate sale information for each product sold
-                sale_entries = []
-                for product_id, quantity in cart.products.items():
-                    product = self.stock.getProductByID(product_id)
-                    if prescription is None:
-                        pres_id = None
-                    else:
-                        pres_id = prescription.PrescriptionID
-                    sale_entry = {
-                        "id": uuid.uuid4().hex[:4],
-                        "name": product.name,
-                        "quantity": quantity,
-                        "price": product.price,
-                        "purchase_price": product.price * quantity,
-                        "timestamp": timestamp,
-                        "customerID": customerID,
-                        "salesperson": self.agentID,
-                        "prescriptionID": pres_id,
-                    }
-                    sale_entries.append(sale_entry)
-                    change = -quantity
-                    self.stock.update(product.code, change)
-
-                    # Mark the product as complete in the prescription
-                    if prescription is not None:
-                        prescription.markComplete(product)
-
-                # Append the sales entries to the current sales list
-                self.sales.extend(sale_entries)
-                self.dump("data/sales.json")
+            if cart.lines:
+                # the lines are sold at the prices they were added at, unless another terminal changed them since
+                self.stock.refresh(cart.lines)
+                changed = [line for line in cart.lines.values() if line.priceChanged]
+                if changed:
+                    for line in changed:
+                        print(
+                            f"The price of '{line.product.name}' changed from ${line.price:.2f} to ${line.product.price:.2f}"
+                        )
+                    cart.refreshPrices()
+                    print("Please review the cart before checking out again")
+                    return
+                try:
+                    self._sell(cart.lines.values(), customerID, prescription)
+                except ValueError as e:
+                    print(e)
+                    return
+
+                if self.autosave:
+                    self.dump(self.sales_file)
                 cart.clear()
                 print(
                     "\n Checkout completed successfully!\n Thank you for shopping with us!"
@@ -90,20 +139,67 @@ class Wrapper:
         except:
             print("Something went wrong! Could not complete checkout!")
 
+    @instrumented
+    def checkoutMany(
+        self, orders: Iterable[Tuple[Dict[str, int], str, Optional[Prescription]]]
+    ) -> List[Optional[str]]:
+        """Checks out several orders at once, such as a file of orders (see `bulk`)
+
+        Each order is validated against the stock left by the orders before
+        it, and goes through or not on its own. The stock is then written
+        once for all of them and, if `autosave`, the sales appended once.
+        If the stock file no longer has the quantities (sold by another
+        terminal meanwhile), a ValueError is raised and none of the orders
+        is kept, the quantities in memory being refreshed for a new try.
+
+        Args:
+            orders: the products (ID -> quantity), the customer ID and the prescription (or None) of each order
+
+        Returns: For each order, None if it went through, otherwise the reason why not
+        """
+        sold = len(self.sales)
+        results = []
+        try:
+            with self.stock.deferWrites():
+                for products, customerID, prescription in orders:
+                    if not products:
+                        results.append("The order is empty")
+                        continue
+                    try:
+                        self._sell(self._lines(products), customerID, prescription)
+                    except Exception as e:
+                        results.append(str(e))
+                    else:
+                        results.append(None)
+        except:
+            # the stock was not written, the sales are not kept
+            del self.sales[sold:]
+            raise
+
+        if self.autosave:
+            self.dump(self.sales_file)
+        return results
+
+    @instrumented
     def dump(self, outfile: str):
-        """Dumps the current sales data to a file
+        """Appends the sales not yet saved to the sales journal
 
         Args:
-            outfile: the path to the output file
+            outfile: the path to the sales file (see `SalesJournal` and `storage`)
         """
 
-        # Writing the current sales to the sales.json file
-        try:
-            with open(outfile, "r") as f:
-                existing_sales = json.load(f)
-        except FileNotFoundError:
-            existing_sales = []
-
-        with open(outfile, "w") as f:
-            all_sales = existing_sales + self.sales
-            json.dump(all_sales, f, indent=4)
+        # Only the sales made since the last dump are appended
+        sales = self.sales[self._dumped :]
+        journal = salesJournal(outfile)
+        start, end = journal.append(sales)
+        self._dumped = len(self.sales)
+
+        # Keep the live records up to date without reloading the file
+        if self.books is not None:
+            self.books.record(
+                journal.path, start, end, [Sale(**sale) for sale in sales]
+            )
+
+    def discard(self):
+        """Forgets the sales not saved yet, when their stock changes could not be saved"""
+        del self.sales[self._dumped :]
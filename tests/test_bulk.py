@@ -0,0 +1,39 @@
+import json
+
+from order_management.bulk import importOrders
+from order_management.stock import Stock
+from order_management.wrapper import Wrapper
+
+from .test_stock import product, write_products
+
+
+def test_refused_order_leaves_its_prescription_quantity(tmp_path):
+    stock_file = str(tmp_path / "products.json")
+    write_products(stock_file, [
+        dict(product("P1", quantity=1), requires_prescription=True),
+        dict(product("P2", quantity=10), requires_prescription=True),
+    ])
+    prescriptions_file = tmp_path / "prescriptions.json"
+    prescriptions_file.write_text(json.dumps([{
+        "DoctorName": "Doctor",
+        "PrescriptionID": "PR1",
+        "Medications": [
+            {"id": "P1", "name": "Product P1", "quantity": 5, "ProcessedStatus": False},
+            {"id": "P2", "name": "Product P2", "quantity": 3, "ProcessedStatus": False},
+        ],
+        "CustomerID": "customer",
+        "Date": "2024-01-01",
+    }]))
+    wrap = Wrapper(Stock.load(stock_file), "agent", sales_file=str(tmp_path / "sales.json"), autosave=False)
+
+    orders = [
+        # short of P1 in stock: its P2 stays on the prescription for the next order
+        (1, ({"P1": 2, "P2": 3}, "customer", "PR1"), None),
+        (2, ({"P2": 3}, "customer", "PR1"), None),
+        (3, ({"P2": 1}, "customer", "PR1"), None),
+    ]
+    results = dict(importOrders(orders, wrap, str(prescriptions_file)))
+
+    assert results[1] is not None
+    assert results[2] is None
+    assert results[3] == "Prescription does not contain 'Product P2' in the required quantity."
@@ -0,0 +1,17 @@
+from order_management.columnar import EncodedColumn
+
+
+def test_take_shares_the_dictionary():
+    column = EncodedColumn()
+    for value in ["a", "b", "a", "c", "b"]:
+        column.append(value)
+
+    taken = column.take([4, 0])
+
+    assert list(taken.decoded()) == ["b", "a"]
+    assert taken.values is column.values
+    # a value encoded by either column keeps the codes of both valid
+    taken.append("d")
+    column.append("e")
+    assert list(taken.decoded()) == ["b", "a", "d"]
+    assert list(column.decoded()) == ["a", "b", "a", "c", "b", "e"]
@@ -0,0 +1,16 @@
+import io
+
+from order_management.journal import iter_jsonl
+
+
+def test_iter_jsonl_leaves_an_interrupted_line():
+    f = io.BytesIO(b'{"a": 1}\n\n{"a": 2}\n{"a": 3')
+
+    assert list(iter_jsonl(f)) == [({"a": 1}, 9), ({"a": 2}, 10)]
+
+
+def test_iter_jsonl_stops_at_the_limit():
+    f = io.BytesIO(b'{"a": 1}\n{"a": 2}\n{"a": 3}\n')
+    f.seek(9)
+
+    assert [record for record, _ in iter_jsonl(f, 9)] == [{"a": 2}]
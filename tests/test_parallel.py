@@ -0,0 +1,36 @@
+import random
+
+from order_management import parallel
+from order_management.journal import openJournal
+from order_management.parallel import ParallelSaleStream
+from order_management.stream import SaleStream
+
+
+def sale(i: int, purchase_price: float) -> dict:
+    return {
+        "id": f"P{i % 7}",
+        "name": "Product",
+        "quantity": 1,
+        "price": purchase_price,
+        "purchase_price": purchase_price,
+        "timestamp": 1_700_000_000 + i,
+        "customerID": f"customer{i % 3}",
+        "salesperson": "agent",
+        "prescriptionID": f"PR{i % 5}" if i % 2 else None,
+    }
+
+
+def test_split_sums_are_the_same_as_in_one_pass(tmp_path, monkeypatch):
+    path = str(tmp_path / "sales.json")
+    prices = random.Random(0)
+    # prices of very different sizes, whose float sum depends on the order of the additions
+    openJournal(path).append([sale(i, prices.choice([0.1, 1e8, 3.33, 1e-3]) * prices.random()) for i in range(5000)])
+    monkeypatch.setattr(parallel, "MIN_CHUNK_BYTES", 1 << 12)
+
+    serial = SaleStream(path)
+    split = ParallelSaleStream(path, workers=2)
+    assert len(split._chunks()) > 1
+
+    assert split.total() == serial.total()
+    assert split.totalWhere("customerID", "customer1") == serial.totalWhere("customerID", "customer1")
+    assert split.prescriptionTotals() == serial.prescriptionTotals()
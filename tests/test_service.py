@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+from order_management.prescription import PrescriptionStore
+from order_management.service import OrderService, Session
+from order_management.stock import Stock
+
+from .test_stock import product, write_products
+
+
+def service(tmp_path, products):
+    stock_file = str(tmp_path / "products.json")
+    write_products(stock_file, products)
+    return OrderService(
+        Stock.load(stock_file),
+        None,
+        sales_file=str(tmp_path / "sales.json"),
+        prescriptions_file=str(tmp_path / "prescriptions.json"),
+    )
+
+
+def session(service, cart):
+    session = Session(service.stock)
+    session.agent = "agent"
+    for code, quantity in cart.items():
+        session.cart.add(code, quantity)
+    return session
+
+
+def test_failed_save_keeps_the_cart_and_forgets_the_sale(tmp_path, monkeypatch):
+    orders = service(tmp_path, [product("P1")])
+    client = session(orders, {"P1": 2})
+
+    def fail(changes, products):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(orders.stock._store(), "applyChanges", fail)
+    with pytest.raises(OSError):
+        orders._checkoutBatch([(client, "customer")])
+    monkeypatch.undo()
+
+    assert dict(client.cart.products) == {"P1": 2}
+    assert orders.wrap.sales == []
+    # the next batch saves its own sale only
+    assert orders._checkoutBatch([(session(orders, {"P1": 1}), "customer")])[0][0]
+    assert len(orders.wrap.sales) == 1
+    assert orders.stock.getProductByID("P1").quantity == 9
+
+
+def test_prescription_is_filled_only_once(tmp_path):
+    prescriptions_file = tmp_path / "prescriptions.json"
+    prescriptions_file.write_text(json.dumps([{
+        "DoctorName": "Doctor",
+        "PrescriptionID": "PR1",
+        "Medications": [{"id": "P1", "name": "Product P1", "quantity": 2, "ProcessedStatus": False}],
+        "CustomerID": "customer",
+        "Date": "2024-01-01",
+    }]))
+    orders = service(tmp_path, [dict(product("P1"), requires_prescription=True)])
+
+    batch = [(session(orders, {"P1": 2}), "customer", "PR1"), (session(orders, {"P1": 1}), "customer", "PR1")]
+    assert [sold for sold, _ in orders._checkoutBatch(batch)] == [True, False]
+
+    # the prescription was saved filled, for the next batches and the next runs of the service
+    store = PrescriptionStore(str(prescriptions_file))
+    assert store.getPrescriptionByID("PR1").Medications[0]["ProcessedStatus"] is True
+    assert not orders._checkoutBatch([(session(orders, {"P1": 1}), "customer", "PR1")])[0][0]
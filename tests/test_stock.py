@@ -0,0 +1,86 @@
+import json
+
+from order_management.cart import Cart
+from order_management.product import Product
+from order_management.stock import Stock
+from order_management.storage import StockShortage
+from order_management.wrapper import Wrapper
+
+
+def product(code: str, quantity: int = 10, price: float = 5.0) -> dict:
+    return Product(code, f"Product {code}", "Brand", "", quantity, price, "", False, "Category").to_dict()
+
+
+def write_products(path, products):
+    with open(path, "w") as f:
+        json.dump(products, f)
+
+
+def codes_in(path):
+    with open(path) as f:
+        return [p["code"] for p in json.load(f)]
+
+
+def test_product_added_by_another_terminal_survives_a_checkout(tmp_path):
+    stock_file = str(tmp_path / "products.json")
+    write_products(stock_file, [product("P1"), product("P2")])
+    terminal = Stock.load(stock_file)
+    other = Stock.load(stock_file)
+
+    other.add(Product(**product("P3")))
+    other.dump(stock_file)
+
+    cart = Cart(terminal)
+    cart.add("P1", 2)
+    wrap = Wrapper(terminal, "agent", sales_file=str(tmp_path / "sales.json"))
+    # the checkout refreshes the products of the cart from the file before selling them
+    wrap.checkout(cart, "customer")
+
+    assert codes_in(stock_file) == ["P1", "P2", "P3"]
+    assert terminal.getProductByID("P1").quantity == 8
+
+
+def test_product_added_by_another_terminal_survives_a_refused_change(tmp_path):
+    stock_file = str(tmp_path / "products.json")
+    write_products(stock_file, [product("P1", quantity=1)])
+    terminal = Stock.load(stock_file)
+    other = Stock.load(stock_file)
+
+    other.add(Product(**product("P2")))
+    other.dump(stock_file)
+
+    try:
+        terminal.updateMany({"P1": -2})
+    except StockShortage:
+        pass
+    terminal.updateMany({"P1": -1})
+
+    assert codes_in(stock_file) == ["P1", "P2"]
+
+
+def test_stale_terminal_sells_what_was_restocked_elsewhere(tmp_path):
+    stock_file = str(tmp_path / "products.json")
+    write_products(stock_file, [product("P1", quantity=4)])
+    terminal = Stock.load(stock_file)
+    other = Stock.load(stock_file)
+
+    other.updateMany({"P1": 100})
+    terminal.updateMany({"P1": -10})
+
+    assert terminal.getProductByID("P1").quantity == 94
+
+
+def test_refused_change_refreshes_the_quantities(tmp_path):
+    stock_file = str(tmp_path / "products.json")
+    write_products(stock_file, [product("P1", quantity=4)])
+    terminal = Stock.load(stock_file)
+    other = Stock.load(stock_file)
+
+    other.updateMany({"P1": -4})
+    try:
+        terminal.updateMany({"P1": -1})
+    except StockShortage as e:
+        assert e.current == {"P1": (0, 5.0)}
+    else:
+        raise AssertionError("the change should have been refused")
+    assert terminal.getProductByID("P1").quantity == 0
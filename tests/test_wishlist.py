@@ -0,0 +1,21 @@
+import json
+import os
+
+import pytest
+
+from order_management.storage import JSONWishlist
+
+
+def test_corrupt_legacy_file_is_not_split(tmp_path):
+    legacy = tmp_path / "wishlist.json"
+    legacy.write_text('[{"user": "alice", "code": "P1"}')
+    wishlists = JSONWishlist(str(legacy))
+
+    with pytest.raises(json.JSONDecodeError):
+        wishlists.load("alice")
+    assert not os.path.exists(wishlists.directory)
+    assert legacy.read_text() == '[{"user": "alice", "code": "P1"}'
+
+    # once fixed, the next use splits it
+    legacy.write_text('[{"user": "alice", "code": "P1"}]')
+    assert wishlists.load("alice") == [{"user": "alice", "code": "P1"}]